@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+本地模拟的 new-api 服务与 WAF 挑战页
+"""
+
+import json
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Literal
+
+# 添加项目根目录到 PATH
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.waf import compute_acw_sc_v2
+
+CHALLENGE_PAGE = """<html><script>
+var arg1='{arg1}';
+function setCookie(name,value){{document.cookie=name+"="+value+";max-age=3600;path=/";}}
+function reload(x){{setCookie("acw_sc__v2",x);document.location.reload();}}
+</script></html>"""
+
+
+@dataclass
+class MockServerConfig:
+	"""模拟服务的行为
+
+	challenge:
+	- acw: 登录页返回 acw_sc__v2 挑战，带上正确的 acw_sc__v2 后才下发其余 cookies
+	- cookies: 登录页直接通过 Set-Cookie 下发全部 WAF cookies (浏览器模式可用)
+	- none: 不校验 WAF cookies
+	"""
+
+	latency: float = 0.0
+	error_rate: float = 0.0
+	challenge: Literal['acw', 'cookies', 'none'] = 'acw'
+	seed: int | None = None
+
+
+class MockNewApiServer:
+	"""在后台线程中运行的模拟服务，可用作上下文管理器"""
+
+	WAF_COOKIE_NAMES = ['acw_tc', 'cdn_sec_tc', 'acw_sc__v2']
+
+	def __init__(self, config: MockServerConfig | None = None, host: str = '127.0.0.1', port: int = 0):
+		self.config = config or MockServerConfig()
+		self.arg1 = secrets.token_hex(20).upper()
+		self.acw_sc_v2 = compute_acw_sc_v2(self.arg1)
+		self.requests: Counter[str] = Counter()
+		self._random = random.Random(self.config.seed)
+		self._lock = threading.Lock()
+		self._server = ThreadingHTTPServer((host, port), self._make_handler())
+		self._server.daemon_threads = True
+		self._thread: threading.Thread | None = None
+
+	@property
+	def base_url(self) -> str:
+		host, port = self._server.server_address[:2]
+		return f'http://{host}:{port}'
+
+	def start(self) -> 'MockNewApiServer':
+		self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+		self._thread.start()
+		return self
+
+	def stop(self):
+		self._server.shutdown()
+		self._server.server_close()
+		if self._thread:
+			self._thread.join()
+
+	def __enter__(self) -> 'MockNewApiServer':
+		return self.start()
+
+	def __exit__(self, *exc_info):
+		self.stop()
+
+	def _should_fail(self) -> bool:
+		with self._lock:
+			return self.config.error_rate > 0 and self._random.random() < self.config.error_rate
+
+	def _count(self, path: str):
+		with self._lock:
+			self.requests[path] += 1
+
+	def _waf_passed(self, cookies: dict) -> bool:
+		if self.config.challenge == 'none':
+			return True
+		return cookies.get('acw_sc__v2') == self.acw_sc_v2 and all(name in cookies for name in self.WAF_COOKIE_NAMES)
+
+	def _make_handler(self):
+		server = self
+
+		class Handler(BaseHTTPRequestHandler):
+			protocol_version = 'HTTP/1.1'
+			# 响应头与响应体分开写出，避免 Nagle 算法与延迟 ACK 叠加出额外的 40ms
+			disable_nagle_algorithm = True
+
+			def log_message(self, format, *args):
+				pass
+
+			def _cookies(self) -> dict:
+				parsed = SimpleCookie(self.headers.get('Cookie', ''))
+				return {name: morsel.value for name, morsel in parsed.items()}
+
+			def _send(self, status: int, body: str, content_type: str, cookies: dict | None = None):
+				data = body.encode()
+				self.send_response(status)
+				self.send_header('Content-Type', content_type)
+				self.send_header('Content-Length', str(len(data)))
+				for name, value in (cookies or {}).items():
+					self.send_header('Set-Cookie', f'{name}={value}; Max-Age=1800; Path=/')
+				self.end_headers()
+				self.wfile.write(data)
+
+			def _send_json(self, data: dict):
+				self._send(200, json.dumps(data), 'application/json')
+
+			def _send_challenge(self):
+				self._send(200, CHALLENGE_PAGE.format(arg1=server.arg1), 'text/html', {'acw_tc': secrets.token_hex(8)})
+
+			def _handle(self):
+				path = self.path.split('?', 1)[0]
+				server._count(path)
+				if server.config.latency:
+					time.sleep(server.config.latency)
+				if server._should_fail():
+					self._send(503, 'Service Unavailable', 'text/plain')
+					return
+
+				# 请求体不使用，但需要读完以保持长连接
+				self.rfile.read(int(self.headers.get('Content-Length') or 0))
+				cookies = self._cookies()
+
+				if path == '/login':
+					if server.config.challenge == 'acw' and cookies.get('acw_sc__v2') != server.acw_sc_v2:
+						self._send_challenge()
+						return
+					waf_cookies = {
+						'acw_tc': cookies.get('acw_tc') or secrets.token_hex(8),
+						'cdn_sec_tc': secrets.token_hex(8),
+					}
+					if server.config.challenge == 'cookies':
+						waf_cookies['acw_sc__v2'] = server.acw_sc_v2
+					self._send(200, '<html>login</html>', 'text/html', waf_cookies)
+					return
+
+				if path not in ('/api/user/self', '/api/user/sign_in'):
+					self._send(404, 'Not Found', 'text/plain')
+					return
+				if not server._waf_passed(cookies):
+					self._send_challenge()
+					return
+				api_user = self.headers.get('new-api-user')
+				if not api_user or 'session' not in cookies:
+					self._send(401, json.dumps({'success': False, 'message': 'unauthorized'}), 'application/json')
+					return
+
+				if path == '/api/user/self':
+					quota = (int(api_user) if api_user.isdigit() else 1) * 500000
+					self._send_json({'success': True, 'data': {'quota': quota, 'used_quota': 250000}})
+				else:
+					self._send_json({'success': True, 'message': ''})
+
+			do_GET = _handle
+			do_POST = _handle
+
+		return Handler
+
+
+if __name__ == '__main__':
+	with MockNewApiServer() as mock_server:
+		print(f'[INFO] Mock server listening on {mock_server.base_url}, press Ctrl+C to stop')
+		try:
+			threading.Event().wait()
+		except KeyboardInterrupt:
+			pass
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+签到流程基准测试
+
+启动本地模拟服务，分别以不同账号数运行签到流程，统计总耗时、单账号耗时分位数、
+峰值内存与浏览器启动次数。每个账号数在独立子进程中运行，峰值内存互不影响。
+
+用法:
+	python benchmarks/run_benchmark.py
+	python benchmarks/run_benchmark.py --accounts 1,100 --latency 0.05 --error-rate 0.01
+	python benchmarks/run_benchmark.py --entry main --solver playwright --challenge cookies
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import checkin
+from benchmarks.mock_server import MockNewApiServer, MockServerConfig
+from utils.config import AccountConfig, AppConfig, ProviderConfig
+from utils.tracing import tracer
+
+
+def percentile(values: list[float], p: float) -> float:
+	"""最近秩法计算分位数"""
+	if not values:
+		return 0.0
+	ordered = sorted(values)
+	return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def peak_rss_mb() -> float:
+	"""当前进程的峰值常驻内存，Linux 上单位为 KB，macOS 上为字节"""
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def build_provider(base_url: str, args: argparse.Namespace) -> ProviderConfig:
+	return ProviderConfig(
+		name='mock',
+		domain=base_url,
+		bypass_method='waf_cookies',
+		waf_cookie_names=MockNewApiServer.WAF_COOKIE_NAMES,
+		waf_solver=args.solver,
+	)
+
+
+def build_accounts(count: int) -> list[AccountConfig]:
+	return [AccountConfig(cookies={'session': f's{i}'}, api_user=str(i + 1), provider='mock') for i in range(count)]
+
+
+async def run_scenario(count: int, args: argparse.Namespace) -> dict:
+	"""以 count 个账号运行一次签到流程并返回统计结果"""
+	server_config = MockServerConfig(
+		latency=args.latency, error_rate=args.error_rate, challenge=args.challenge, seed=args.seed
+	)
+	captured = {'results': []}
+	run_account_stream = checkin.run_account_stream
+
+	async def recording_run_account_stream(items, app_config, ctx, on_result=None):
+		# accounts 与 main 两种入口最终都经过这里，在此收集结果与运行上下文
+		captured['ctx'] = ctx
+
+		def record(result):
+			captured['results'].append(result)
+			if on_result:
+				on_result(result)
+
+		await run_account_stream(items, app_config, ctx, record)
+		return captured['results']
+
+	async def skip_notify(*args, **kwargs):
+		return []
+
+	checkin.run_account_stream = recording_run_account_stream
+	send_notification = checkin.send_notification
+	try:
+		with MockNewApiServer(server_config) as server, tempfile.TemporaryDirectory() as state_dir:
+			provider = build_provider(server.base_url, args)
+			accounts = build_accounts(count)
+			# 子进程的标准输出用于回传结果，流程日志改写到标准错误
+			output = sys.stderr if args.verbose else io.StringIO()
+			started = time.perf_counter()
+			with contextlib.redirect_stdout(output):
+				if args.entry == 'main':
+					os.environ.update(
+						{
+							'ANYROUTER_ACCOUNTS': json.dumps(
+								[{'cookies': a.cookies, 'api_user': a.api_user, 'provider': 'mock'} for a in accounts]
+							),
+							'PROVIDERS': json.dumps(
+								{
+									'mock': {
+										'domain': provider.domain,
+										'bypass_method': 'waf_cookies',
+										'waf_cookie_names': provider.waf_cookie_names,
+										'waf_solver': provider.waf_solver,
+									}
+								}
+							),
+							'STATE_DIR': state_dir,
+							'MAX_WORKERS': str(args.workers),
+							'BROWSER_CONCURRENCY': str(args.browser_concurrency),
+							'BROWSER_PROCESSES': str(args.browser_processes),
+							'HTTP_CONCURRENCY': str(args.http_concurrency),
+							'TRACE_DIR': args.trace_dir or '',
+							'TRACE_FORMATS': 'jsonl,chrome,prometheus',
+						}
+					)
+					# main 模式会修改环境变量，只在子进程中运行；基准测试不发送通知
+					checkin.send_notification = skip_notify
+					with contextlib.suppress(SystemExit):
+						await checkin.main(force=True)
+				else:
+					app_config = AppConfig(
+						providers={'mock': provider},
+						max_workers=args.workers,
+						browser_concurrency=args.browser_concurrency,
+						browser_processes=args.browser_processes,
+						http_concurrency=args.http_concurrency,
+						waf_cookie_cache='off',
+					)
+					tracer.enabled = args.trace_dir is not None
+					ctx = checkin.RunContext.from_config(app_config)
+					try:
+						await checkin.run_accounts(accounts, app_config, ctx)
+					finally:
+						await ctx.close()
+					if tracer.enabled:
+						tracer.export(Path(args.trace_dir), ('jsonl', 'chrome', 'prometheus'))
+			wall = time.perf_counter() - started
+			requests = dict(server.requests)
+	finally:
+		checkin.run_account_stream = run_account_stream
+		checkin.send_notification = send_notification
+
+	results = captured['results']
+	browser_launches = 0
+	if 'ctx' in captured:
+		# 多进程模式下浏览器在子进程中启动，次数由 BrowserWorkerPool 汇总
+		ctx = captured['ctx']
+		browser_launches = ctx.browser_pool.launch_count + (
+			ctx.browser_workers.launch_count if ctx.browser_workers else 0
+		)
+	elapsed = [r.elapsed for r in results]
+	return {
+		'accounts': count,
+		'success': sum(1 for r in results if r.success),
+		'wall': wall,
+		'p50': percentile(elapsed, 50),
+		'p95': percentile(elapsed, 95),
+		'peak_rss_mb': peak_rss_mb(),
+		'browser_launches': browser_launches,
+		'requests': requests,
+	}
+
+
+def run_in_subprocess(count: int, argv: list[str]) -> dict:
+	"""在子进程中运行单个场景，返回其最后一行输出的 JSON 结果"""
+	command = [sys.executable, str(Path(__file__).resolve()), *argv, '--scenario', str(count)]
+	completed = subprocess.run(command, stdout=subprocess.PIPE, text=True, check=True)
+	return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+REPORT_HEADER = f'{"accounts":>8} {"success":>8} {"wall(s)":>9} {"p50(s)":>8} {"p95(s)":>8} {"rss(MB)":>8} {"launches":>8} {"requests":>9}'
+
+
+def format_row(row: dict) -> str:
+	return (
+		f'{row["accounts"]:>8} {row["success"]:>8} {row["wall"]:>9.2f} {row["p50"]:>8.3f} {row["p95"]:>8.3f} '
+		f'{row["peak_rss_mb"]:>8.1f} {row["browser_launches"]:>8} {sum(row["requests"].values()):>9}'
+	)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+	parser = argparse.ArgumentParser(description='AnyRouter 签到流程基准测试')
+	parser.add_argument('--accounts', default='1,10,100,1000', help='逗号分隔的账号数，默认 1,10,100,1000')
+	parser.add_argument(
+		'--entry',
+		choices=['accounts', 'main'],
+		default='accounts',
+		help='accounts 只运行账号处理流程，main 运行完整的 main()',
+	)
+	parser.add_argument('--solver', choices=['http', 'playwright'], default='http', help='WAF cookies 获取方式')
+	parser.add_argument('--challenge', choices=['acw', 'cookies', 'none'], default='acw', help='模拟服务的 WAF 行为')
+	parser.add_argument('--latency', type=float, default=0.0, help='模拟服务每个请求的延迟(秒)')
+	parser.add_argument('--error-rate', type=float, default=0.0, help='模拟服务返回 503 的概率')
+	parser.add_argument('--seed', type=int, default=None, help='错误注入的随机种子')
+	parser.add_argument('--workers', type=int, default=10, help='MAX_WORKERS')
+	parser.add_argument('--browser-concurrency', type=int, default=1, help='BROWSER_CONCURRENCY')
+	parser.add_argument('--browser-processes', type=int, default=1, help='BROWSER_PROCESSES')
+	parser.add_argument('--http-concurrency', type=int, default=10, help='HTTP_CONCURRENCY')
+	parser.add_argument('--trace-dir', help='写出各阶段耗时追踪 (jsonl、Chrome trace、Prometheus)，建议只跑一个账号数')
+	parser.add_argument('--json', dest='json_path', help='将结果写入 JSON 文件')
+	parser.add_argument('--verbose', action='store_true', help='输出签到流程的日志')
+	parser.add_argument('--scenario', type=int, help=argparse.SUPPRESS)
+	return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None):
+	argv = sys.argv[1:] if argv is None else argv
+	args = parse_args(argv)
+	if args.scenario is not None:
+		print(json.dumps(asyncio.run(run_scenario(args.scenario, args))))
+		return
+
+	rows = []
+	print(REPORT_HEADER)
+	for count in (int(value) for value in args.accounts.split(',') if value.strip()):
+		rows.append(run_in_subprocess(count, argv))
+		print(format_row(rows[-1]), flush=True)
+
+	if args.json_path:
+		Path(args.json_path).write_text(json.dumps(rows, indent=2), encoding='utf-8')
+
+
+if __name__ == '__main__':
+	main()
@@ -3,48 +3,42 @@
 AnyRouter.top 自动签到脚本 (动态排序 & 资金汇总版)
 """
 
+import argparse
 import asyncio
-import hashlib
-import json
-import os
+import sqlite3
 import sys
-import re  # 用于智能排序
+import time
+from collections.abc import Callable, Iterable
 from datetime import datetime
+from pathlib import Path
 
-import httpx
-from dotenv import load_dotenv
-from playwright.async_api import async_playwright
+from dotenv import find_dotenv, load_dotenv
 
 # 假设这些模块在你本地是存在的，保持引用不变
-from utils.config import AccountConfig, AppConfig, load_accounts_config
-from utils.notify import notify
+from utils.balance_store import BalanceStore
+from utils.browser import COOKIE_WAIT_TIMEOUT, BrowserPool, block_unneeded_resources, wait_for_cookies
+from utils.config import AccountConfig, AccountsFile, AppConfig, RetryPolicy, load_accounts_config
+from utils.http import format_cookie_header
+from utils.ledger import RunLedger
+from utils.notify import get_notify
+from utils.outbox import NotificationOutbox
+from utils.policy import NotifyPolicy
+from utils.results import CheckInResult, ReportAggregator, render_html, render_markdown, render_text, report_fingerprint
+from utils.retry import CircuitBreaker, CircuitOpenError, request_with_retry
+from utils.runtime import RunContext
+from utils.schedule import CronSchedule, FileWatcher, account_jitter
+from utils.shard import load_shard_results, parse_shard, shard_of, shard_result_path, write_shard_results
+from utils.tracing import tracer
+from utils.waf import ACW_SC_V2_TTL, compute_acw_sc_v2, extract_acw_arg1
 
 load_dotenv()
 
-BALANCE_HASH_FILE = 'balance_hash.txt'
-
-# === 辅助函数 (保持不变) ===
-def load_balance_hash():
-    try:
-        if os.path.exists(BALANCE_HASH_FILE):
-            with open(BALANCE_HASH_FILE, 'r', encoding='utf-8') as f:
-                return f.read().strip()
-    except Exception:
-        pass
-    return None
-
-def save_balance_hash(balance_hash):
-    try:
-        with open(BALANCE_HASH_FILE, 'w', encoding='utf-8') as f:
-            f.write(balance_hash)
-    except Exception as e:
-        print(f'Warning: Failed to save balance hash: {e}')
-
-def generate_balance_hash(balances):
-    simple_balances = {k: v['quota'] for k, v in balances.items()} if balances else {}
-    balance_json = json.dumps(simple_balances, sort_keys=True, separators=(',', ':'))
-    return hashlib.sha256(balance_json.encode('utf-8')).hexdigest()[:16]
+# 常驻模式下检查配置文件变化与重试通知的间隔(秒)
+CONFIG_CHECK_INTERVAL = 30
+# 通知失败时在本次运行内等待重试的最长时间(秒)
+NOTIFY_RETRY_WAIT = 30
 
+# === 辅助函数 ===
 def parse_cookies(cookies_data):
     if isinstance(cookies_data, dict): return cookies_data
     if isinstance(cookies_data, str):
@@ -56,105 +50,224 @@ def parse_cookies(cookies_data):
         return cookies_dict
     return {}
 
-async def get_waf_cookies_with_playwright(account_name: str, login_url: str, required_cookies: list[str]):
+async def get_waf_cookies_with_playwright(account_name: str, login_url: str, required_cookies: list[str], browser_pool: BrowserPool, wait_mode: str = 'cookies', block_resources: bool = True):
     print(f'[处理中] [{account_name}] 正在获取 WAF cookies...')
-    async with async_playwright() as p:
-        import tempfile
-        with tempfile.TemporaryDirectory() as temp_dir:
-            context = await p.chromium.launch_persistent_context(
-                user_data_dir=temp_dir,
-                headless=False, # 如果在服务器运行建议改为 True，或者确保安装了相关依赖
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
-                viewport={'width': 1920, 'height': 1080},
-                args=['--disable-blink-features=AutomationControlled', '--disable-dev-shm-usage', '--disable-web-security', '--disable-features=VizDisplayCompositor', '--no-sandbox'],
-            )
+    try:
+        async with browser_pool.new_context() as context:
+            if block_resources:
+                await block_unneeded_resources(context, login_url)
             page = await context.new_page()
-            try:
-                await page.goto(login_url, wait_until='networkidle')
-                try:
-                    await page.wait_for_function('document.readyState === "complete"', timeout=5000)
-                except Exception:
-                    await page.wait_for_timeout(3000)
-                
-                cookies = await page.context.cookies()
-                waf_cookies = {}
-                for cookie in cookies:
-                    if cookie.get('name') in required_cookies and cookie.get('value'):
-                        waf_cookies[cookie.get('name')] = cookie.get('value')
-                
-                if any(c not in waf_cookies for c in required_cookies):
-                    print(f'[失败] [{account_name}] 缺少 WAF cookies')
-                    await context.close()
-                    return None
+            if wait_mode == 'cookies':
+                # 所需 cookies 通常在页面资源加载完之前就已下发，收到响应后轮询，齐了立即返回
+                with tracer.span('browser.goto', url=login_url):
+                    await page.goto(login_url, wait_until='commit')
+                with tracer.span('browser.cookies'):
+                    cookies = await wait_for_cookies(context, required_cookies, COOKIE_WAIT_TIMEOUT) or await context.cookies()
+            else:
+                with tracer.span('browser.goto', url=login_url):
+                    await page.goto(login_url, wait_until='networkidle')
+                with tracer.span('browser.ready'):
+                    try:
+                        await page.wait_for_function('document.readyState === "complete"', timeout=5000)
+                    except Exception:
+                        await page.wait_for_timeout(3000)
                 
-                print(f'[成功] [{account_name}] WAF cookies 获取成功')
-                await context.close()
-                return waf_cookies
-            except Exception as e:
-                print(f'[失败] [{account_name}] Playwright 异常: {e}')
-                await context.close()
+                cookies = await context.cookies()
+    except Exception as e:
+        print(f'[失败] [{account_name}] Playwright 异常: {e}')
+        return None
+
+    waf_cookies = {}
+    expires_at = None
+    for cookie in cookies:
+        if cookie.get('name') in required_cookies and cookie.get('value'):
+            waf_cookies[cookie.get('name')] = cookie.get('value')
+            # 会话 cookie 的 expires 为 -1，此时交给缓存使用默认 TTL
+            if cookie.get('expires', -1) > 0:
+                expires_at = min(expires_at or cookie['expires'], cookie['expires'])
+    
+    if any(c not in waf_cookies for c in required_cookies):
+        print(f'[失败] [{account_name}] 缺少 WAF cookies')
+        return None
+    
+    print(f'[成功] [{account_name}] WAF cookies 获取成功')
+    return waf_cookies, expires_at
+
+async def get_waf_cookies_with_http(account_name: str, client, login_url: str, required_cookies: list[str]):
+    """不启动浏览器，直接请求登录页并在本地计算 acw_sc__v2，解析失败时返回 None"""
+    print(f'[处理中] [{account_name}] 正在通过 HTTP 求解 WAF cookies...')
+    waf_cookies = {}
+    expires_at = None
+    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36'}
+    try:
+        # 第一次请求拿到挑战页，带上计算出的 acw_sc__v2 再请求一次以获取剩余 cookies
+        for _ in range(2):
+            headers['Cookie'] = format_cookie_header(waf_cookies)
+            response = await client.get(login_url, headers=headers, timeout=15)
+            for cookie in response.cookies.jar:
+                waf_cookies[cookie.name] = cookie.value
+                if cookie.name in required_cookies and cookie.expires:
+                    expires_at = min(expires_at or cookie.expires, cookie.expires)
+
+            arg1 = extract_acw_arg1(response.text)
+            if not arg1:
+                break
+            if 'acw_sc__v2' in waf_cookies:
+                print(f'[失败] [{account_name}] HTTP 求解结果未被 WAF 接受，改用浏览器获取')
                 return None
+            waf_cookies['acw_sc__v2'] = compute_acw_sc_v2(arg1)
+            challenge_expires_at = time.time() + ACW_SC_V2_TTL
+            expires_at = min(expires_at or challenge_expires_at, challenge_expires_at)
+    except Exception as e:
+        print(f'[失败] [{account_name}] HTTP 求解异常: {str(e)[:50]}')
+        return None
+
+    if any(c not in waf_cookies for c in required_cookies):
+        print(f'[失败] [{account_name}] HTTP 求解缺少 WAF cookies，改用浏览器获取')
+        return None
 
-def get_user_info(client, headers, user_info_url: str):
+    print(f'[成功] [{account_name}] WAF cookies 求解成功 (HTTP)')
+    return {name: waf_cookies[name] for name in required_cookies}, expires_at
+
+def build_headers(account: AccountConfig, provider_config, cookies: dict) -> dict:
+    # 共享连接池的客户端不保存 cookie，账号 cookies 随请求头发送
+    return {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
+        'Cookie': format_cookie_header(cookies),
+        provider_config.api_user_key: account.api_user,
+    }
+
+def parse_user_info(response) -> dict:
+    """解析用户信息接口的响应"""
+    if response.status_code == 200:
+        data = response.json()
+        if data.get('success'):
+            user_data = data.get('data', {})
+            # 注意：这里已经是 float 类型
+            quota = round(user_data.get('quota', 0) / 500000, 2)
+            used_quota = round(user_data.get('used_quota', 0) / 500000, 2)
+            return {
+                'success': True,
+                'quota': quota,
+                'used_quota': used_quota,
+                'display': f'💰 当前余额: ${quota}, 已用: ${used_quota}',
+            }
+    return {'success': False, 'error': f'HTTP {response.status_code}'}
+
+async def get_user_info(client, headers, user_info_url: str, policy: RetryPolicy | None = None, breaker: CircuitBreaker | None = None):
     try:
-        response = client.get(user_info_url, headers=headers, timeout=30)
-        if response.status_code == 200:
-            data = response.json()
-            if data.get('success'):
-                user_data = data.get('data', {})
-                # 注意：这里已经是 float 类型
-                quota = round(user_data.get('quota', 0) / 500000, 2)
-                used_quota = round(user_data.get('used_quota', 0) / 500000, 2)
-                return {
-                    'success': True,
-                    'quota': quota,
-                    'used_quota': used_quota,
-                    'display': f'💰 当前余额: ${quota}, 已用: ${used_quota}',
-                }
-        return {'success': False, 'error': f'HTTP {response.status_code}'}
+        with tracer.span('api.user_info'):
+            response = await request_with_retry(client, 'GET', user_info_url, policy, breaker, headers=headers)
+        return parse_user_info(response)
+    except CircuitOpenError:
+        return {'success': False, 'error': '服务商连续失败，已熔断'}
+    except Exception as e:
+        return {'success': False, 'error': str(e)[:50]}
+
+def is_waf_challenge(response) -> bool:
+    """WAF 拦截时通常返回 200 的 HTML 挑战页或 403，而不是 JSON；401 是账号登录失效，与 WAF 无关"""
+    if response.status_code == 403:
+        return True
+    content_type = response.headers.get('content-type', '')
+    return 'json' not in content_type and ('acw_sc__v2' in response.text or 'arg1=' in response.text)
+
+async def validate_cached_cookies(account_name: str, account: AccountConfig, provider_config, cookies: dict, client, breaker: CircuitBreaker | None = None) -> dict | None:
+    """用缓存的 cookies 请求用户信息接口，确认 WAF cookies 仍然有效
+
+    被 WAF 拦截时返回 None；否则返回解析后的用户信息，签到时直接复用，不再重复请求。
+    """
+    headers = build_headers(account, provider_config, cookies)
+    try:
+        with tracer.span('waf.cache_validate'):
+            response = await request_with_retry(client, 'GET', f'{provider_config.domain}{provider_config.user_info_path}', provider_config.retry, breaker, headers=headers)
+    except CircuitOpenError:
+        # 已熔断时直接放弃该账号，不再启动浏览器重新获取
+        raise
     except Exception as e:
+        # 网络异常与 WAF 无关，保留缓存，由后续请求报告错误
+        print(f'[缓存] [{account_name}] 校验缓存的 WAF cookies 失败: {str(e)[:50]}')
         return {'success': False, 'error': str(e)[:50]}
 
-async def prepare_cookies(account_name: str, provider_config, user_cookies: dict) -> dict | None:
+    if is_waf_challenge(response):
+        print(f'[缓存] [{account_name}] 缓存的 WAF cookies 已失效 (HTTP {response.status_code})')
+        return None
+    try:
+        return parse_user_info(response)
+    except ValueError:
+        print(f'[缓存] [{account_name}] 缓存的 WAF cookies 已失效 (响应不是 JSON)')
+        return None
+
+async def prepare_cookies(account_name: str, account: AccountConfig, provider_config, user_cookies: dict, ctx: RunContext) -> tuple[dict, dict | None] | None:
+    """准备请求用的 cookies，返回 (cookies, 校验缓存时取得的用户信息)，获取失败时返回 None"""
     if provider_config.needs_waf_cookies():
         login_url = f'{provider_config.domain}{provider_config.login_path}'
-        waf_cookies = await get_waf_cookies_with_playwright(account_name, login_url, provider_config.waf_cookie_names)
+        account_key = account.get_account_key()
+
+        # 优先尝试本地缓存的 WAF cookies，校验通过则无需启动浏览器
+        cached_cookies = ctx.cookie_cache.get(provider_config.domain, account_key)
+        if cached_cookies:
+            all_cookies = {**cached_cookies, **user_cookies}
+            client = ctx.get_http_client(provider_config)
+            user_info = await validate_cached_cookies(account_name, account, provider_config, all_cookies, client, ctx.get_breaker(provider_config))
+            if user_info is not None:
+                ttl = ctx.cookie_cache.ttl(provider_config.domain, account_key)
+                print(f'[缓存] [{account_name}] 使用缓存的 WAF cookies (剩余 {ttl:.0f}s)')
+                return all_cookies, user_info
+            ctx.cookie_cache.invalidate(provider_config.domain, account_key)
+
+        async def fetch_waf_cookies():
+            solved = None
+            if provider_config.waf_solver == 'http':
+                client = ctx.get_http_client(provider_config)
+                with tracer.span('waf.http_solve') as span:
+                    solved = await get_waf_cookies_with_http(account_name, client, login_url, provider_config.waf_cookie_names)
+                    span.set(success=bool(solved))
+            if not solved:
+                with tracer.span('waf.browser_wait'):
+                    await ctx.browser_semaphore.acquire()
+                try:
+                    async with ctx.get_rate_limiter(provider_config).limit():
+                        with tracer.span('waf.playwright') as span:
+                            solve_args = (account_name, login_url, provider_config.waf_cookie_names)
+                            solve_kwargs = {'wait_mode': provider_config.waf_wait, 'block_resources': provider_config.waf_block_resources}
+                            if ctx.browser_workers:
+                                # 在浏览器子进程中执行，占满多核
+                                solved = await ctx.browser_workers.run(get_waf_cookies_with_playwright, *solve_args, **solve_kwargs)
+                            else:
+                                solved = await get_waf_cookies_with_playwright(*solve_args, browser_pool=ctx.browser_pool, **solve_kwargs)
+                            span.set(success=bool(solved))
+                finally:
+                    ctx.browser_semaphore.release()
+            if not solved: return None
+            waf_cookies, expires_at = solved
+            ctx.cookie_cache.set(provider_config.domain, waf_cookies, expires_at, account_key)
+            return waf_cookies
+
+        # 按 WAF_COOKIE_SHARING 配置，同 provider 的账号可共享一次获取结果
+        waf_cookies = await ctx.waf_cookies.get(provider_config.name, fetch_waf_cookies)
         if not waf_cookies: return None
-        return {**waf_cookies, **user_cookies}
-    return user_cookies
+        return {**waf_cookies, **user_cookies}, None
+    return user_cookies, None
 
-def execute_check_in(client, account_name: str, provider_config, headers: dict):
+async def execute_check_in(client, account_name: str, provider_config, headers: dict, breaker: CircuitBreaker | None = None):
     checkin_headers = headers.copy()
     checkin_headers.update({'Content-Type': 'application/json', 'X-Requested-With': 'XMLHttpRequest'})
     try:
-        response = client.post(f'{provider_config.domain}{provider_config.sign_in_path}', headers=checkin_headers, timeout=30)
+        with tracer.span('api.sign_in'):
+            response = await request_with_retry(client, 'POST', f'{provider_config.domain}{provider_config.sign_in_path}', provider_config.retry, breaker, headers=checkin_headers)
         if response.status_code == 200:
             return True
         return False
     except Exception as e:
         return False
 
-async def check_in_account(account: AccountConfig, account_index: int, app_config: AppConfig):
-    account_name = account.get_display_name(account_index)
-    print(f'\n[处理中] 开始处理 [{account_name}]')
-    
-    provider_config = app_config.get_provider(account.provider)
-    if not provider_config: return False, {'success': False, 'error': '配置错误'}
-
-    user_cookies = parse_cookies(account.cookies)
-    all_cookies = await prepare_cookies(account_name, provider_config, user_cookies)
-    if not all_cookies: return False, {'success': False, 'error': 'Cookie获取失败'}
-
-    client = httpx.Client(http2=True, timeout=30.0)
+async def request_account(account_name: str, account: AccountConfig, provider_config, all_cookies: dict, client, breaker: CircuitBreaker | None = None, user_info: dict | None = None):
     try:
-        client.cookies.update(all_cookies)
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36',
-            provider_config.api_user_key: account.api_user,
-        }
+        headers = build_headers(account, provider_config, all_cookies)
         
-        # 先获取用户信息(余额)
-        user_info = get_user_info(client, headers, f'{provider_config.domain}{provider_config.user_info_path}')
+        # 先获取用户信息(余额)，校验缓存时已取得的直接复用
+        if user_info is None:
+            user_info = await get_user_info(client, headers, f'{provider_config.domain}{provider_config.user_info_path}', provider_config.retry, breaker)
         if user_info.get('success'):
             print(f"[{account_name}] {user_info['display']}")
         else:
@@ -163,121 +276,472 @@ async def check_in_account(account: AccountConfig, account_index: int, app_confi
         # 执行签到
         success = True
         if provider_config.needs_manual_check_in():
-            success = execute_check_in(client, account_name, provider_config, headers)
+            success = await execute_check_in(client, account_name, provider_config, headers, breaker)
             if success: print(f"[{account_name}] 签到成功")
             else: print(f"[{account_name}] 签到失败")
         else:
-            print(f"[{account_name}] 自动签到完成")
+            # 无需手动签到的服务商访问用户信息即完成签到，接口失败说明签到没有完成
+            success = bool(user_info.get('success'))
+            if success: print(f"[{account_name}] 自动签到完成")
+            else: print(f"[{account_name}] 自动签到失败")
             
         return success, user_info
     except Exception as e:
         print(f"[{account_name}] 异常: {e}")
         return False, {'success': False, 'error': str(e)}
-    finally:
-        client.close()
 
-async def main():
-    print('[系统] AnyRouter.top 自动签到 (动态列表排序 + 资金汇总版)')
-    print(f'[时间] {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
-
-    app_config = AppConfig.load_from_env()
-    accounts = load_accounts_config()
-    if not accounts: sys.exit(1)
-    print(f'[信息] 共发现 {len(accounts)} 个账号')
+async def check_in_account(account: AccountConfig, account_index: int, app_config: AppConfig, ctx: RunContext | None = None):
+    if ctx is None:
+        # 单独调用时使用临时上下文，用完即释放浏览器
+        ctx = RunContext.from_config(app_config)
+        try:
+            return await check_in_account(account, account_index, app_config, ctx)
+        finally:
+            await ctx.close()
 
-    # === 1. 定义结果列表 & 统计变量 ===
-    results_list = []
-    success_count = 0
-    current_balances = {}
+    account_name = account.get_display_name(account_index)
+    print(f'\n[处理中] 开始处理 [{account_name}]')
     
-    # 新增：总金额统计变量
-    total_quota_sum = 0.0
-    total_used_sum = 0.0
-
-    # === 2. 遍历执行 ===
-    for i, account in enumerate(accounts):
-        account_name = account.get_display_name(i)
-        account_key = f'account_{i + 1}'
-        
+    provider_config = app_config.get_provider(account.provider)
+    if not provider_config: return False, {'success': False, 'error': '配置错误'}
+
+    # 服务商已熔断时直接失败，不再消耗浏览器与请求
+    breaker = ctx.get_breaker(provider_config)
+    if breaker.is_open: return False, {'success': False, 'error': '服务商连续失败，已熔断'}
+
+    user_cookies = parse_cookies(account.cookies)
+    try:
+        prepared = await prepare_cookies(account_name, account, provider_config, user_cookies, ctx)
+    except CircuitOpenError:
+        return False, {'success': False, 'error': '服务商连续失败，已熔断'}
+    if not prepared: return False, {'success': False, 'error': 'Cookie获取失败'}
+    all_cookies, user_info = prepared
+
+    # 同一域名的账号复用连接池中的 HTTP/2 连接
+    client = ctx.get_http_client(provider_config)
+    async with ctx.http_semaphore:
+        return await request_account(account_name, account, provider_config, all_cookies, client, breaker, user_info)
+
+async def process_account(account: AccountConfig, account_index: int, app_config: AppConfig, ctx: RunContext) -> CheckInResult:
+    """处理单个账号并记录耗时，异常不会向上抛出"""
+    account_name = account.get_display_name(account_index)
+    started = time.perf_counter()
+    result = CheckInResult(account_index, account.get_account_key(), account_name)
+    try:
+        with tracer.span('account', account=account_name, provider=account.provider) as span:
+            success, user_info = await check_in_account(account, account_index, app_config, ctx)
+            span.set(success=success)
+        result.status = 'success' if success else 'failed'
+        if user_info and user_info.get('success'):
+            result.quota, result.used = user_info['quota'], user_info['used_quota']
+        elif user_info:
+            result.error = user_info.get('error')
+    except Exception as e:
+        result.status, result.error = 'error', str(e)
+    result.elapsed = time.perf_counter() - started
+    print(f'[耗时] [{account_name}] {result.elapsed:.2f}s')
+    return result
+
+async def run_accounts(accounts: list[AccountConfig], app_config: AppConfig, ctx: RunContext, indexes: list[int] | None = None, delays: list[float] | None = None) -> list[CheckInResult]:
+    """使用有界 worker 池并发处理账号，结果按传入顺序返回
+
+    indexes 为账号在完整配置中的序号，只处理部分账号时用于保持默认显示名称不变。
+    delays 为各账号相对开始时间的启动延迟(秒)，账号按延迟先后出队，到时间才开始处理。
+    """
+    indexes = indexes if indexes is not None else list(range(len(accounts)))
+    delays = delays if delays is not None else [0.0] * len(accounts)
+    order = sorted(range(len(accounts)), key=lambda position: delays[position])
+    results = await run_account_stream(((indexes[p], accounts[p], delays[p]) for p in order), app_config, ctx)
+    by_index = {result.index: result for result in results}
+    return [by_index[index] for index in indexes]
+
+async def run_account_stream(items: Iterable[tuple[int, AccountConfig, float]], app_config: AppConfig, ctx: RunContext, on_result: Callable[[CheckInResult], None] | None = None) -> list[CheckInResult]:
+    """从 (序号, 账号, 启动延迟) 的可迭代对象中逐个取出账号，交给有界 worker 池处理
+
+    账号经有界队列按需读取，可以直接传入逐条读取文件的生成器，内存与启动耗时不随账号总数增长。
+    结果按处理完成的顺序交给 on_result；未传入 on_result 时收集后返回。
+    """
+    queue = asyncio.Queue(maxsize=max(1, ctx.max_workers) * 2)
+    results = []
+    on_result = on_result or results.append
+    started = time.monotonic()
+
+    async def produce():
         try:
-            success, user_info = await check_in_account(account, i, app_config)
-            
-            if success:
-                success_count += 1
-
-            if user_info and user_info.get('success'):
-                current_balances[account_key] = {'quota': user_info['quota'], 'used': user_info['used_quota']}
-                # 新增：累加金额 (确保是数字)
-                total_quota_sum += float(user_info.get('quota', 0))
-                total_used_sum += float(user_info.get('used_quota', 0))
-                
-                msg_content = f"[{account_name}]\n{user_info['display']}"
-            else:
-                error_msg = user_info.get('error', '未知错误') if user_info else '未知错误'
-                msg_content = f"[{account_name}]\n❌ 信息获取失败: {error_msg}"
-            
-            results_list.append({
-                'name': account_name,
-                'msg': msg_content
-            })
-
-        except Exception as e:
-            results_list.append({
-                'name': account_name,
-                'msg': f"[{account_name}]\n❌ 脚本执行异常: {str(e)[:30]}"
-            })
-
-    # === 3. 智能排序 ===
-    def natural_key(item):
-        text = item['name']
-        return int(text) if text.isdigit() else text
-
-    results_list.sort(key=natural_key)
-
-    # === 4. 生成通知 (含汇总) ===
-    # 提取排序后的消息文本
-    final_content_lines = [item['msg'] for item in results_list]
-    
-    # 计算总资产
-    total_assets = total_quota_sum + total_used_sum
-    
-    summary = [
-        '📊 签到统计:',
-        f'✅ 成功: {success_count}/{len(accounts)}',
-        f'❌ 失败: {len(accounts) - success_count}/{len(accounts)}',
-        '',  # 空行分隔
-        '💰 资金汇总:',
-        f'💵 可用总余额: ${total_quota_sum:.2f}',
-        f'🧾 已用总额: ${total_used_sum:.2f}',
-        f'💳 总资产(可用+已用): ${total_assets:.2f}',
-    ]
-    
-    if success_count == len(accounts): 
-        summary.append('\n🎉 全员通过！')
-    else: 
-        summary.append('\n⚠️ 部分失败')
+            for item in items:
+                await queue.put(item)
+        finally:
+            for _ in range(worker_count):
+                await queue.put(None)
 
-    time_info = f'[时间] {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
-    
-    # 组合最终消息: 时间 -> 明细 -> 汇总
-    notify_content = '\n\n'.join([time_info, '\n'.join(final_content_lines), '\n'.join(summary)])
-    
-    # 保存Hash
-    current_balance_hash = generate_balance_hash(current_balances)
-    if current_balance_hash: save_balance_hash(current_balance_hash)
+    async def worker():
+        while (item := await queue.get()) is not None:
+            index, account, delay = item
+            wait = started + delay - time.monotonic()
+            if wait > 0: await asyncio.sleep(wait)
+            on_result(await process_account(account, index, app_config, ctx))
 
+    worker_count = max(1, ctx.max_workers)
+    await asyncio.gather(produce(), *(worker() for _ in range(worker_count)))
+    return results
+
+def build_skipped_result(account: AccountConfig, account_index: int, entry: dict) -> CheckInResult:
+    """今天已签到成功的账号不再请求，使用台账中记录的余额生成结果"""
+    result = CheckInResult(account_index, account.get_account_key(), account.get_display_name(account_index), 'skipped')
+    if entry.get('quota') is not None:
+        result.quota, result.used = entry['quota'], entry['used_quota']
+    else:
+        result.error = '今日已签到，无余额记录'
+    return result
+
+async def process_accounts(app_config: AppConfig, accounts: Iterable[AccountConfig], force: bool = False, ctx: RunContext | None = None, shard: tuple[int, int] | None = None) -> ReportAggregator:
+    """处理账号并更新签到台账，结果随完成逐个汇总
+
+    accounts 可以是列表，也可以是逐条读取的 AccountsFile；传入 ctx 时复用其中的浏览器与连接池，由调用方负责关闭。
+    shard 为 (i, N) 时只处理按哈希分到第 i 个分片的账号。
+    """
+    report = ReportAggregator()
+
+    # === 1. 跳过今天已签到成功的账号 (--force 时全部处理) ===
+    ledger = RunLedger()
+
+    def pending_items():
+        # 账号边读边判断，已跳过与不属于本分片的账号不进入处理队列
+        for i, account in enumerate(accounts):
+            account_key = account.get_account_key()
+            if shard and shard_of(account_key, shard[1]) != shard[0] - 1: continue
+            if not force and ledger.is_done(account_key):
+                report.add(build_skipped_result(account, i, ledger.get(account_key)))
+                continue
+            yield i, account, account_jitter(account_key, app_config.schedule_jitter)
+
+    def on_result(result: CheckInResult):
+        report.add(result)
+        if result.status != 'error':
+            ledger.record(result.key, result.success, result.quota, result.used)
+
+    # === 2. 并发执行 (设置了 CHECKIN_JITTER 时各账号错开启动) ===
+    owns_ctx = ctx is None
+    ctx = ctx or RunContext.from_config(app_config)
+    print(f'[信息] 并发设置: 账号 {app_config.max_workers}, 浏览器 {app_config.browser_concurrency}, HTTP {app_config.http_concurrency}')
+    items = pending_items()
+    if app_config.schedule_jitter > 0:
+        # 按启动延迟排序需要先读入全部账号
+        items = sorted(items, key=lambda item: item[2])
+    started = time.perf_counter()
+    try:
+        await run_account_stream(items, app_config, ctx, on_result)
+    finally:
+        if owns_ctx:
+            await ctx.close()
+        else:
+            ctx.cookie_cache.save()
+        ledger.save()
+    print(f'[耗时] 全部账号处理完成: {time.perf_counter() - started:.2f}s')
+    if report.counts['skipped']:
+        print(f"[信息] {report.counts['skipped']} 个账号今日已签到，本次跳过 (使用 --force 可全部重新处理)")
+    return report
+
+async def publish_report(report: ReportAggregator) -> int:
+    """记录余额历史并推送通知，返回成功的账号数"""
+    generated_at = datetime.now()
+
+    # 记录余额历史，并与每个账号上一次的余额对比，报告中给出变化量
+    balance_store = BalanceStore()
+    try:
+        report.apply_previous(balance_store.get_latest())
+        balance_store.record_run(report.balances)
+        print(f'[余额] 与上次运行相比 {len(report.changed_results())} 个账号有变化')
+    except Exception as e:
+        print(f'[WARNING] 余额历史记录失败: {e}')
+    finally:
+        balance_store.close()
+
+    notify_content = render_text(report, generated_at)
     print('\n' + '='*30)
     print(notify_content)
     print('='*30)
-    
-    # 推送通知
-    notify.push_message('AnyRouter 签到通知', notify_content, msg_type='text')
-    
+
+    # 按通知策略决定是否推送，大多数无变化的运行不必向各渠道发送
+    policy = NotifyPolicy.from_env()
+    reasons = policy.reasons(report, last_notified_at() if 'periodic' in policy.rules else None)
+    if not reasons:
+        print(f"[通知] 按通知策略 ({','.join(sorted(policy.rules))}) 本次无需推送")
+        # 不推送新消息时仍投递之前运行中失败待重试的消息
+        await flush_notifications()
+        return report.success_count
+    print(f"[通知] 推送原因: {'; '.join(reasons)}")
+
+    # 推送通知 (各渠道并行发送，支持的渠道使用 HTML / Markdown 版本，超长时按渠道限制拆分)
+    notify = get_notify()
+    attachments = None
+    title = 'AnyRouter 签到通知'
+    digest = notify.use_digest(title, notify_content)
+    if digest:
+        # 摘要只包含汇总与需要关注的账号，完整报告随邮件附件发送，或通过 NOTIFY_REPORT_URL 查看
+        attachments = [(f'checkin-report-{generated_at.strftime("%Y%m%d-%H%M%S")}.txt', notify_content)]
+        notify_content = render_text(report, generated_at, digest, notify.report_url)
+    formats = {
+        'html': render_html(report, generated_at, digest, notify.report_url),
+        'markdown': render_markdown(report, generated_at, digest, notify.report_url),
+    }
+    with tracer.span('notify'):
+        channel_results = await send_notification(title, notify_content, formats, attachments, report_fingerprint(report))
+    if channel_results:
+        # 发件箱按每次投递尝试返回结果，同一渠道以最后一次为准
+        final = {r.name: r for r in channel_results}
+        sent = sum(1 for r in final.values() if r.success)
+        print(f'[通知] 成功 {sent}/{len(final)} 个渠道, 最长耗时 {max(r.latency for r in channel_results):.2f}s')
+
+    return report.success_count
+
+async def send_notification(title: str, content: str, formats: dict | None = None, attachments: list | None = None, dedup_key: str | None = None) -> list:
+    """先写入通知发件箱再投递，失败的渠道短暂等待后重试，仍失败的留给下一次运行；今天已发送过相同内容的渠道跳过"""
+    notify = get_notify()
+    channels = notify.get_configured_channels()
+    if not channels:
+        print('[Notify]: No notification channel configured, skipping')
+        return []
+
+    outbox = NotificationOutbox()
+    try:
+        queued = outbox.enqueue(title, content, channels, 'text', formats, attachments, dedup_key)
+        if len(queued) < len(channels):
+            print(f"[通知] 今天已向 {', '.join(c for c in channels if c not in queued)} 发送过相同内容，跳过")
+        return await outbox.flush(notify, wait=NOTIFY_RETRY_WAIT)
+    except sqlite3.Error as e:
+        print(f'[WARNING] 通知发件箱不可用: {e}，直接发送')
+        return await notify.push_message_async(title, content, 'text', formats=formats, attachments=attachments)
+    finally:
+        outbox.close()
+
+def last_notified_at() -> float | None:
+    """上一次成功推送通知的时间"""
+    outbox = NotificationOutbox()
+    try:
+        return outbox.last_sent_at()
+    except sqlite3.Error as e:
+        print(f'[WARNING] 通知发件箱不可用: {e}')
+        return None
+    finally:
+        outbox.close()
+
+async def flush_notifications():
+    """投递发件箱中到了重试时间的消息"""
+    notify = get_notify()
+    if not notify.get_configured_channels(): return
+    outbox = NotificationOutbox()
+    try:
+        if outbox.pending_count(): await outbox.flush(notify)
+    except sqlite3.Error as e:
+        print(f'[WARNING] 通知发件箱不可用: {e}')
+    finally:
+        outbox.close()
+
+def export_trace(app_config: AppConfig):
+    if tracer.enabled:
+        for path in tracer.export(Path(app_config.trace_dir), app_config.trace_formats):
+            print(f'[追踪] 已写入 {path}')
+        tracer.spans.clear()
+
+async def run_check_in(app_config: AppConfig, accounts: Iterable[AccountConfig], force: bool = False, ctx: RunContext | None = None) -> int:
+    """执行一轮签到、记录余额并推送通知，返回成功的账号数"""
+    print(f'[时间] {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}')
+    report = await process_accounts(app_config, accounts, force, ctx)
+    success_count = await publish_report(report)
+    export_trace(app_config)
+    return success_count
+
+def describe_accounts(accounts) -> str:
+    if isinstance(accounts, AccountsFile):
+        return f'从 {accounts.path} 逐条读取账号'
+    return f'共发现 {len(accounts)} 个账号'
+
+def check_config(schedule: str | None = None) -> bool:
+    """只校验配置，不发起请求、不启动浏览器，用于部署前或批量任务启动前的快速检查"""
+    print('[系统] AnyRouter.top 自动签到 (检查配置)')
+    try:
+        app_config, accounts, cron = load_daemon_config(schedule)
+    except ValueError as e:
+        print(f'[失败] {e}')
+        return False
+    if not accounts: return False
+
+    provider_counts: dict[str, int] = {}
+    duplicates = set()
+    seen = set()
+    for account in accounts:
+        provider_counts[account.provider] = provider_counts.get(account.provider, 0) + 1
+        key = account.get_account_key()
+        if key in seen: duplicates.add(key)
+        seen.add(key)
+    if not seen:
+        print('[失败] 没有可用的账号')
+        return False
+
+    ok = True
+    for name, count in provider_counts.items():
+        provider = app_config.get_provider(name)
+        if provider is None:
+            print(f'[失败] {count} 个账号使用了未配置的服务商: {name}')
+            ok = False
+            continue
+        waf = f'，需要获取 WAF cookies ({provider.waf_solver})' if provider.needs_waf_cookies() else ''
+        print(f'[配置] {name}: {count} 个账号，{provider.domain}{waf}')
+    if duplicates:
+        print(f"[WARNING] 重复的账号: {', '.join(sorted(duplicates))}")
+
+    print(f'[配置] 并发: 账号 {app_config.max_workers}, 浏览器 {app_config.browser_concurrency}, HTTP {app_config.http_concurrency}')
+    print(f'[配置] 常驻模式调度: {cron.expression}')
+    channels = get_notify().get_configured_channels()
+    policy = NotifyPolicy.from_env()
+    print(f"[配置] 通知渠道: {', '.join(channels) or '未配置'}，通知策略: {','.join(sorted(policy.rules))}")
+    print(f"[配置] 检查{'通过' if ok else '未通过'}，共 {len(seen)} 个账号")
+    return ok
+
+async def main(force: bool = False):
+    print('[系统] AnyRouter.top 自动签到 (动态列表排序 + 资金汇总版)')
+
+    app_config = AppConfig.load_from_env()
+    tracer.enabled = app_config.trace_dir is not None
+    accounts = load_accounts_config()
+    if not accounts: sys.exit(1)
+    print(f'[信息] {describe_accounts(accounts)}')
+
+    success_count = await run_check_in(app_config, accounts, force)
+
     # 只要有成功的就算 exit 0，避免 Github Action 频繁报错
     sys.exit(0 if success_count > 0 else 1)
 
+async def run_shard(shard: tuple[int, int], output: str | None = None, force: bool = False):
+    """只处理分到本分片的账号并写出结果文件，余额记录与通知由 --merge 统一完成"""
+    index, count = shard
+    print(f'[系统] AnyRouter.top 自动签到 (分片 {index}/{count})')
+
+    app_config = AppConfig.load_from_env()
+    tracer.enabled = app_config.trace_dir is not None
+    accounts = load_accounts_config()
+    if not accounts: sys.exit(1)
+    print(f'[信息] {describe_accounts(accounts)}')
+
+    report = await process_accounts(app_config, accounts, force, shard=shard)
+    path = Path(output) if output else shard_result_path(index, count)
+    if not write_shard_results(path, index, count, report.results): sys.exit(1)
+    print(f'[分片] {report.account_count} 个账号的结果已写入 {path}')
+    export_trace(app_config)
+
+    # 分到的账号全部失败才算失败，没有分到账号的分片视为成功
+    sys.exit(0 if report.success_count > 0 or not report.account_count else 1)
+
+async def merge_shards(paths: list[str]):
+    """合并各分片的结果文件，生成汇总并只推送一次通知"""
+    print('[系统] AnyRouter.top 自动签到 (合并分片结果)')
+    try:
+        report = ReportAggregator(load_shard_results(paths))
+    except ValueError as e:
+        print(f'[失败] {e}')
+        sys.exit(1)
+    print(f'[信息] 共合并 {report.account_count} 个账号的结果')
+
+    success_count = await publish_report(report)
+    sys.exit(0 if success_count > 0 else 1)
+
+def load_daemon_config(schedule: str | None = None, jitter: int | None = None):
+    """加载常驻模式的配置，命令行参数优先于环境变量；cron 表达式非法或永远不会触发时抛出 ValueError"""
+    app_config = AppConfig.load_from_env()
+    if schedule: app_config.schedule = schedule
+    if jitter is not None: app_config.schedule_jitter = max(0, jitter)
+    tracer.enabled = app_config.trace_dir is not None
+    cron = CronSchedule(app_config.schedule)
+    # 能解析但永远匹配不到的表达式 (如 0 0 31 2 *) 在这里拒绝，而不是在调度循环中才出错退出
+    cron.next_after(datetime.now())
+    return app_config, load_accounts_config(), cron
+
+def reload_daemon_config(dotenv_path: str, schedule: str | None = None, jitter: int | None = None):
+    """配置文件变化后重新加载，新配置无效时返回 None 并继续使用原配置"""
+    if dotenv_path: load_dotenv(dotenv_path, override=True)
+    get_notify(reload=True)
+    try:
+        app_config, accounts, cron = load_daemon_config(schedule, jitter)
+    except ValueError as e:
+        print(f'[WARNING] 重新加载配置失败: {e}，继续使用原配置')
+        return None
+    if not accounts:
+        print('[WARNING] 重新加载的账号配置无效，继续使用原配置')
+        return None
+    print(f'[调度] 配置已重新加载，{describe_accounts(accounts)}，调度: {cron.expression}')
+    return app_config, accounts, cron
+
+async def run_daemon(force: bool = False, schedule: str | None = None, jitter: int | None = None):
+    """常驻运行：按 cron 表达式定时签到，浏览器与连接池在多次运行之间保持复用，配置文件变化时自动重新加载"""
+    print('[系统] AnyRouter.top 自动签到 (常驻模式)')
+    dotenv_path = find_dotenv(usecwd=True)
+    try:
+        app_config, accounts, cron = load_daemon_config(schedule, jitter)
+    except ValueError as e:
+        print(f'[失败] {e}')
+        sys.exit(1)
+    if not accounts: sys.exit(1)
+    # 账号文件每轮都会重新读取，这里只需关注 .env 的变化
+    watcher = FileWatcher([dotenv_path] if dotenv_path else [])
+    print(f'[信息] {describe_accounts(accounts)}，调度: {cron.expression}，账号错开: {app_config.schedule_jitter}s')
+
+    ctx = RunContext.from_config(app_config)
+    try:
+        while True:
+            next_run = cron.next_after(datetime.now())
+            print(f'[调度] 下次运行时间: {next_run.strftime("%Y-%m-%d %H:%M")}')
+            while (remaining := (next_run - datetime.now()).total_seconds()) > 0:
+                await asyncio.sleep(min(remaining, CONFIG_CHECK_INTERVAL))
+                await flush_notifications()
+                if not watcher.changed(): continue
+                reloaded = reload_daemon_config(dotenv_path, schedule, jitter)
+                if not reloaded: continue
+                app_config, accounts, cron = reloaded
+                await ctx.close()
+                ctx = RunContext.from_config(app_config)
+                next_run = cron.next_after(datetime.now())
+                print(f'[调度] 下次运行时间: {next_run.strftime("%Y-%m-%d %H:%M")}')
+
+            ctx.begin_run()
+            try:
+                success_count = await run_check_in(app_config, accounts, force, ctx)
+                print(f'[调度] 本轮完成，成功 {success_count} 个账号')
+            except Exception as e:
+                print(f'[失败] 本轮签到异常: {e}')
+    finally:
+        await ctx.close()
+
+def shard_arg(text: str) -> tuple[int, int]:
+    try:
+        return parse_shard(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='AnyRouter 多账号自动签到')
+    parser.add_argument('--force', action='store_true', help='忽略签到台账，重新处理今天已签到成功的账号')
+    parser.add_argument('--daemon', action='store_true', help='常驻运行，按 CHECKIN_SCHEDULE 定时签到')
+    parser.add_argument('--schedule', help='常驻模式的 cron 表达式 (分 时 日 月 周)，覆盖 CHECKIN_SCHEDULE')
+    parser.add_argument('--jitter', type=int, help='各账号错开启动的最大秒数，覆盖 CHECKIN_JITTER')
+    parser.add_argument('--shard', type=shard_arg, metavar='i/N', help='只处理按账号哈希分到第 i 个(共 N 个)分片的账号，结果写入文件等待合并')
+    parser.add_argument('--shard-output', metavar='PATH', help='分片结果文件路径，默认为 STATE_DIR/shards/shard-i-of-N.json')
+    parser.add_argument('--merge', nargs='+', metavar='PATH', help='合并分片结果文件(或所在目录)，生成汇总并推送通知')
+    parser.add_argument('--check-config', '--dry-run', action='store_true', help='只校验服务商、账号与通知配置，不执行签到')
+    return parser.parse_args(argv)
+
 if __name__ == '__main__':
+    args = parse_args()
     try:
-        asyncio.run(main())
+        if args.check_config:
+            sys.exit(0 if check_config(args.schedule) else 1)
+        elif args.merge:
+            asyncio.run(merge_shards(args.merge))
+        elif args.shard:
+            asyncio.run(run_shard(args.shard, args.shard_output, force=args.force))
+        elif args.daemon:
+            asyncio.run(run_daemon(force=args.force, schedule=args.schedule, jitter=args.jitter))
+        else:
+            asyncio.run(main(force=args.force))
     except KeyboardInterrupt:
         sys.exit(1)
@@ -0,0 +1,145 @@
+import asyncio
+import io
+import json
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import checkin
+from utils import config
+from utils.config import AccountsFile, AppConfig, load_accounts_config
+from utils.runtime import RunContext
+
+
+def test_json_lines_reports_errors_per_record(tmp_path, capsys):
+	path = tmp_path / 'accounts.jsonl'
+	path.write_text(
+		'\n'.join(
+			[
+				'{"cookies": {"session": "a"}, "api_user": "1"}',
+				'# 注释行',
+				'{"cookies": "session=b", "api_user": "2", "name": "B"}',
+				'{"cookies": {"session": "c"}}',
+				'{not json',
+				'',
+				'{"cookies": {"session": "e"}, "api_user": "5", "provider": "agentrouter"}',
+			]
+		),
+		encoding='utf-8',
+	)
+
+	accounts = list(AccountsFile(path))
+	output = capsys.readouterr().out
+
+	assert [a.api_user for a in accounts] == ['1', '2', '5']
+	# 跳过的记录不影响后续账号的默认名称
+	assert [a.get_display_name(0) for a in accounts] == ['Account 1', 'B', 'Account 5']
+	assert accounts[2].provider == 'agentrouter'
+	assert 'line 4: Account 3 missing required fields' in output
+	assert 'line 5: invalid JSON' in output
+	# 每次迭代都重新读取文件
+	assert len(list(AccountsFile(path))) == 3
+
+
+def test_json_array_is_parsed_incrementally(tmp_path, monkeypatch, capsys):
+	records = [{'cookies': {'session': 'x' * 50}, 'api_user': str(i)} for i in range(200)]
+	records[10] = {'api_user': '10'}
+	path = tmp_path / 'accounts.json'
+	path.write_text('\ufeff  ' + json.dumps(records, indent=2), encoding='utf-8')
+
+	# 用很小的缓冲区覆盖记录被截断的情况
+	iter_json_array = config._iter_json_array
+	monkeypatch.setattr(config, '_iter_json_array', lambda f: iter_json_array(f, chunk_size=64))
+
+	accounts = list(AccountsFile(path))
+
+	assert len(accounts) == 199
+	assert accounts[-1].api_user == '199'
+	assert 'item 11: Account 11 missing required fields' in capsys.readouterr().out
+
+
+def test_json_array_value_split_across_chunks():
+	records = config._iter_json_array(io.StringIO('[12345, 6, true, "abcdef"]'), chunk_size=3)
+
+	# 数字在缓冲区末尾被截断时，要等到读到 , 或 ] 才算完整
+	assert list(records) == [(1, 12345), (2, 6), (3, True), (4, 'abcdef')]
+
+
+def test_malformed_json_array_item_is_skipped(tmp_path, monkeypatch, capsys):
+	path = tmp_path / 'accounts.json'
+	path.write_text(
+		'[{"cookies": {}, "api_user": "1"},\n'
+		' {"cookies": {}, "api_user": "2" "name": "B"},\n'
+		' {"cookies": "a=1, b=]", "api_user": "3"}]',
+		encoding='utf-8',
+	)
+	iter_json_array = config._iter_json_array
+	monkeypatch.setattr(config, '_iter_json_array', lambda f: iter_json_array(f, chunk_size=8))
+
+	accounts = list(AccountsFile(path))
+	output = capsys.readouterr().out
+
+	assert [a.api_user for a in accounts] == ['1', '3']
+	assert "item 2: invalid JSON: Expecting ',' delimiter (byte offset 68)" in output
+	assert 'Failed to parse' not in output
+
+
+def test_truncated_json_array_keeps_parsed_accounts(tmp_path, capsys):
+	path = tmp_path / 'accounts.json'
+	path.write_text('[{"cookies": {}, "api_user": "1"}, {"cookies": {}, "api_', encoding='utf-8')
+
+	accounts = list(AccountsFile(path))
+
+	assert [a.api_user for a in accounts] == ['1']
+	assert 'Failed to parse' in capsys.readouterr().out
+
+
+def test_load_accounts_config_prefers_file(tmp_path, monkeypatch):
+	path = tmp_path / 'accounts.jsonl'
+	path.write_text('{"cookies": {}, "api_user": "1"}\n', encoding='utf-8')
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS', '[{"cookies": {}, "api_user": "env"}]')
+
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS_FILE', str(path))
+	assert isinstance(load_accounts_config(), AccountsFile)
+
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS_FILE', str(tmp_path / 'missing.jsonl'))
+	assert load_accounts_config() is None
+
+	monkeypatch.delenv('ANYROUTER_ACCOUNTS_FILE')
+	assert [a.api_user for a in load_accounts_config()] == ['env']
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS', '[{"cookies": {}, "api_user": "1"}, {"cookies": {}}]')
+	assert load_accounts_config() is None
+
+
+def test_account_stream_reads_ahead_only_a_bounded_number(monkeypatch):
+	app_config = AppConfig(providers={}, max_workers=2)
+	read = 0
+	max_read_ahead = 0
+	processed = 0
+
+	def items():
+		nonlocal read
+		for i in range(50):
+			read += 1
+			yield i, config.AccountConfig(cookies={}, api_user=str(i)), 0.0
+
+	async def fake_check_in(account, index, app_config, ctx=None):
+		nonlocal processed, max_read_ahead
+		max_read_ahead = max(max_read_ahead, read - processed)
+		await asyncio.sleep(0)
+		processed += 1
+		return True, {'success': False, 'error': ''}
+
+	monkeypatch.setattr(checkin, 'check_in_account', fake_check_in)
+
+	async def run():
+		return await checkin.run_account_stream(items(), app_config, RunContext.from_config(app_config))
+
+	results = asyncio.run(run())
+
+	assert sorted(r.index for r in results) == list(range(50))
+	# 队列容量 4 + 2 个 worker 正在处理 + 生产者手中 1 个
+	assert max_read_ahead <= 7
@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.balance_store import BalanceStore
+
+
+def test_record_and_query_by_account_and_time(tmp_path):
+	store = BalanceStore(tmp_path / 'balances.db')
+	store.record_run({'anyrouter:1': {'name': 'A', 'quota': 10.0, 'used': 1.0}}, recorded_at=100)
+	store.record_run({'anyrouter:1': {'name': 'A', 'quota': 35.0, 'used': 2.0}}, recorded_at=200)
+	store.record_run({'anyrouter:1': {'name': 'A', 'quota': 60.0, 'used': 3.0}}, recorded_at=300)
+
+	assert [r.quota for r in store.query('anyrouter:1')] == [10.0, 35.0, 60.0]
+	assert [r.recorded_at for r in store.query('anyrouter:1', start=150, end=300)] == [200, 300]
+	assert store.query('anyrouter:2') == []
+	store.close()
+
+
+def test_latest_record_per_account(tmp_path):
+	path = tmp_path / 'balances.db'
+	store = BalanceStore(path)
+	balances = {
+		'anyrouter:1': {'name': 'A', 'quota': 10.0, 'used': 1.0},
+		'agentrouter:2': {'name': 'B', 'quota': 5.0, 'used': 0.0},
+	}
+
+	store.record_run(balances, recorded_at=100)
+	store.record_run({'anyrouter:1': {'name': 'A', 'quota': 12.0, 'used': 1.0}}, recorded_at=200)
+	store.close()
+
+	# 重新打开后仍能读到历史，且按账号取各自最近一次记录
+	store = BalanceStore(path)
+	latest = store.get_latest()
+	assert latest['anyrouter:1'].quota == 12.0
+	assert latest['agentrouter:2'].quota == 5.0
+	assert store.get_latest(before=150)['anyrouter:1'].quota == 10.0
+	store.close()
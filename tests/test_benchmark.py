@@ -0,0 +1,28 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import checkin
+from benchmarks.run_benchmark import parse_args, percentile, run_scenario
+
+
+def test_percentile():
+	assert percentile([], 50) == 0.0
+	assert percentile([3.0, 1.0, 2.0, 4.0], 50) == 2.0
+	assert percentile([float(i) for i in range(1, 101)], 95) == 95.0
+
+
+def test_scenario_against_mock_server_solves_challenge():
+	run_accounts = checkin.run_accounts
+
+	result = asyncio.run(run_scenario(3, parse_args(['--workers', '2'])))
+
+	assert result['success'] == 3
+	assert result['browser_launches'] == 0
+	# 每个账号: 挑战页 + 带 acw_sc__v2 重新请求登录页 + 用户信息 + 签到
+	assert result['requests'] == {'/login': 6, '/api/user/self': 3, '/api/user/sign_in': 3}
+	assert checkin.run_accounts is run_accounts
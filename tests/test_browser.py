@@ -0,0 +1,205 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils import browser
+
+
+class FakeContext:
+	def __init__(self, batches: list[list[dict]]):
+		self.batches = batches
+		self.calls = 0
+		self.handler = None
+
+	async def cookies(self):
+		batch = self.batches[min(self.calls, len(self.batches) - 1)]
+		self.calls += 1
+		return batch
+
+	async def route(self, pattern, handler):
+		self.handler = handler
+
+
+class FakeRoute:
+	def __init__(self, url: str, resource_type: str):
+		self.request = SimpleNamespace(url=url, resource_type=resource_type)
+		self.action = None
+
+	async def abort(self):
+		self.action = 'abort'
+
+	async def continue_(self):
+		self.action = 'continue'
+
+
+def test_wait_for_cookies_returns_as_soon_as_all_present(monkeypatch):
+	monkeypatch.setattr(browser, 'COOKIE_POLL_INTERVAL', 0)
+	context = FakeContext(
+		[
+			[{'name': 'acw_tc', 'value': 'a'}],
+			[{'name': 'acw_tc', 'value': 'a'}, {'name': 'acw_sc__v2', 'value': ''}],
+			[{'name': 'acw_tc', 'value': 'a'}, {'name': 'acw_sc__v2', 'value': 'b'}],
+		]
+	)
+
+	cookies = asyncio.run(browser.wait_for_cookies(context, ['acw_tc', 'acw_sc__v2'], timeout=5))
+
+	assert context.calls == 3
+	assert {c['name'] for c in cookies} == {'acw_tc', 'acw_sc__v2'}
+
+
+def test_wait_for_cookies_times_out(monkeypatch):
+	monkeypatch.setattr(browser, 'COOKIE_POLL_INTERVAL', 0.01)
+	context = FakeContext([[{'name': 'acw_tc', 'value': 'a'}]])
+
+	assert asyncio.run(browser.wait_for_cookies(context, ['acw_tc', 'cdn_sec_tc'], timeout=0.05)) is None
+	assert context.calls > 1
+
+
+def test_block_unneeded_resources():
+	context = FakeContext([[]])
+	asyncio.run(browser.block_unneeded_resources(context, 'https://anyrouter.top/login'))
+
+	def action(url, resource_type):
+		route = FakeRoute(url, resource_type)
+		asyncio.run(context.handler(route))
+		return route.action
+
+	assert action('https://anyrouter.top/login', 'document') == 'continue'
+	assert action('https://anyrouter.top/assets/index.js', 'script') == 'continue'
+	assert action('https://cdn.anyrouter.top/app.js', 'script') == 'continue'
+	assert action('https://www.googletagmanager.com/gtag.js', 'script') == 'abort'
+	assert action('https://anyrouter.top/logo.png', 'image') == 'abort'
+	assert action('https://anyrouter.top/font.woff2', 'font') == 'abort'
+	assert action('https://evil-anyrouter.top/x.js', 'script') == 'abort'
+
+
+def test_launch_options_per_mode():
+	assert browser.get_launch_options('headed') == {'headless': False}
+	assert browser.get_launch_options('headless') == {'headless': True, 'channel': 'chromium'}
+	assert browser.get_launch_options('headless-shell') == {'headless': True}
+
+
+def test_profile_template_is_created_once_and_copied_without_cookies(tmp_path, monkeypatch):
+	template = tmp_path / 'profile'
+	seen_dirs = []
+
+	def simulate_browser(path: Path):
+		seen_dirs.append(sorted(p.name for p in path.rglob('*')))
+		# 模拟浏览器写入缓存、cookies 与锁文件
+		(path / 'Default' / 'Cache').mkdir(parents=True, exist_ok=True)
+		(path / 'Default' / 'Cache' / 'data_0').write_text('cached')
+		(path / 'Default' / 'Cookies').write_text('acw_tc=stale')
+		(path / 'SingletonLock').write_text('')
+
+	class FakePage:
+		def __init__(self, context):
+			self.context = context
+
+		async def close(self):
+			self.context.pages.remove(self)
+
+	class FakePersistentContext:
+		def __init__(self, user_data_dir):
+			self.user_data_dir = Path(user_data_dir)
+			self.pages = [FakePage(self)]
+			self.cookie_jar = ['acw_tc=previous']
+			self.routes = 0
+
+		async def new_page(self):
+			page = FakePage(self)
+			self.pages.append(page)
+			return page
+
+		async def route(self, pattern, handler):
+			self.routes += 1
+
+		async def unroute(self, pattern):
+			self.routes = 0
+
+		async def clear_cookies(self):
+			self.cookie_jar.clear()
+
+		async def close(self):
+			pass
+
+	class FakeChromium:
+		async def launch_persistent_context(self, user_data_dir, **kwargs):
+			simulate_browser(Path(user_data_dir))
+			assert kwargs['headless'] is True
+			return FakePersistentContext(user_data_dir)
+
+	class FakePlaywright:
+		chromium = FakeChromium()
+
+		async def stop(self):
+			pass
+
+	class FakeStarter:
+		async def start(self):
+			return FakePlaywright()
+
+	monkeypatch.setattr(browser, 'async_playwright', FakeStarter)
+
+	async def run():
+		pool = browser.BrowserPool('headless-shell', template)
+		for _ in range(3):
+			async with pool.new_context() as context:
+				# 每个账号开始时 cookies 已清空，上一个账号的页面与拦截规则也已移除
+				assert context.cookie_jar == [] and context.routes == 0 and len(context.pages) == 1
+				await context.route('**/*', None)
+				await context.new_page()
+				context.cookie_jar.append('acw_tc=account')
+		await pool.close()
+		return pool
+
+	# 每次运行只启动一个持久化 context，账号共用
+	assert asyncio.run(run()).launch_count == 1
+	assert seen_dirs[0] == []
+	assert asyncio.run(run()).launch_count == 1
+	# 下一次运行从模板复制，带有缓存但不含 cookies 与锁文件
+	assert seen_dirs[1] == ['Cache', 'Default', 'data_0']
+	assert (template / 'Default' / 'Cache' / 'data_0').exists()
+	assert not (template / 'Default' / 'Cookies').exists()
+
+
+async def report_worker(delay: float, browser_pool):
+	await asyncio.sleep(delay)
+	return os.getpid(), browser_pool.mode
+
+
+async def launch_worker(browser_pool):
+	browser_pool.launch_count += 1
+
+
+def test_browser_worker_pool_spreads_jobs_across_processes():
+	async def run():
+		pool = browser.BrowserWorkerPool(2, 'headless-shell')
+		try:
+			return await asyncio.gather(*(pool.run(report_worker, 0.5) for _ in range(4)))
+		finally:
+			await pool.close()
+
+	results = asyncio.run(run())
+
+	assert {mode for _, mode in results} == {'headless-shell'}
+	assert len({pid for pid, _ in results}) == 2
+	assert os.getpid() not in {pid for pid, _ in results}
+
+
+def test_browser_worker_pool_sums_launches_from_processes():
+	async def run():
+		pool = browser.BrowserWorkerPool(2)
+		try:
+			await asyncio.gather(*(pool.run(launch_worker) for _ in range(3)))
+			return pool.launch_count
+		finally:
+			await pool.close()
+
+	assert asyncio.run(run()) == 3
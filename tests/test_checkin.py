@@ -0,0 +1,241 @@
+import asyncio
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+
+import checkin
+from utils.config import AccountConfig, AppConfig, ProviderConfig
+from utils.cookie_cache import WafCookieCache
+from utils.http import HttpClientPool
+from utils.retry import CircuitOpenError
+from utils.runtime import RunContext
+
+
+def make_accounts(count: int) -> list[AccountConfig]:
+	return [AccountConfig(cookies={'session': f's{i}'}, api_user=str(i), name=f'Account {i + 1}') for i in range(count)]
+
+
+def test_run_accounts_is_bounded_and_keeps_order(monkeypatch):
+	app_config = AppConfig(providers={}, max_workers=3)
+	in_flight = 0
+	peak = 0
+
+	async def fake_check_in(account, index, app_config, ctx=None):
+		nonlocal in_flight, peak
+		in_flight += 1
+		peak = max(peak, in_flight)
+		# 让后面的账号先完成，验证结果仍按原始顺序返回
+		await asyncio.sleep(0.01 * (10 - index))
+		in_flight -= 1
+		return True, {'success': True, 'quota': float(index), 'used_quota': 0.0, 'display': ''}
+
+	monkeypatch.setattr(checkin, 'check_in_account', fake_check_in)
+
+	async def run():
+		return await checkin.run_accounts(make_accounts(10), app_config, RunContext.from_config(app_config))
+
+	results = asyncio.run(run())
+
+	assert peak == 3
+	assert [r.index for r in results] == list(range(10))
+	assert all(r.elapsed >= 0 for r in results)
+
+
+def test_run_accounts_captures_exceptions(monkeypatch):
+	app_config = AppConfig(providers={}, max_workers=2)
+
+	async def fake_check_in(account, index, app_config, ctx=None):
+		if index == 1:
+			raise RuntimeError('boom')
+		return True, {'success': False, 'error': 'HTTP 401'}
+
+	monkeypatch.setattr(checkin, 'check_in_account', fake_check_in)
+
+	async def run():
+		return await checkin.run_accounts(make_accounts(3), app_config, RunContext.from_config(app_config))
+
+	results = asyncio.run(run())
+
+	assert results[1].status == 'error' and results[1].error == 'boom'
+	assert results[0].success and results[2].success
+	assert results[0].error == 'HTTP 401' and results[0].quota is None
+
+
+def test_run_accounts_staggers_start_by_delay(monkeypatch):
+	app_config = AppConfig(providers={}, max_workers=3)
+	started = []
+
+	async def fake_check_in(account, index, app_config, ctx=None):
+		started.append(index)
+		return True, {'success': False, 'error': ''}
+
+	monkeypatch.setattr(checkin, 'check_in_account', fake_check_in)
+
+	async def run():
+		return await checkin.run_accounts(
+			make_accounts(3), app_config, RunContext.from_config(app_config), delays=[0.06, 0.0, 0.03]
+		)
+
+	results = asyncio.run(run())
+
+	assert started == [1, 2, 0]
+	assert [r.index for r in results] == [0, 1, 2]
+
+
+def test_reload_daemon_config_keeps_previous_on_invalid(monkeypatch, tmp_path):
+	dotenv = tmp_path / '.env'
+	dotenv.write_text(
+		'ANYROUTER_ACCOUNTS=[{"cookies": {"session": "s"}, "api_user": "1"}]\nCHECKIN_SCHEDULE=*/5 * * * *\n'
+	)
+	monkeypatch.delenv('ANYROUTER_ACCOUNTS', raising=False)
+	monkeypatch.delenv('CHECKIN_SCHEDULE', raising=False)
+
+	app_config, accounts, cron = checkin.reload_daemon_config(str(dotenv), jitter=30)
+	assert cron.expression == '*/5 * * * *'
+	assert app_config.schedule_jitter == 30
+	assert len(accounts) == 1
+
+	dotenv.write_text('CHECKIN_SCHEDULE=not a cron\n')
+	assert checkin.reload_daemon_config(str(dotenv)) is None
+	# 能解析但永远不会触发的表达式同样保留原配置
+	dotenv.write_text('CHECKIN_SCHEDULE=0 0 31 2 *\n')
+	assert checkin.reload_daemon_config(str(dotenv)) is None
+	monkeypatch.delenv('ANYROUTER_ACCOUNTS', raising=False)
+	monkeypatch.delenv('CHECKIN_SCHEDULE', raising=False)
+
+
+def test_import_does_not_load_heavy_dependencies():
+	code = 'import sys, checkin; print(sorted(m for m in ("playwright", "smtplib") if m in sys.modules))'
+	output = subprocess.run([sys.executable, '-c', code], cwd=project_root, capture_output=True, text=True, check=True)
+
+	assert output.stdout.strip() == '[]'
+
+
+def test_notification_config_is_read_on_first_use(monkeypatch):
+	from utils import notify as notify_module
+
+	monkeypatch.setattr(notify_module, '_notify', None)
+	monkeypatch.setenv('BARK_KEY', 'key')
+	assert notify_module.notify.get_configured_channels() == ['Bark']
+	assert notify_module.get_notify() is notify_module.notify
+
+	monkeypatch.delenv('BARK_KEY')
+	assert notify_module.get_notify(reload=True).get_configured_channels() == []
+
+
+def test_check_config(monkeypatch, capsys):
+	monkeypatch.delenv('ANYROUTER_ACCOUNTS_FILE', raising=False)
+	monkeypatch.delenv('CHECKIN_SCHEDULE', raising=False)
+	accounts = [
+		{'cookies': {'session': 'a'}, 'api_user': '1'},
+		{'cookies': {'session': 'b'}, 'api_user': '2', 'provider': 'agentrouter'},
+	]
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+	assert checkin.check_config()
+	output = capsys.readouterr().out
+	assert '[配置] anyrouter: 1 个账号' in output and '检查通过，共 2 个账号' in output
+
+	accounts.append({'cookies': 'c', 'api_user': '3', 'provider': 'other'})
+	monkeypatch.setenv('ANYROUTER_ACCOUNTS', json.dumps(accounts))
+	assert not checkin.check_config()
+	assert '1 个账号使用了未配置的服务商: other' in capsys.readouterr().out
+
+	assert not checkin.check_config(schedule='not a cron')
+	assert not checkin.check_config(schedule='0 0 31 2 *')
+	assert 'never matches' in capsys.readouterr().out
+
+
+def test_cached_waf_cookies_are_only_replaced_on_waf_block(monkeypatch, tmp_path):
+	provider = ProviderConfig(
+		name='anyrouter', domain='https://anyrouter.top', bypass_method='waf_cookies', waf_cookie_names=['acw_tc']
+	)
+	app_config = AppConfig(providers={'anyrouter': provider})
+	account = AccountConfig(cookies={'session': 's'}, api_user='1')
+	requests = []
+	solved = []
+	user_info_status = 200
+
+	async def handler(request: httpx.Request) -> httpx.Response:
+		requests.append((request.method, request.headers['cookie']))
+		if request.method == 'POST':
+			return httpx.Response(200, json={'success': True})
+		if 'acw_tc=old' in request.headers['cookie'] and user_info_status != 200:
+			return httpx.Response(user_info_status, json={'success': False})
+		return httpx.Response(200, json={'success': True, 'data': {'quota': 1000000, 'used_quota': 500000}})
+
+	async def fake_solve(account_name, login_url, cookie_names, **kwargs):
+		solved.append(account_name)
+		return {'acw_tc': 'new'}, None
+
+	monkeypatch.setattr(checkin, 'get_waf_cookies_with_playwright', fake_solve)
+
+	def run(status: int):
+		nonlocal user_info_status
+		user_info_status = status
+		requests.clear()
+		solved.clear()
+		cache = WafCookieCache(tmp_path / 'waf_cookies.json')
+		cache.set(provider.domain, {'acw_tc': 'old'})
+		ctx = RunContext.from_config(app_config)
+		ctx.cookie_cache = cache
+		ctx.http_clients = HttpClientPool(transport=httpx.MockTransport(handler))
+
+		async def check_in():
+			try:
+				return await checkin.check_in_account(account, 0, app_config, ctx)
+			finally:
+				await ctx.http_clients.close()
+
+		return asyncio.run(check_in()), cache.get(provider.domain)
+
+	# 校验通过时复用校验取得的余额，不再重复请求用户信息
+	(success, user_info), cached = run(200)
+	assert success and user_info['quota'] == 2.0
+	assert [method for method, _ in requests] == ['GET', 'POST'] and not solved
+	# 401 是账号登录失效，缓存的 WAF cookies 仍然保留
+	(success, user_info), cached = run(401)
+	assert user_info['error'] == 'HTTP 401'
+	assert [method for method, _ in requests] == ['GET', 'POST'] and not solved
+	assert cached == {'acw_tc': 'old'}
+	# 403 才重新获取 WAF cookies
+	(success, user_info), cached = run(403)
+	assert user_info['quota'] == 2.0 and solved == ['Account 1']
+	assert [method for method, _ in requests] == ['GET', 'GET', 'POST']
+	assert 'acw_tc=new' in requests[1][1] and cached == {'acw_tc': 'new'}
+
+
+def test_open_circuit_during_cache_validation_skips_browser(monkeypatch, tmp_path):
+	provider = ProviderConfig(
+		name='anyrouter', domain='https://anyrouter.top', bypass_method='waf_cookies', waf_cookie_names=['acw_tc']
+	)
+	app_config = AppConfig(providers={'anyrouter': provider})
+	solved = []
+
+	async def open_circuit(*args, **kwargs):
+		raise CircuitOpenError('anyrouter circuit open')
+
+	async def fake_solve(*args, **kwargs):
+		solved.append(args[0])
+		return {'acw_tc': 'new'}, None
+
+	monkeypatch.setattr(checkin, 'request_with_retry', open_circuit)
+	monkeypatch.setattr(checkin, 'get_waf_cookies_with_playwright', fake_solve)
+
+	async def run():
+		ctx = RunContext.from_config(app_config)
+		ctx.cookie_cache = WafCookieCache(tmp_path / 'waf_cookies.json')
+		ctx.cookie_cache.set(provider.domain, {'acw_tc': 'old'})
+		account = AccountConfig(cookies={'session': 's'}, api_user='1')
+		return await checkin.check_in_account(account, 0, app_config, ctx), ctx.cookie_cache.get(provider.domain)
+
+	(success, user_info), cached = asyncio.run(run())
+
+	assert not success and user_info['error'] == '服务商连续失败，已熔断'
+	assert not solved and cached == {'acw_tc': 'old'}
@@ -0,0 +1,59 @@
+import json
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.cookie_cache import WafCookieCache
+
+DOMAIN = 'https://anyrouter.top'
+
+
+def test_roundtrip_and_ttl(tmp_path):
+	path = tmp_path / 'waf_cookies.json'
+	cache = WafCookieCache(path, default_ttl=600)
+	cache.set(DOMAIN, {'acw_tc': 'a'}, time.time() + 300)
+	cache.save()
+
+	reloaded = WafCookieCache(path, default_ttl=600)
+	assert reloaded.get(DOMAIN) == {'acw_tc': 'a'}
+	assert 290 < reloaded.ttl(DOMAIN) <= 300
+	assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_default_ttl_caps_expiry(tmp_path):
+	cache = WafCookieCache(tmp_path / 'c.json', default_ttl=60)
+	cache.set(DOMAIN, {'acw_tc': 'a'}, time.time() + 86400)
+
+	assert cache.ttl(DOMAIN) <= 60
+
+
+def test_expired_entries_are_ignored(tmp_path):
+	path = tmp_path / 'c.json'
+	path.write_text(json.dumps({DOMAIN: {'cookies': {'acw_tc': 'old'}, 'expires_at': time.time() - 1}}))
+
+	assert WafCookieCache(path).get(DOMAIN) is None
+
+
+def test_account_scope_and_invalidate(tmp_path):
+	cache = WafCookieCache(tmp_path / 'c.json', scope='account')
+	cache.set(DOMAIN, {'acw_tc': 'a'}, account_key='anyrouter:1')
+
+	assert cache.get(DOMAIN, 'anyrouter:1') == {'acw_tc': 'a'}
+	assert cache.get(DOMAIN, 'anyrouter:2') is None
+
+	cache.invalidate(DOMAIN, 'anyrouter:1')
+	assert cache.get(DOMAIN, 'anyrouter:1') is None
+
+
+def test_disabled_cache(tmp_path):
+	path = tmp_path / 'c.json'
+	cache = WafCookieCache(path, scope='off')
+	cache.set(DOMAIN, {'acw_tc': 'a'})
+	cache.save()
+
+	assert cache.get(DOMAIN) is None
+	assert not path.exists()
@@ -0,0 +1,41 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.http import HttpClientPool, format_cookie_header
+
+
+def test_format_cookie_header():
+	assert format_cookie_header({'session': 'a', 'acw_tc': 'b'}) == 'session=a; acw_tc=b'
+
+
+def test_pool_reuses_client_and_isolates_cookies():
+	seen_cookies = []
+
+	def handler(request: httpx.Request) -> httpx.Response:
+		seen_cookies.append(request.headers.get('cookie'))
+		return httpx.Response(200, json={'success': True}, headers={'set-cookie': 'leak=1; Path=/'})
+
+	async def run():
+		pool = HttpClientPool(transport=httpx.MockTransport(handler))
+		client = pool.get('https://anyrouter.top')
+		assert pool.get('https://anyrouter.top') is client
+		assert pool.get('https://agentrouter.org') is not client
+
+		await client.get('https://anyrouter.top/api/user/self', headers={'Cookie': 'session=a'})
+		await client.get('https://anyrouter.top/api/user/self', headers={'Cookie': 'session=b'})
+		jar_size = len(client.cookies)
+		await pool.close()
+		return jar_size, client.is_closed
+
+	jar_size, closed = asyncio.run(run())
+
+	assert seen_cookies == ['session=a', 'session=b']
+	assert jar_size == 0
+	assert closed
@@ -0,0 +1,103 @@
+import asyncio
+import sys
+from datetime import date
+from pathlib import Path
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+
+import checkin
+from utils.config import AccountConfig, AppConfig, ProviderConfig
+from utils.http import HttpClientPool
+from utils.ledger import RunLedger
+from utils.runtime import RunContext
+
+
+def test_ledger_tracks_daily_success(tmp_path):
+	path = tmp_path / 'ledger.json'
+	ledger = RunLedger(path)
+	today, yesterday = date(2026, 1, 2), date(2026, 1, 1)
+
+	ledger.record('anyrouter:1', True, 25.0, 1.0, day=yesterday)
+	ledger.record('anyrouter:2', False, day=today)
+	assert not ledger.is_done('anyrouter:1', today)
+	assert ledger.is_done('anyrouter:1', yesterday)
+	assert not ledger.is_done('anyrouter:2', today)
+
+	# 获取余额失败时保留上一次的余额
+	ledger.record('anyrouter:1', True, day=today)
+	assert ledger.save()
+
+	reloaded = RunLedger(path)
+	assert reloaded.is_done('anyrouter:1', today)
+	assert reloaded.get('anyrouter:1')['quota'] == 25.0
+	assert reloaded.get('anyrouter:3') is None
+
+
+def test_run_accounts_keeps_original_indexes(monkeypatch):
+	app_config = AppConfig(providers={}, max_workers=2)
+	accounts = [AccountConfig(cookies={'session': 's'}, api_user=str(i)) for i in range(4)]
+	seen = []
+
+	async def fake_check_in(account, index, app_config, ctx=None):
+		seen.append(index)
+		return True, {'success': True, 'quota': 1.0, 'used_quota': 0.0, 'display': ''}
+
+	monkeypatch.setattr(checkin, 'check_in_account', fake_check_in)
+
+	async def run():
+		pending = [1, 3]
+		return await checkin.run_accounts(
+			[accounts[i] for i in pending], app_config, RunContext.from_config(app_config), pending
+		)
+
+	results = asyncio.run(run())
+
+	assert sorted(seen) == [1, 3]
+	assert [r.index for r in results] == [1, 3]
+	assert [r.name for r in results] == ['Account 2', 'Account 4']
+
+
+def test_skipped_result_uses_ledger_balance():
+	account = AccountConfig(cookies={'session': 's'}, api_user='1')
+
+	result = checkin.build_skipped_result(account, 0, {'success': True, 'quota': 25.0, 'used_quota': 1.0})
+	assert result.success and result.status == 'skipped'
+	assert (result.quota, result.used) == (25.0, 1.0)
+
+	result = checkin.build_skipped_result(account, 0, {'success': True, 'quota': None})
+	assert result.success and not result.has_balance
+	assert '今日已签到' in result.error
+
+
+def test_failed_auto_check_in_is_not_marked_done(monkeypatch, tmp_path):
+	monkeypatch.setenv('STATE_DIR', str(tmp_path))
+	provider = ProviderConfig(name='agentrouter', domain='https://agentrouter.org', sign_in_path=None)
+	app_config = AppConfig(providers={'agentrouter': provider}, max_workers=1)
+	account = AccountConfig(cookies={'session': 's'}, api_user='1', provider='agentrouter')
+	status = 401
+
+	async def handler(request: httpx.Request) -> httpx.Response:
+		return httpx.Response(status, json={'success': status == 200, 'data': {'quota': 500000, 'used_quota': 0}})
+
+	def run() -> bool:
+		async def process():
+			ctx = RunContext.from_config(app_config)
+			ctx.http_clients = HttpClientPool(transport=httpx.MockTransport(handler))
+			try:
+				return await checkin.process_accounts(app_config, [account], ctx=ctx)
+			finally:
+				await ctx.close()
+
+		report = asyncio.run(process())
+		return report.results[0].status
+
+	# 访问用户信息即是签到，接口失败时不能记为已完成，重跑时需要再次处理
+	assert run() == 'failed'
+	assert not RunLedger().is_done(account.get_account_key())
+	status = 200
+	assert run() == 'success'
+	assert run() == 'skipped'
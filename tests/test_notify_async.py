@@ -0,0 +1,183 @@
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils import notify
+from utils.notify import ChannelLimits, NotificationKit, split_message
+
+NOTIFY_ENV = [
+	'EMAIL_USER',
+	'EMAIL_PASS',
+	'EMAIL_TO',
+	'PUSHPLUS_TOKEN',
+	'SERVERPUSHKEY',
+	'DINGDING_WEBHOOK',
+	'FEISHU_WEBHOOK',
+	'WEIXIN_WEBHOOK',
+	'GOTIFY_URL',
+	'GOTIFY_TOKEN',
+	'TELEGRAM_BOT_TOKEN',
+	'TELEGRAM_CHAT_ID',
+	'BARK_KEY',
+]
+
+
+@pytest.fixture
+def kit(monkeypatch):
+	for name in NOTIFY_ENV:
+		monkeypatch.delenv(name, raising=False)
+	monkeypatch.setenv('DINGDING_WEBHOOK', 'https://dingtalk.example.com/send')
+	monkeypatch.setenv('WEIXIN_WEBHOOK', 'https://wecom.example.com/send')
+	monkeypatch.setenv('BARK_KEY', 'bark_key')
+	return NotificationKit()
+
+
+def test_only_configured_channels(kit):
+	assert kit.get_configured_channels() == ['DingTalk', 'WeChat Work', 'Bark']
+
+
+def test_push_message_async_runs_channels_in_parallel(kit):
+	requested = []
+
+	async def handler(request: httpx.Request) -> httpx.Response:
+		requested.append(request.url.host)
+		await asyncio.sleep(0.05)
+		if request.url.host == 'wecom.example.com':
+			return httpx.Response(500)
+		return httpx.Response(200, json={'ok': True})
+
+	async def run():
+		async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+			return await kit.push_message_async('标题', '内容', client=client)
+
+	results = asyncio.run(run())
+
+	assert sorted(requested) == ['api.day.app', 'dingtalk.example.com', 'wecom.example.com']
+	assert {r.name: r.success for r in results} == {'DingTalk': True, 'WeChat Work': False, 'Bark': True}
+	# 三个渠道并行发送，总耗时应接近单个渠道的耗时
+	assert max(r.latency for r in results) < 0.15
+	assert results[1].error
+
+
+def test_push_message_async_without_channels(monkeypatch):
+	for name in NOTIFY_ENV:
+		monkeypatch.delenv(name, raising=False)
+
+	assert asyncio.run(NotificationKit().push_message_async('标题', '内容')) == []
+
+
+def test_push_message_async_sends_preferred_format(kit, monkeypatch):
+	monkeypatch.setenv('FEISHU_WEBHOOK', 'https://feishu.example.com/send')
+	kit = NotificationKit()
+	bodies = {}
+
+	async def handler(request: httpx.Request) -> httpx.Response:
+		bodies[request.url.host] = request.content.decode('utf-8')
+		return httpx.Response(200, json={'ok': True})
+
+	async def run():
+		async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+			formats = {'markdown': '**内容**', 'html': '<p>内容</p>'}
+			return await kit.push_message_async('标题', '内容', client=client, formats=formats)
+
+	asyncio.run(run())
+
+	assert '**内容**' in bodies['feishu.example.com']
+	assert '**内容**' not in bodies['dingtalk.example.com'] and '内容' in bodies['dingtalk.example.com']
+
+
+def test_split_message_prefers_paragraphs_then_lines():
+	content = '\n\n'.join(['a' * 4, 'b\nb\nb', 'c' * 12])
+
+	assert split_message(content, None) == [content]
+	assert split_message(content, 100) == [content]
+	assert split_message(content, 9) == ['aaaa', 'b\nb\nb', 'ccccccccc', 'ccc']
+	assert split_message(content, 4) == ['aaaa', 'b\nb', 'b', 'cccc', 'cccc', 'cccc']
+	# 按 UTF-8 字节计算时不会切断多字节字符
+	measure = ChannelLimits().measure
+	assert split_message('余额' * 5, 7, measure) == ['余额', '余额', '余额', '余额', '余额']
+
+
+def test_long_message_is_chunked_and_rate_limited(kit, monkeypatch):
+	monkeypatch.setitem(notify.CHANNEL_LIMITS, 'WeChat Work', ChannelLimits(300, rate=20))
+	content = '\n'.join(f'[Account {i}]\n💰 当前余额: ${i}.0, 已用: $0.0' for i in range(20))
+	sent = []
+
+	async def handler(request: httpx.Request) -> httpx.Response:
+		if request.url.host == 'wecom.example.com':
+			sent.append((time.monotonic(), json.loads(request.content)['text']['content']))
+		return httpx.Response(200, json={'ok': True})
+
+	async def run():
+		async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+			return await kit.push_message_async('标题', content, client=client)
+
+	results = {r.name: r for r in asyncio.run(run())}
+
+	assert results['WeChat Work'].success and results['WeChat Work'].chunks == len(sent) > 1
+	assert results['DingTalk'].chunks == 1
+	assert all(len(text.encode('utf-8')) <= 300 for _, text in sent)
+	assert sent[0][1].startswith(f'标题 (1/{len(sent)})\n[Account 0]')
+	assert '\n'.join(text.split('\n', 1)[1] for _, text in sent) == content
+	# 每秒 20 条，相邻两条至少间隔约 50ms
+	assert sent[-1][0] - sent[0][0] >= 0.04 * (len(sent) - 1)
+
+
+def test_use_digest(kit, monkeypatch):
+	long_content = 'x\n' * 1500
+	assert not kit.use_digest('标题', long_content)
+
+	monkeypatch.setenv('NOTIFY_DETAIL', 'auto')
+	kit = NotificationKit()
+	assert not kit.use_digest('标题', 'short')
+	# 企业微信单条上限 2048 字节
+	assert kit.use_digest('标题', long_content)
+
+	monkeypatch.setenv('NOTIFY_DETAIL', 'digest')
+	assert NotificationKit().use_digest('标题', 'short')
+
+
+def test_digest_threshold_matches_split_length(monkeypatch):
+	for name in NOTIFY_ENV:
+		monkeypatch.delenv(name, raising=False)
+	monkeypatch.setenv('TELEGRAM_BOT_TOKEN', 'token')
+	monkeypatch.setenv('TELEGRAM_CHAT_ID', 'chat')
+	monkeypatch.setenv('NOTIFY_DETAIL', 'auto')
+	monkeypatch.setitem(notify.CHANNEL_LIMITS, 'Telegram', ChannelLimits(4096, count_bytes=False))
+	kit = NotificationKit()
+	title = 'AnyRouter 签到通知'
+	# 正文上限为 4096 减去标题与预留的长度
+	boundary = 4096 - len(title) - notify._CHUNK_RESERVE
+	sent = []
+
+	async def handler(request: httpx.Request) -> httpx.Response:
+		sent.append(request)
+		return httpx.Response(200, json={'ok': True})
+
+	async def parts(content: str) -> int:
+		sent.clear()
+		async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+			await kit.send_channel(client, 'Telegram', title, content, 'text')
+		return len(sent)
+
+	assert not kit.use_digest(title, 'x' * boundary)
+	assert asyncio.run(parts('x' * boundary)) == 1
+	assert kit.use_digest(title, 'x' * (boundary + 1))
+	assert asyncio.run(parts('x' * (boundary + 1))) == 2
+
+
+def test_telegram_content_is_escaped(monkeypatch):
+	monkeypatch.setenv('TELEGRAM_BOT_TOKEN', 'token')
+	monkeypatch.setenv('TELEGRAM_CHAT_ID', '1')
+
+	_, data = NotificationKit()._telegram_request('A&B', '余额 < 1')
+	assert data['text'] == '<b>A&amp;B</b>\n\n余额 &lt; 1'
@@ -0,0 +1,165 @@
+import asyncio
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+import httpx
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import checkin
+from utils import notify
+from utils import outbox as outbox_module
+from utils.notify import ChannelLimits, ChannelResult, NotificationKit
+from utils.outbox import NotificationOutbox
+from utils.results import CheckInResult, ReportAggregator
+
+
+class FakeKit:
+	def __init__(self, channels: list[str], failures: dict[str, int] | None = None):
+		self.channels = channels
+		self.failures = failures or {}
+		self.sent = []
+
+	def get_configured_channels(self) -> list[str]:
+		return self.channels
+
+	async def send_channel(self, client, name, title, content, msg_type, formats=None, attachments=None):
+		if self.failures.get(name, 0) > 0:
+			self.failures[name] -= 1
+			return ChannelResult(name, False, 0.0, 'HTTP 502')
+		self.sent.append((name, title, content, formats, attachments))
+		return ChannelResult(name, True, 0.0)
+
+
+def statuses(outbox: NotificationOutbox) -> dict[str, tuple[str, int]]:
+	rows = outbox.conn.execute('SELECT channel, status, attempts FROM deliveries ORDER BY id').fetchall()
+	return {channel: (status, attempts) for channel, status, attempts in rows}
+
+
+def test_enqueue_deduplicates_per_channel_and_day(tmp_path):
+	outbox = NotificationOutbox(tmp_path / 'outbox.db')
+	today, tomorrow = date(2026, 1, 1), date(2026, 1, 2)
+
+	assert outbox.enqueue('标题', '内容', ['DingTalk', 'Bark'], day=today) == ['DingTalk', 'Bark']
+	assert outbox.enqueue('标题', '内容', ['DingTalk', 'Telegram'], day=today) == ['Telegram']
+	assert outbox.enqueue('标题', '内容 2', ['DingTalk'], day=today) == ['DingTalk']
+	assert outbox.enqueue('标题', '内容', ['DingTalk'], day=tomorrow) == ['DingTalk']
+	# 指定 dedup_key 时按它去重，与内容无关
+	assert outbox.enqueue('标题', 'a', ['Bark'], dedup_key='report-1', day=today) == ['Bark']
+	assert outbox.enqueue('标题', 'b', ['Bark'], dedup_key='report-1', day=today) == []
+	outbox.close()
+
+
+def test_failed_channels_are_retried_with_backoff(tmp_path, monkeypatch):
+	monkeypatch.setattr(outbox_module, 'BACKOFF_BASE', 0.05)
+	outbox = NotificationOutbox(tmp_path / 'outbox.db')
+	kit = FakeKit(['DingTalk', 'Bark'], failures={'Bark': 2})
+	formats = {'html': '<p>内容</p>'}
+	outbox.enqueue('标题', '内容', kit.channels, formats=formats, attachments=[('report.txt', '完整报告')])
+
+	results = asyncio.run(outbox.flush(kit, wait=1.0))
+
+	assert [(r.name, r.success) for r in results] == [
+		('DingTalk', True),
+		('Bark', False),
+		('Bark', False),
+		('Bark', True),
+	]
+	assert kit.sent[1] == ('Bark', '标题', '内容', formats, [('report.txt', '完整报告')])
+	assert statuses(outbox) == {'DingTalk': ('sent', 1), 'Bark': ('sent', 3)}
+	assert outbox.pending_count() == 0
+	outbox.close()
+
+
+def test_pending_deliveries_survive_until_next_run(tmp_path):
+	path = tmp_path / 'outbox.db'
+	outbox = NotificationOutbox(path)
+	kit = FakeKit(['DingTalk', 'Feishu'], failures={'DingTalk': 1})
+	outbox.enqueue('标题', '内容', kit.channels)
+
+	asyncio.run(outbox.flush(kit))
+	assert statuses(outbox) == {'DingTalk': ('pending', 1), 'Feishu': ('sent', 1)}
+	# 重跑时相同内容不会再次发送给已成功的渠道，也不会重复加入待投递的渠道
+	assert outbox.enqueue('标题', '内容', kit.channels) == []
+	outbox.close()
+
+	reopened = NotificationOutbox(path)
+	assert asyncio.run(reopened.flush(kit)) == []
+	reopened.conn.execute('UPDATE deliveries SET next_attempt_at = 0')
+	results = asyncio.run(reopened.flush(kit))
+	assert [(r.name, r.success) for r in results] == [('DingTalk', True)]
+	assert statuses(reopened) == {'DingTalk': ('sent', 2), 'Feishu': ('sent', 1)}
+	reopened.close()
+
+
+def test_gives_up_after_max_attempts_or_removed_channel(tmp_path, monkeypatch):
+	monkeypatch.setattr(outbox_module, 'MAX_ATTEMPTS', 2)
+	monkeypatch.setattr(outbox_module, 'BACKOFF_BASE', 0.01)
+	outbox = NotificationOutbox(tmp_path / 'outbox.db')
+	kit = FakeKit(['Bark'], failures={'Bark': 5})
+	outbox.enqueue('标题', '内容', ['Bark', 'Telegram'])
+
+	asyncio.run(outbox.flush(kit, wait=1.0))
+
+	assert statuses(outbox) == {'Bark': ('failed', 2), 'Telegram': ('failed', 1)}
+	# 彻底失败的消息允许重新加入
+	assert outbox.enqueue('标题', '内容', ['Bark']) == ['Bark']
+
+	outbox.prune(now=time.time() + outbox_module.RETENTION + 1)
+	assert statuses(outbox) == {'Bark': ('pending', 0)}
+	assert outbox.conn.execute('SELECT COUNT(*) FROM messages').fetchone()[0] == 1
+	outbox.close()
+
+
+def test_backlog_for_one_channel_respects_its_rate_limit(tmp_path, monkeypatch):
+	monkeypatch.setenv('WEIXIN_WEBHOOK', 'https://wecom.example.com/send')
+	monkeypatch.setitem(notify.CHANNEL_LIMITS, 'WeChat Work', ChannelLimits(2048, rate=20))
+	outbox = NotificationOutbox(tmp_path / 'outbox.db')
+	for i in range(4):
+		outbox.enqueue(f'标题 {i}', '内容', ['WeChat Work'])
+	sent = []
+	in_flight = peak = 0
+
+	async def handler(request: httpx.Request) -> httpx.Response:
+		nonlocal in_flight, peak
+		in_flight += 1
+		peak = max(peak, in_flight)
+		sent.append(time.monotonic())
+		await asyncio.sleep(0.005)
+		in_flight -= 1
+		return httpx.Response(200, json={'errcode': 0})
+
+	async def run():
+		async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+			return await outbox.flush(NotificationKit(), client=client)
+
+	results = asyncio.run(run())
+
+	assert [r.success for r in results] == [True] * 4
+	assert peak == 1
+	# 单条消息也经过同一个令牌桶，每秒 20 条，相邻两条至少间隔约 50ms
+	assert sent[-1] - sent[0] >= 0.04 * 3
+	outbox.close()
+
+
+def test_report_counts_each_channel_once(monkeypatch, tmp_path, capsys):
+	monkeypatch.setenv('STATE_DIR', str(tmp_path))
+	monkeypatch.delenv('NOTIFY_POLICY', raising=False)
+
+	async def fake_send_notification(title, content, formats=None, attachments=None, dedup_key=None):
+		# 同一渠道在本次运行内重试了两次
+		return [
+			ChannelResult('Telegram', False, 0.1),
+			ChannelResult('Telegram', False, 0.1),
+			ChannelResult('Telegram', True, 0.2),
+		]
+
+	monkeypatch.setattr(checkin, 'send_notification', fake_send_notification)
+	report = ReportAggregator([CheckInResult(0, 'anyrouter:1', 'A', 'success', 50.0, 2.0)])
+	asyncio.run(checkin.publish_report(report))
+
+	assert '[通知] 成功 1/1 个渠道' in capsys.readouterr().out
@@ -0,0 +1,130 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import checkin
+from utils.balance_store import BalanceRecord
+from utils.notify import ChannelResult
+from utils.outbox import NotificationOutbox
+from utils.policy import NotifyPolicy
+from utils.results import CheckInResult, ReportAggregator
+
+NOW = 1_800_000_000.0
+
+
+def make_report(*results: CheckInResult, previous: dict[str, tuple[float, float]] | None = None) -> ReportAggregator:
+	report = ReportAggregator(results)
+	report.apply_previous(
+		{key: BalanceRecord(key, key, NOW - 86400, quota, used) for key, (quota, used) in (previous or {}).items()}
+	)
+	return report
+
+
+def test_from_env(monkeypatch, capsys):
+	assert NotifyPolicy.from_env().rules == {'always'}
+
+	monkeypatch.setenv('NOTIFY_POLICY', 'Failure, change,low_quota,bogus')
+	monkeypatch.setenv('NOTIFY_CHANGE_THRESHOLD', '0.5')
+	monkeypatch.setenv('NOTIFY_LOW_QUOTA', 'abc')
+	policy = NotifyPolicy.from_env()
+
+	assert policy.rules == {'failure', 'change', 'low_quota'}
+	assert (policy.change_threshold, policy.low_quota) == (0.5, 10.0)
+	output = capsys.readouterr().out
+	assert 'Unknown NOTIFY_POLICY rule(s) bogus' in output and 'NOTIFY_LOW_QUOTA must be a number' in output
+
+
+def test_unchanged_run_is_skipped():
+	policy = NotifyPolicy(frozenset({'failure', 'change', 'low_quota', 'periodic'}))
+	report = make_report(
+		CheckInResult(0, 'anyrouter:1', 'A', 'success', 50.0, 2.0),
+		CheckInResult(1, 'anyrouter:2', 'B', 'skipped', 30.0, 1.0),
+		previous={'anyrouter:1': (50.0, 2.0), 'anyrouter:2': (30.0, 1.0)},
+	)
+
+	assert policy.reasons(report, last_notified_at=NOW - 3600, now=NOW) == []
+	assert policy.reasons(report, last_notified_at=NOW - 86400, now=NOW) == ['距上次推送已超过 24 小时']
+	assert policy.reasons(report, last_notified_at=None, now=NOW) == ['距上次推送已超过 24 小时']
+
+
+@pytest.mark.parametrize(
+	'result, previous, expected',
+	[
+		(CheckInResult(0, 'anyrouter:1', 'A', 'failed', error='HTTP 401'), (50.0, 2.0), '1 个账号需要关注'),
+		(CheckInResult(0, 'anyrouter:1', 'A', 'success', 75.0, 2.0), (50.0, 2.0), '1 个账号余额变化超过 $1.00'),
+		(CheckInResult(0, 'anyrouter:1', 'A', 'success', 50.0, 2.0), None, '1 个账号余额变化超过 $1.00'),
+		(CheckInResult(0, 'anyrouter:1', 'A', 'success', 5.0, 2.0), (5.0, 2.0), '1 个账号余额低于 $10.00'),
+	],
+)
+def test_rules(result, previous, expected):
+	policy = NotifyPolicy(frozenset({'failure', 'change', 'low_quota'}), change_threshold=1.0)
+	report = make_report(result, previous={'anyrouter:1': previous} if previous else None)
+
+	assert policy.reasons(report, now=NOW) == [expected]
+
+
+def test_change_threshold_ignores_small_usage():
+	policy = NotifyPolicy(frozenset({'change'}), change_threshold=1.0)
+	report = make_report(
+		CheckInResult(0, 'anyrouter:1', 'A', 'success', 49.5, 2.5), previous={'anyrouter:1': (50.0, 2.0)}
+	)
+
+	assert policy.reasons(report, now=NOW) == []
+	assert NotifyPolicy(frozenset({'change'})).reasons(report, now=NOW) == ['1 个账号余额变化超过 $0.00']
+
+
+def test_publish_report_skips_unchanged_runs(monkeypatch, tmp_path):
+	monkeypatch.setenv('STATE_DIR', str(tmp_path))
+	monkeypatch.setenv('NOTIFY_POLICY', 'failure,change')
+	sent = []
+
+	async def fake_send_notification(title, content, formats=None, attachments=None, dedup_key=None):
+		sent.append(content)
+		return []
+
+	monkeypatch.setattr(checkin, 'send_notification', fake_send_notification)
+
+	def run(quota: float) -> int:
+		report = ReportAggregator([CheckInResult(0, 'anyrouter:1', 'A', 'success', quota, 2.0)])
+		return asyncio.run(checkin.publish_report(report))
+
+	assert run(50.0) == 1
+	assert run(50.0) == 1
+	assert run(75.0) == 1
+	assert len(sent) == 2
+	assert '较上次: 签到 +$25.00, 新增使用 $0.00' in sent[1]
+
+
+def test_skipped_run_still_retries_pending_deliveries(monkeypatch, tmp_path):
+	monkeypatch.setenv('STATE_DIR', str(tmp_path))
+	monkeypatch.setenv('NOTIFY_POLICY', 'failure')
+	sent = []
+
+	class FakeKit:
+		def get_configured_channels(self) -> list[str]:
+			return ['Telegram']
+
+		async def send_channel(self, client, name, title, content, msg_type, formats=None, attachments=None):
+			sent.append((name, content))
+			return ChannelResult(name, True, 0.0)
+
+	monkeypatch.setattr(checkin, 'get_notify', lambda: FakeKit())
+	# 上一次运行中投递失败、等待重试的消息
+	outbox = NotificationOutbox()
+	outbox.enqueue('标题', '上次的报告', ['Telegram'])
+	outbox.conn.execute("UPDATE deliveries SET attempts = 3, next_attempt_at = 0, status = 'pending'")
+	outbox.close()
+
+	report = ReportAggregator([CheckInResult(0, 'anyrouter:1', 'A', 'success', 50.0, 2.0)])
+	assert asyncio.run(checkin.publish_report(report)) == 1
+
+	assert sent == [('Telegram', '上次的报告')]
+	outbox = NotificationOutbox()
+	assert outbox.pending_count() == 0
+	outbox.close()
@@ -0,0 +1,196 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.config import AppConfig, ProviderConfig
+from utils.http import HttpClientPool
+from utils.ratelimit import AimdController, ProviderRateLimiter, TokenBucket, load_learned_limits
+from utils.runtime import RunContext
+
+
+def test_token_bucket_spaces_requests():
+	async def run():
+		bucket = TokenBucket(rate=50, burst=2)
+		started = time.monotonic()
+		for _ in range(6):
+			await bucket.acquire()
+		return time.monotonic() - started
+
+	# 前 2 个令牌立即可用，剩余 4 个按 50/s 补充
+	assert asyncio.run(run()) >= 0.07
+
+
+def test_max_in_flight_is_shared_by_workers():
+	limiter = ProviderRateLimiter(max_in_flight=2)
+	peak = 0
+
+	async def request():
+		nonlocal peak
+		async with limiter.limit():
+			peak = max(peak, limiter.in_flight)
+			await asyncio.sleep(0.01)
+
+	async def run():
+		await asyncio.gather(*(request() for _ in range(8)))
+
+	asyncio.run(run())
+
+	assert peak == 2
+	assert limiter.in_flight == 0
+	assert not ProviderRateLimiter().enabled
+
+
+def test_pool_applies_limiter_to_requests():
+	limiter = ProviderRateLimiter(rate=1000, burst=1, max_in_flight=1)
+	peak = 0
+
+	async def handler(request):
+		nonlocal peak
+		peak = max(peak, limiter.in_flight)
+		await asyncio.sleep(0.005)
+		return httpx.Response(200, json={'success': True})
+
+	async def run():
+		pool = HttpClientPool(transport=httpx.MockTransport(handler))
+		client = pool.get('https://anyrouter.top', limiter)
+		responses = await asyncio.gather(*(client.get('https://anyrouter.top/api/user/self') for _ in range(4)))
+		await pool.close()
+		return responses
+
+	responses = asyncio.run(run())
+
+	assert all(r.json() == {'success': True} for r in responses)
+	assert peak == 1
+
+
+def test_aimd_grows_additively_and_backs_off_multiplicatively():
+	controller = AimdController(initial=2, max_limit=6)
+	started_at = time.monotonic()
+
+	for _ in range(20):
+		controller.record(started_at, 0.1)
+	assert controller.max_in_flight == 6
+
+	assert controller.record(time.monotonic(), 0.1, throttled=True)
+	assert controller.max_in_flight == 3
+	# 下调之前发出的请求一起失败时只下调一次
+	assert not controller.record(started_at, 0.1, throttled=True)
+	assert controller.max_in_flight == 3
+
+	for _ in range(5):
+		controller.record(time.monotonic(), 0.1, throttled=True)
+	assert controller.max_in_flight == 1
+
+
+def test_aimd_backs_off_when_latency_rises():
+	controller = AimdController(initial=4, max_limit=10)
+	for _ in range(3):
+		controller.record(time.monotonic(), 0.1)
+	limit = controller.limit
+
+	controller.record(time.monotonic(), 0.2)
+	assert controller.limit > limit
+	started_at = time.monotonic()
+	assert controller.record(started_at, 2.0)
+	assert controller.max_in_flight == 2
+	assert not controller.record(started_at, 2.0)
+	# 下调后延迟仍然很高时继续下调
+	controller.record(time.monotonic(), 2.0)
+	assert controller.max_in_flight == 1
+
+
+def test_aimd_keeps_growing_with_mixed_endpoint_latencies():
+	patterns = [
+		[('/login', 0.08), ('/api/user/self', 0.6)],
+		[('/login', 0.05), ('/api/user/self', 0.3), ('/api/user/sign_in', 0.3)],
+	]
+	for pattern in patterns:
+		controller = AimdController(initial=2, max_limit=8)
+		for i in range(60):
+			for path, latency in pattern:
+				# 各接口自身有 ±20% 的抖动
+				controller.record(time.monotonic(), latency * (1.2 if i % 2 else 0.8), path=path)
+		assert controller.max_in_flight == 8
+
+
+def test_aimd_baseline_follows_sustained_latency_change():
+	controller = AimdController(initial=4, max_limit=4)
+	for _ in range(5):
+		controller.record(time.monotonic(), 0.05, path='/api/user/self')
+	for _ in range(3):
+		controller.record(time.monotonic(), 0.5, path='/api/user/self')
+	assert controller.max_in_flight < 4
+
+	# 接口的正常延迟整体变慢后，基线随之上移，上限重新恢复
+	for _ in range(200):
+		controller.record(time.monotonic(), 0.5, path='/api/user/self')
+	assert controller.max_in_flight == 4
+
+
+def test_adaptive_limiter_reacts_to_throttling():
+	limiter = ProviderRateLimiter(controller=AimdController(initial=4, max_limit=8))
+	throttle = False
+
+	async def handler(request):
+		if throttle:
+			return httpx.Response(429)
+		if request.url.path == '/api/user/self':
+			# 接口被 WAF 挑战页拦截也视为限流
+			return httpx.Response(200, text="<script>var arg1='" + '0' * 40 + "';</script>")
+		return httpx.Response(200, json={'success': True})
+
+	async def run():
+		nonlocal throttle
+		pool = HttpClientPool(transport=httpx.MockTransport(handler))
+		client = pool.get('https://anyrouter.top', limiter)
+		await asyncio.gather(*(client.get('https://anyrouter.top/api/user/sign_in') for _ in range(12)))
+		grown = limiter.max_in_flight
+		await client.get('https://anyrouter.top/api/user/self')
+		challenged = limiter.max_in_flight
+		throttle = True
+		await client.get('https://anyrouter.top/api/user/sign_in')
+		await pool.close()
+		return grown, challenged, limiter.max_in_flight
+
+	grown, challenged, throttled = asyncio.run(run())
+
+	assert grown > 4
+	assert challenged == grown // 2
+	assert throttled == challenged // 2
+	assert limiter.in_flight == 0
+
+
+def test_learned_limits_persist_between_runs(monkeypatch, tmp_path):
+	monkeypatch.setenv('STATE_DIR', str(tmp_path))
+	app_config = AppConfig(providers={}, http_concurrency=8, adaptive_concurrency=True)
+	anyrouter = ProviderConfig(name='anyrouter', domain='https://anyrouter.top')
+	fixed = ProviderConfig(name='fixed', domain='https://example.com', max_in_flight=3)
+
+	async def first_run():
+		ctx = RunContext.from_config(app_config)
+		limiter = ctx.get_rate_limiter(anyrouter)
+		assert ctx.get_rate_limiter(fixed).controller is None
+		for _ in range(10):
+			await limiter.record(time.monotonic(), 0.1)
+		await ctx.close()
+		return limiter.controller.limit
+
+	learned = asyncio.run(first_run())
+	assert learned > 2
+	assert load_learned_limits(tmp_path / 'concurrency.json') == {'anyrouter': round(learned, 3)}
+
+	async def second_run():
+		ctx = RunContext.from_config(app_config)
+		limiter = ctx.get_rate_limiter(anyrouter)
+		await ctx.close()
+		return limiter.max_in_flight
+
+	assert asyncio.run(second_run()) == int(learned)
+	assert RunContext.from_config(AppConfig(providers={})).get_rate_limiter(anyrouter).controller is None
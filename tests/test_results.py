@@ -0,0 +1,169 @@
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.balance_store import BalanceRecord
+from utils.results import (
+	CheckInResult,
+	ReportAggregator,
+	natural_key,
+	render_html,
+	render_markdown,
+	render_text,
+	report_fingerprint,
+)
+
+GENERATED_AT = datetime(2026, 1, 1, 9, 0)
+
+
+def make_report() -> ReportAggregator:
+	return ReportAggregator(
+		[
+			CheckInResult(2, 'anyrouter:3', 'Account 3', 'error', elapsed=0.1, error='boom'),
+			CheckInResult(0, 'anyrouter:1', 'Account 1', 'success', 25.0, 1.5, 0.2),
+			CheckInResult(1, 'anyrouter:2', 'Account 2', 'skipped', 10.0, 0.5),
+			CheckInResult(3, 'anyrouter:4', 'Account 4', 'failed', error='HTTP 401'),
+		]
+	)
+
+
+def test_aggregator_keeps_totals_and_order():
+	report = make_report()
+
+	assert [result.name for result in report.results] == ['Account 1', 'Account 2', 'Account 3', 'Account 4']
+	assert (report.account_count, report.success_count, report.failed_count) == (4, 2, 2)
+	assert (report.total_quota, report.total_used, report.total_assets) == (35.0, 2.0, 37.0)
+	# 跳过的账号计入汇总，但不作为本次查询到的余额
+	assert report.balances == {'anyrouter:1': {'name': 'Account 1', 'quota': 25.0, 'used': 1.5}}
+
+
+def test_natural_order_with_mixed_names():
+	names = ['Account 10', '12', 'account 2', 'Account 2', 'B', '3', 'Account 1b', 'Account 1a']
+	report = ReportAggregator(CheckInResult(i, f'anyrouter:{i}', name, 'success') for i, name in enumerate(names))
+
+	assert [result.name for result in report.results] == [
+		'3',
+		'12',
+		'Account 1a',
+		'Account 1b',
+		'account 2',
+		'Account 2',
+		'Account 10',
+		'B',
+	]
+	assert natural_key('v1.10') > natural_key('v1.9')
+	assert sorted(['x', '2', 'x1', ''], key=natural_key) == ['', '2', 'x', 'x1']
+
+
+def test_render_text():
+	assert render_text(make_report(), GENERATED_AT) == '\n'.join(
+		[
+			'[时间] 2026-01-01 09:00:00',
+			'',
+			'[Account 1]',
+			'💰 当前余额: $25.0, 已用: $1.5',
+			'[Account 2]',
+			'⏭️ 今日已签到 (跳过)',
+			'💰 当前余额: $10.0, 已用: $0.5',
+			'[Account 3]',
+			'❌ 脚本执行异常: boom',
+			'[Account 4]',
+			'❌ 信息获取失败: HTTP 401',
+			'',
+			'📊 签到统计:',
+			'✅ 成功: 2/4',
+			'❌ 失败: 2/4',
+			'',
+			'💰 资金汇总:',
+			'💵 可用总余额: $35.00',
+			'🧾 已用总额: $2.00',
+			'💳 总资产(可用+已用): $37.00',
+			'',
+			'⚠️ 部分失败',
+		]
+	)
+
+
+def test_render_markdown_and_html():
+	report = make_report()
+	report.add(CheckInResult(4, 'anyrouter:5', '<b>', 'success', 1.0, 0.0))
+
+	markdown = render_markdown(report, GENERATED_AT)
+	assert '**Account 4**\n- ❌ 信息获取失败: HTTP 401' in markdown
+	assert '**💰 资金汇总**\n- 💵 可用总余额: $36.00' in markdown
+
+	html = render_html(report, GENERATED_AT)
+	assert '<td>&lt;b&gt;</td>' in html
+	assert '⏭️ 今日已签到 (跳过)<br>💰 当前余额: $10.0, 已用: $0.5' in html
+
+
+def test_result_round_trip():
+	result = CheckInResult(0, 'anyrouter:1', 'Account 1', 'success', 25.0, 1.5, 0.2)
+
+	assert CheckInResult.from_dict(result.to_dict()) == result
+	assert not hasattr(result, '__dict__')
+
+
+def test_digest_lists_only_accounts_needing_attention():
+	report = make_report()
+	report.add(CheckInResult(4, 'anyrouter:5', 'Account 5', 'success', error='HTTP 500'))
+
+	text = render_text(report, GENERATED_AT, digest=True, report_url='https://example.com/run/1')
+	assert '[Account 1]' not in text and '[Account 2]' not in text
+	assert '[Account 3]' in text and '[Account 4]' in text and '[Account 5]' in text
+	assert '仅列出 3 个需要关注的账号，完整报告: https://example.com/run/1' in text
+	assert '✅ 成功: 3/5' in text
+
+	assert '**Account 1**' not in render_markdown(report, GENERATED_AT, digest=True)
+	html = render_html(report, GENERATED_AT, digest=True)
+	assert 'Account 1' not in html and '完整报告见邮件附件或运行日志' in html
+
+
+def test_report_fingerprint_ignores_time_and_skip_status():
+	first = ReportAggregator(
+		[
+			CheckInResult(0, 'anyrouter:1', 'Account 1', 'success', 25.0, 1.5, 0.2),
+			CheckInResult(1, 'anyrouter:2', 'Account 2', 'failed', error='HTTP 401'),
+		]
+	)
+	rerun = ReportAggregator(
+		[
+			CheckInResult(0, 'anyrouter:1', 'Account 1', 'skipped', 25.0, 1.5, 0.0),
+			CheckInResult(1, 'anyrouter:2', 'Account 2', 'failed', elapsed=3.0, error='HTTP 401'),
+		]
+	)
+	changed = ReportAggregator(
+		[
+			CheckInResult(0, 'anyrouter:1', 'Account 1', 'success', 24.0, 2.5),
+			CheckInResult(1, 'anyrouter:2', 'Account 2', 'failed', error='HTTP 401'),
+		]
+	)
+
+	assert report_fingerprint(first) == report_fingerprint(rerun)
+	assert report_fingerprint(first) != report_fingerprint(changed)
+
+
+def test_deltas_against_previous_run():
+	report = make_report()
+	report.apply_previous(
+		{
+			'anyrouter:1': BalanceRecord('anyrouter:1', 'Account 1', 0.0, 1.0, 0.5),
+			'anyrouter:2': BalanceRecord('anyrouter:2', 'Account 2', 0.0, 10.0, 0.5),
+		}
+	)
+	account_1, account_2 = report.results[0], report.results[1]
+
+	assert (account_1.gained, account_1.used_delta) == (25.0, 1.0)
+	assert (account_2.gained, account_2.used_delta) == (0.0, 0.0)
+	assert report.changed_results() == [account_1]
+	assert (report.total_gained, report.total_used_delta) == (25.0, 1.0)
+
+	text = render_text(report, GENERATED_AT)
+	assert '💰 当前余额: $25.0, 已用: $1.5 (较上次: 签到 +$25.00, 新增使用 $1.00)' in text
+	assert '💰 当前余额: $10.0, 已用: $0.5\n' in text
+	assert '📈 较上次运行: 签到 +$25.00, 新增使用 $1.00' in text
+	assert '- 📈 较上次运行' in render_markdown(report, GENERATED_AT)
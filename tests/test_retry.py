@@ -0,0 +1,82 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.config import ProviderConfig, RetryPolicy
+from utils.retry import CircuitBreaker, CircuitOpenError, request_with_retry
+
+FAST_POLICY = RetryPolicy(attempts=3, backoff=0, jitter=0, breaker_threshold=2)
+
+
+def send(handler, policy=FAST_POLICY, breaker=None):
+	async def run():
+		async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+			return await request_with_retry(client, 'GET', 'https://anyrouter.top/api/user/self', policy, breaker)
+
+	return asyncio.run(run())
+
+
+def test_retries_retryable_status_then_succeeds():
+	statuses = iter([503, 502, 200])
+	calls = 0
+
+	def handler(request):
+		nonlocal calls
+		calls += 1
+		return httpx.Response(next(statuses))
+
+	assert send(handler).status_code == 200
+	assert calls == 3
+
+
+def test_does_not_retry_client_errors():
+	calls = 0
+
+	def handler(request):
+		nonlocal calls
+		calls += 1
+		return httpx.Response(401)
+
+	breaker = CircuitBreaker('anyrouter', 2)
+	assert send(handler, breaker=breaker).status_code == 401
+	assert calls == 1
+	assert breaker.failures == 0
+
+
+def test_breaker_opens_after_consecutive_failures():
+	def handler(request):
+		raise httpx.ConnectError('down', request=request)
+
+	breaker = CircuitBreaker('anyrouter', 2)
+	for _ in range(2):
+		with pytest.raises(httpx.ConnectError):
+			send(handler, breaker=breaker)
+
+	assert breaker.is_open
+	with pytest.raises(CircuitOpenError):
+		send(handler, breaker=breaker)
+
+
+def test_delay_is_capped_and_jittered():
+	policy = RetryPolicy(backoff=1, max_backoff=4, jitter=0.5)
+
+	assert policy.get_delay(10) <= 4
+	assert 0.5 <= policy.get_delay(1) <= 1
+
+
+def test_provider_retry_from_dict():
+	provider = ProviderConfig.from_dict(
+		'custom',
+		{'domain': 'https://custom.example.com', 'retry': {'attempts': 5, 'retry_statuses': [503], 'unknown': 1}},
+	)
+
+	assert provider.retry.attempts == 5
+	assert provider.retry.retry_statuses == (503,)
+	assert ProviderConfig(name='default', domain='https://example.com').retry == RetryPolicy()
@@ -0,0 +1,63 @@
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.schedule import CronSchedule, FileWatcher, account_jitter
+
+
+def test_cron_next_after():
+	daily = CronSchedule('0 9 * * *')
+	assert daily.next_after(datetime(2026, 1, 1, 8, 59, 30)) == datetime(2026, 1, 1, 9, 0)
+	assert daily.next_after(datetime(2026, 1, 1, 9, 0)) == datetime(2026, 1, 2, 9, 0)
+	assert daily.next_after(datetime(2026, 12, 31, 10, 0)) == datetime(2027, 1, 1, 9, 0)
+
+	every_15 = CronSchedule('*/15 8-10 * * *')
+	assert every_15.next_after(datetime(2026, 1, 1, 8, 16)) == datetime(2026, 1, 1, 8, 30)
+	assert every_15.next_after(datetime(2026, 1, 1, 10, 45)) == datetime(2026, 1, 2, 8, 0)
+
+	# 2026-01-04 为周日，0 与 7 都表示周日
+	assert CronSchedule('30 6 * * 0').next_after(datetime(2026, 1, 1)) == datetime(2026, 1, 4, 6, 30)
+	assert CronSchedule('30 6 * * 7').next_after(datetime(2026, 1, 1)) == datetime(2026, 1, 4, 6, 30)
+	assert CronSchedule('0 0 29 2 *').next_after(datetime(2026, 1, 1)) == datetime(2028, 2, 29, 0, 0)
+
+
+def test_cron_day_and_weekday_match_either():
+	# 日与周同时限定时满足任一即可: 每月 15 号或每周一
+	schedule = CronSchedule('0 0 15 * 1')
+	assert schedule.next_after(datetime(2026, 1, 1)) == datetime(2026, 1, 5, 0, 0)
+	assert schedule.next_after(datetime(2026, 1, 12, 1)) == datetime(2026, 1, 15, 0, 0)
+
+
+@pytest.mark.parametrize('expression', ['0 9 * *', '60 9 * * *', '0 9 * * 8', '*/0 * * * *', 'a * * * *', '0 0 31 2 *'])
+def test_cron_rejects_invalid_expressions(expression):
+	with pytest.raises(ValueError):
+		CronSchedule(expression).next_after(datetime(2026, 1, 1))
+
+
+def test_account_jitter_is_stable_and_bounded():
+	offsets = [account_jitter(f'anyrouter:{i}', 600) for i in range(500)]
+	assert all(0 <= offset < 600 for offset in offsets)
+	assert offsets == [account_jitter(f'anyrouter:{i}', 600) for i in range(500)]
+	# 500 个账号分散在整个区间内，而不是同一秒启动
+	assert len({int(offset) for offset in offsets}) > 250
+	assert account_jitter('anyrouter:1', 0) == 0.0
+
+
+def test_file_watcher_detects_changes(tmp_path):
+	path = tmp_path / '.env'
+	watcher = FileWatcher([path])
+	assert not watcher.changed()
+
+	path.write_text('MAX_WORKERS=2\n')
+	assert watcher.changed()
+	assert not watcher.changed()
+
+	os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 10))
+	assert watcher.changed()
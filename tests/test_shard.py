@@ -0,0 +1,118 @@
+import asyncio
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import checkin
+from utils.config import AccountConfig, AppConfig
+from utils.results import ReportAggregator, render_text
+from utils.shard import load_shard_results, parse_shard, shard_of, write_shard_results
+
+
+def make_accounts(count: int) -> list[AccountConfig]:
+	return [AccountConfig(cookies={'session': f's{i}'}, api_user=str(i), name=f'Account {i + 1}') for i in range(count)]
+
+
+def test_parse_shard():
+	assert parse_shard('1/4') == (1, 4)
+	assert parse_shard('4/4') == (4, 4)
+	for text in ('0/4', '5/4', '1/0', '1', 'a/b', '1/4/2'):
+		with pytest.raises(ValueError):
+			parse_shard(text)
+
+
+def test_shard_of_is_stable_and_covers_every_shard():
+	keys = [f'anyrouter:{i}' for i in range(200)]
+	assignments = [shard_of(key, 4) for key in keys]
+
+	assert assignments == [shard_of(key, 4) for key in keys]
+	assert set(assignments) == {0, 1, 2, 3}
+	assert all(shard_of(key, 1) == 0 for key in keys)
+
+
+def test_merged_shards_match_single_run(monkeypatch, tmp_path):
+	monkeypatch.setenv('STATE_DIR', str(tmp_path / 'state'))
+	generated_at = datetime(2026, 1, 1, 9, 0)
+	app_config = AppConfig(providers={}, max_workers=2)
+	accounts = make_accounts(12)
+
+	async def fake_check_in(account, index, app_config, ctx=None):
+		if index == 5:
+			raise RuntimeError('boom')
+		if index % 4 == 0:
+			return False, {'success': False, 'error': 'HTTP 401'}
+		return True, {'success': True, 'quota': float(index), 'used_quota': 1.0, 'display': f'quota {index}'}
+
+	monkeypatch.setattr(checkin, 'check_in_account', fake_check_in)
+
+	expected = asyncio.run(checkin.process_accounts(app_config, accounts, force=True))
+	for index in range(1, 4):
+		report = asyncio.run(checkin.process_accounts(app_config, accounts, force=True, shard=(index, 3)))
+		assert all(shard_of(result.key, 3) == index - 1 for result in report.results)
+		assert write_shard_results(tmp_path / 'shards' / f'shard-{index}-of-3.json', index, 3, report.results)
+
+	merged = load_shard_results([tmp_path / 'shards'])
+
+	assert [result.index for result in merged] == list(range(12))
+	assert merged[5].status == 'error' and merged[5].error == 'boom'
+	merged_report = ReportAggregator(merged)
+	assert render_text(merged_report, generated_at) == render_text(expected, generated_at)
+	assert (merged_report.success_count, merged_report.balances) == (expected.success_count, expected.balances)
+
+
+def test_load_shard_results_validates_files(tmp_path, capsys):
+	write_shard_results(tmp_path / 'a.json', 1, 3, [])
+	load_shard_results([tmp_path / 'a.json'])
+	assert 'Missing results for shard(s) 2, 3 of 3' in capsys.readouterr().out
+
+	write_shard_results(tmp_path / 'b.json', 2, 2, [])
+	with pytest.raises(ValueError):
+		load_shard_results([tmp_path / 'a.json', tmp_path / 'b.json'])
+
+	with pytest.raises(ValueError):
+		load_shard_results([tmp_path / 'a.json', tmp_path / 'a.json'])
+
+	(tmp_path / 'other.json').write_text(json.dumps({'foo': 1}), encoding='utf-8')
+	with pytest.raises(ValueError):
+		load_shard_results([tmp_path / 'other.json'])
+
+	with pytest.raises(ValueError):
+		load_shard_results([tmp_path / 'empty'])
+
+
+def test_load_shard_results_rejects_malformed_files(tmp_path):
+	record = {'index': 0, 'key': 'anyrouter:1', 'name': 'A', 'status': 'success', 'quota': 1.0, 'used': 0.0}
+	cases = {
+		'no-count.json': {'shard': 1, 'results': []},
+		'bad-shard.json': {'shard': '1', 'count': 2, 'results': []},
+		'out-of-range.json': {'shard': 3, 'count': 2, 'results': []},
+		'not-object.json': {'shard': 1, 'count': 1, 'results': ['x']},
+		'missing-key.json': {'shard': 1, 'count': 1, 'results': [{'index': 0, 'name': 'A'}]},
+	}
+	for filename, data in cases.items():
+		(tmp_path / filename).write_text(json.dumps(data), encoding='utf-8')
+		with pytest.raises(ValueError, match=filename):
+			load_shard_results([tmp_path / filename])
+
+	# 其它版本写出的未知字段会被忽略
+	(tmp_path / 'newer.json').write_text(
+		json.dumps({'shard': 1, 'count': 1, 'results': [{**record, 'extra': 1}]}), encoding='utf-8'
+	)
+	assert [result.key for result in load_shard_results([tmp_path / 'newer.json'])] == ['anyrouter:1']
+
+
+def test_merge_reports_bad_shard_without_traceback(tmp_path, capsys):
+	(tmp_path / 'old.json').write_text(json.dumps({'shard': 1, 'results': []}), encoding='utf-8')
+
+	with pytest.raises(SystemExit) as exc:
+		asyncio.run(checkin.merge_shards([str(tmp_path / 'old.json')]))
+
+	assert exc.value.code == 1
+	assert 'old.json has an invalid shard number' in capsys.readouterr().out
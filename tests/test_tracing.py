@@ -0,0 +1,79 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.tracing import Tracer
+
+
+def test_disabled_tracer_records_nothing():
+	tracer = Tracer()
+
+	with tracer.span('account', account='A') as span:
+		span.set(success=True)
+
+	assert tracer.spans == []
+
+
+def test_nested_spans_inherit_account_per_task():
+	tracer = Tracer(enabled=True)
+
+	async def process(name: str):
+		with tracer.span('account', account=name):
+			await asyncio.sleep(0.01)
+			with tracer.span('api.user_info') as span:
+				span.set(status=200)
+
+	async def run():
+		await asyncio.gather(process('A'), process('B'))
+		with tracer.span('notify'):
+			pass
+
+	asyncio.run(run())
+
+	by_name = {(s.name, s.account): s for s in tracer.spans}
+	assert by_name[('api.user_info', 'A')].attrs == {'status': 200}
+	assert ('api.user_info', 'B') in by_name
+	assert by_name[('notify', None)].duration >= 0
+	assert by_name[('account', 'A')].duration >= by_name[('api.user_info', 'A')].duration
+
+
+def test_span_records_exception():
+	tracer = Tracer(enabled=True)
+
+	with pytest.raises(ValueError):
+		with tracer.span('waf.playwright', account='A'):
+			raise ValueError('boom')
+
+	assert tracer.spans[0].attrs['error'] == 'ValueError'
+
+
+def test_export_formats(tmp_path):
+	tracer = Tracer(enabled=True)
+	with tracer.span('account', account='A'):
+		with tracer.span('http.request', method='GET'):
+			pass
+	with pytest.raises(RuntimeError):
+		with tracer.span('http.request', account='B'):
+			raise RuntimeError
+
+	written = tracer.export(tmp_path, ('jsonl', 'chrome', 'prometheus'))
+	assert [p.name for p in written] == ['trace.jsonl', 'trace.chrome.json', 'checkin.prom']
+
+	records = [json.loads(line) for line in (tmp_path / 'trace.jsonl').read_text(encoding='utf-8').splitlines()]
+	assert [r['name'] for r in records] == ['http.request', 'account', 'http.request']
+	assert records[0]['account'] == 'A' and records[0]['method'] == 'GET'
+
+	events = json.loads((tmp_path / 'trace.chrome.json').read_text(encoding='utf-8'))['traceEvents']
+	lanes = {e['args']['name']: e['tid'] for e in events if e['ph'] == 'M'}
+	assert lanes['A'] != lanes['B']
+
+	prom = (tmp_path / 'checkin.prom').read_text(encoding='utf-8')
+	assert 'checkin_span_duration_seconds_count{span="http.request"} 2' in prom
+	assert 'checkin_span_errors_total{span="http.request"} 1' in prom
@@ -0,0 +1,117 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import httpx
+
+# 添加项目根目录到 PATH
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import checkin
+from utils.waf import SharedWafCookies, compute_acw_sc_v2, extract_acw_arg1
+
+CHALLENGE_HTML = (project_root / 'tests' / 'fixtures' / 'acw_sc_v2_challenge.html').read_text(encoding='utf-8')
+CHALLENGE_ARG1 = '7E1C8A95D04BF2367A0C9E51B83D6F42A97E0C1B'
+CHALLENGE_COOKIE = '0761b11c0d81d3e3b9b11b96192b869c5f9d93cb'
+
+
+def run_shared(group_size: int, accounts: int):
+	calls = 0
+
+	async def fetch():
+		nonlocal calls
+		calls += 1
+		current = calls
+		await asyncio.sleep(0.01)
+		return {'acw_tc': f'v{current}'}
+
+	async def run():
+		shared = SharedWafCookies(group_size)
+		return await asyncio.gather(*(shared.get('anyrouter', fetch) for _ in range(accounts)))
+
+	return asyncio.run(run()), calls
+
+
+def test_provider_sharing_fetches_once():
+	cookies, calls = run_shared(0, 5)
+
+	assert calls == 1
+	assert all(c == {'acw_tc': 'v1'} for c in cookies)
+	# 每个账号拿到的是独立副本
+	assert len({id(c) for c in cookies}) == 5
+
+
+def test_group_sharing():
+	cookies, calls = run_shared(2, 5)
+
+	assert calls == 3
+	assert [c['acw_tc'] for c in cookies] == ['v1', 'v1', 'v2', 'v2', 'v3']
+
+
+def test_per_account_by_default():
+	_, calls = run_shared(1, 4)
+
+	assert calls == 4
+
+
+def test_failed_fetch_is_not_cached():
+	async def run():
+		shared = SharedWafCookies(0)
+		results = iter([None, {'acw_tc': 'ok'}])
+
+		async def fetch():
+			return next(results)
+
+		first = await shared.get('anyrouter', fetch)
+		second = await shared.get('anyrouter', fetch)
+		return first, second
+
+	first, second = asyncio.run(run())
+
+	assert first is None
+	assert second == {'acw_tc': 'ok'}
+
+
+def test_extract_and_compute_from_recorded_challenge():
+	assert extract_acw_arg1(CHALLENGE_HTML) == CHALLENGE_ARG1
+	assert compute_acw_sc_v2(CHALLENGE_ARG1) == CHALLENGE_COOKIE
+
+
+def test_extract_returns_none_for_normal_page():
+	assert extract_acw_arg1('<html><div id="root"></div></html>') is None
+
+
+def test_http_solver_against_recorded_challenge():
+	def handler(request: httpx.Request) -> httpx.Response:
+		if f'acw_sc__v2={CHALLENGE_COOKIE}' in request.headers.get('cookie', ''):
+			return httpx.Response(
+				200,
+				text='<html><div id="root"></div></html>',
+				headers={'set-cookie': 'cdn_sec_tc=c; Max-Age=1800; Path=/'},
+			)
+		return httpx.Response(200, text=CHALLENGE_HTML, headers={'set-cookie': 'acw_tc=t; Max-Age=1800; Path=/'})
+
+	async def run():
+		async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+			return await checkin.get_waf_cookies_with_http(
+				'Account 1', client, 'https://anyrouter.top/login', ['acw_tc', 'cdn_sec_tc', 'acw_sc__v2']
+			)
+
+	cookies, expires_at = asyncio.run(run())
+
+	assert cookies == {'acw_tc': 't', 'cdn_sec_tc': 'c', 'acw_sc__v2': CHALLENGE_COOKIE}
+	assert expires_at is not None
+
+
+def test_http_solver_gives_up_when_solution_is_rejected():
+	def handler(request: httpx.Request) -> httpx.Response:
+		return httpx.Response(200, text=CHALLENGE_HTML)
+
+	async def run():
+		async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+			return await checkin.get_waf_cookies_with_http(
+				'Account 1', client, 'https://anyrouter.top/login', ['acw_sc__v2']
+			)
+
+	assert asyncio.run(run()) is None
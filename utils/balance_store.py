@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+余额历史存储
+"""
+
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from utils.storage import state_path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+	id INTEGER PRIMARY KEY AUTOINCREMENT,
+	recorded_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS balances (
+	run_id INTEGER NOT NULL REFERENCES runs(id),
+	account_key TEXT NOT NULL,
+	account_name TEXT NOT NULL,
+	recorded_at REAL NOT NULL,
+	quota REAL NOT NULL,
+	used_quota REAL NOT NULL,
+	PRIMARY KEY (run_id, account_key)
+);
+CREATE INDEX IF NOT EXISTS idx_balances_account_time ON balances (account_key, recorded_at);
+"""
+
+
+@dataclass
+class BalanceRecord:
+	"""某个账号在某次运行时的余额"""
+
+	account_key: str
+	account_name: str
+	recorded_at: float
+	quota: float
+	used_quota: float
+
+
+class BalanceStore:
+	"""基于 SQLite 的余额时间序列，每次运行每个账号记录一行"""
+
+	def __init__(self, path: Path | str | None = None):
+		self.path = Path(path) if path else state_path('balance_history.db')
+		self._conn: sqlite3.Connection | None = None
+
+	@property
+	def conn(self) -> sqlite3.Connection:
+		if self._conn is None:
+			self.path.parent.mkdir(parents=True, exist_ok=True)
+			self._conn = sqlite3.connect(self.path)
+			self._conn.executescript(_SCHEMA)
+		return self._conn
+
+	def record_run(self, balances: dict[str, dict], recorded_at: float | None = None) -> int:
+		"""记录一次运行的余额，balances 格式: {account_key: {'name', 'quota', 'used'}}"""
+		recorded_at = recorded_at or time.time()
+		with self.conn:
+			run_id = self.conn.execute('INSERT INTO runs (recorded_at) VALUES (?)', (recorded_at,)).lastrowid
+			self.conn.executemany(
+				'INSERT INTO balances (run_id, account_key, account_name, recorded_at, quota, used_quota) '
+				'VALUES (?, ?, ?, ?, ?, ?)',
+				[
+					(run_id, key, value.get('name') or key, recorded_at, value['quota'], value['used'])
+					for key, value in balances.items()
+				],
+			)
+		return run_id
+
+	def get_latest(self, before: float | None = None) -> dict[str, BalanceRecord]:
+		"""每个账号最近一次的余额记录，before 用于排除当前运行"""
+		before = before if before is not None else float('inf')
+		rows = self.conn.execute(
+			'SELECT account_key, account_name, MAX(recorded_at), quota, used_quota FROM balances '
+			'WHERE recorded_at < ? GROUP BY account_key',
+			(before,),
+		).fetchall()
+		return {row[0]: BalanceRecord(*row) for row in rows}
+
+	def query(self, account_key: str, start: float | None = None, end: float | None = None) -> list[BalanceRecord]:
+		"""按账号与时间范围查询余额历史，按时间升序返回"""
+		rows = self.conn.execute(
+			'SELECT account_key, account_name, recorded_at, quota, used_quota FROM balances '
+			'WHERE account_key = ? AND recorded_at >= ? AND recorded_at <= ? ORDER BY recorded_at',
+			(account_key, start if start is not None else 0, end if end is not None else float('inf')),
+		).fetchall()
+		return [BalanceRecord(*row) for row in rows]
+
+	def close(self):
+		if self._conn is not None:
+			self._conn.close()
+			self._conn = None
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+共享浏览器管理
+"""
+
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from multiprocessing.util import Finalize
+from pathlib import Path
+from urllib.parse import urlsplit
+
+USER_AGENT = (
+	'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36'
+)
+VIEWPORT = {'width': 1920, 'height': 1080}
+# Playwright 默认已关闭扩展、后台网络、组件更新等，这里只保留额外需要的参数
+LAUNCH_ARGS = [
+	'--disable-blink-features=AutomationControlled',
+	'--disable-dev-shm-usage',
+	'--no-sandbox',
+]
+BROWSER_MODES = ('headed', 'headless', 'headless-shell')
+# 复制 profile 模板时跳过锁文件与 cookies，避免带入上一次的 WAF cookies
+PROFILE_IGNORE = shutil.ignore_patterns('Singleton*', 'lockfile', 'Cookies', 'Cookies-journal')
+# 获取 WAF cookies 用不到的资源类型，直接拦截以节省时间与流量
+BLOCKED_RESOURCE_TYPES = frozenset({'image', 'font', 'media'})
+COOKIE_POLL_INTERVAL = 0.1
+COOKIE_WAIT_TIMEOUT = 15.0
+
+
+def is_same_site(url: str, host: str) -> bool:
+	"""url 的域名是否为 host 或其子域名"""
+	hostname = urlsplit(url).hostname or ''
+	return hostname == host or hostname.endswith(f'.{host}')
+
+
+async def block_unneeded_resources(context, site_url: str):
+	"""拦截图片、字体、媒体与第三方脚本，同站点的页面和脚本正常加载"""
+	host = urlsplit(site_url).hostname or ''
+
+	async def handle(route):
+		request = route.request
+		if request.resource_type in BLOCKED_RESOURCE_TYPES or (
+			request.resource_type == 'script' and not is_same_site(request.url, host)
+		):
+			await route.abort()
+		else:
+			await route.continue_()
+
+	await context.route('**/*', handle)
+
+
+def get_launch_options(mode: str) -> dict:
+	"""headed 需要图形界面；headless 为完整浏览器的新版无头模式；headless-shell 使用更轻量的 chromium-headless-shell"""
+	if mode == 'headless':
+		return {'headless': True, 'channel': 'chromium'}
+	if mode == 'headless-shell':
+		return {'headless': True}
+	return {'headless': False}
+
+
+def copy_profile(template_dir: Path, user_data_dir: Path):
+	"""把 profile 模板复制到新的用户目录"""
+	shutil.copytree(template_dir, user_data_dir, ignore=PROFILE_IGNORE, dirs_exist_ok=True)
+
+
+def save_profile_template(user_data_dir: Path, template_dir: Path):
+	"""用一次运行后的用户目录生成 profile 模板，先复制到临时目录再改名，已存在时不覆盖"""
+	if template_dir.exists():
+		return
+	temp_dir = template_dir.with_name(f'.{template_dir.name}.{os.getpid()}.tmp')
+	try:
+		template_dir.parent.mkdir(parents=True, exist_ok=True)
+		shutil.copytree(user_data_dir, temp_dir, ignore=PROFILE_IGNORE, dirs_exist_ok=True)
+		os.replace(temp_dir, template_dir)
+		print(f'[INFO] Browser profile template saved to {template_dir}')
+	except Exception as e:
+		print(f'[WARNING] Failed to save browser profile template: {e}')
+	finally:
+		shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+async def wait_for_cookies(context, names: list[str], timeout: float) -> list[dict] | None:
+	"""轮询 context 的 cookies，所需 cookie 全部出现后立即返回，超时返回 None"""
+	deadline = time.monotonic() + timeout
+	while True:
+		cookies = await context.cookies()
+		present = {cookie.get('name') for cookie in cookies if cookie.get('value')}
+		if all(name in present for name in names):
+			return cookies
+		if time.monotonic() >= deadline:
+			return None
+		await asyncio.sleep(COOKIE_POLL_INTERVAL)
+
+
+def async_playwright():
+	"""首次启动浏览器时才导入 Playwright，不需要 WAF cookies 的运行无需加载"""
+	from playwright.async_api import async_playwright
+
+	return async_playwright()
+
+
+class BrowserPool:
+	"""一次运行只启动一个浏览器，每个账号使用独立的 context 隔离 cookies
+
+	设置 profile_dir 后改为从 profile 模板复制一份用户目录，启动一个持久化 context 复用模板中的
+	磁盘缓存 (每个进程只启动一次)；持久化 context 只有一个 cookie 罐，账号依次在其中打开页面，
+	每次使用前清空 cookies。模板不存在时在关闭时由本次的用户目录生成。
+	"""
+
+	def __init__(self, mode: str = 'headed', profile_dir: Path | str | None = None):
+		self.mode = mode
+		self.profile_dir = Path(profile_dir) if profile_dir else None
+		self.launch_count = 0
+		self._playwright = None
+		self._browser = None
+		self._lock = asyncio.Lock()
+		self._persistent_context = None
+		self._user_data_dir: Path | None = None
+		self._has_template = False
+		self._profile_lock = asyncio.Lock()
+
+	async def _get_playwright(self):
+		if self._playwright is None:
+			self._playwright = await async_playwright().start()
+		return self._playwright
+
+	async def _get_browser(self):
+		"""懒启动浏览器，浏览器意外断开时自动重启"""
+		async with self._lock:
+			if self._browser is None or not self._browser.is_connected():
+				playwright = await self._get_playwright()
+				self._browser = await playwright.chromium.launch(args=LAUNCH_ARGS, **get_launch_options(self.mode))
+				self.launch_count += 1
+			return self._browser
+
+	@asynccontextmanager
+	async def new_context(self):
+		"""创建一个用完即关闭的隔离 context"""
+		if self.profile_dir is not None:
+			async with self._new_persistent_context() as context:
+				yield context
+			return
+
+		browser = await self._get_browser()
+		context = await browser.new_context(user_agent=USER_AGENT, viewport=VIEWPORT)
+		try:
+			yield context
+		finally:
+			await context.close()
+
+	async def _get_persistent_context(self):
+		"""懒启动持久化 context，只在第一次使用时复制一次 profile 模板"""
+		async with self._lock:
+			if self._persistent_context is None:
+				playwright = await self._get_playwright()
+				if self._user_data_dir is None:
+					self._user_data_dir = Path(tempfile.mkdtemp(prefix='anyrouter-profile-'))
+					self._has_template = self.profile_dir.is_dir()
+					if self._has_template:
+						await asyncio.to_thread(copy_profile, self.profile_dir, self._user_data_dir)
+				self._persistent_context = await playwright.chromium.launch_persistent_context(
+					str(self._user_data_dir),
+					user_agent=USER_AGENT,
+					viewport=VIEWPORT,
+					args=LAUNCH_ARGS,
+					**get_launch_options(self.mode),
+				)
+				self.launch_count += 1
+			return self._persistent_context
+
+	@asynccontextmanager
+	async def _new_persistent_context(self):
+		"""账号依次使用共享的持久化 context，用完后关闭打开的页面、移除拦截规则并清空 cookies"""
+		async with self._profile_lock:
+			context = await self._get_persistent_context()
+			await context.clear_cookies()
+			pages = set(context.pages)
+			try:
+				yield context
+			finally:
+				try:
+					await context.unroute('**/*')
+					for page in context.pages:
+						if page not in pages:
+							await page.close()
+					await context.clear_cookies()
+				except Exception as e:
+					# context 已经不可用时下次重新启动
+					print(f'[WARNING] Failed to reset persistent browser context: {e}')
+					self._persistent_context = None
+
+	async def _close_persistent_context(self):
+		if self._persistent_context is not None:
+			try:
+				await self._persistent_context.close()
+			except Exception as e:
+				print(f'[WARNING] Failed to close persistent browser context: {e}')
+			self._persistent_context = None
+		if self._user_data_dir is not None:
+			if not self._has_template:
+				await asyncio.to_thread(save_profile_template, self._user_data_dir, self.profile_dir)
+			await asyncio.to_thread(shutil.rmtree, self._user_data_dir, True)
+			self._user_data_dir = None
+
+	async def close(self):
+		"""关闭浏览器与 Playwright 驱动，首次使用 profile 时在此生成模板"""
+		async with self._lock:
+			await self._close_persistent_context()
+			if self._browser is not None:
+				try:
+					await self._browser.close()
+				except Exception as e:
+					print(f'[WARNING] Failed to close browser: {e}')
+				self._browser = None
+			if self._playwright is not None:
+				await self._playwright.stop()
+				self._playwright = None
+
+
+# 浏览器子进程内的事件循环与浏览器，由 _init_worker 创建，随进程退出关闭
+_worker_loop: asyncio.AbstractEventLoop | None = None
+_worker_pool: BrowserPool | None = None
+
+
+def _init_worker(mode: str, profile_dir: str | None):
+	global _worker_loop, _worker_pool
+	_worker_loop = asyncio.new_event_loop()
+	_worker_pool = BrowserPool(mode, profile_dir)
+	Finalize(None, _shutdown_worker, exitpriority=10)
+
+
+def _shutdown_worker():
+	_worker_loop.run_until_complete(_worker_pool.close())
+	_worker_loop.close()
+
+
+def _run_in_worker(func, args: tuple, kwargs: dict):
+	"""执行任务，同时返回本次任务中该进程启动浏览器的次数"""
+	launch_count = _worker_pool.launch_count
+	result = _worker_loop.run_until_complete(func(*args, browser_pool=_worker_pool, **kwargs))
+	return result, _worker_pool.launch_count - launch_count
+
+
+class BrowserWorkerPool:
+	"""多个子进程各自持有一个浏览器，浏览器任务分发到空闲的进程执行
+
+	任务为模块级的协程函数，在子进程中以 browser_pool=该进程的 BrowserPool 调用，参数与返回值需可 pickle。
+	子进程按需启动并在多次任务间复用浏览器；子进程异常退出时本次任务返回 None，下次任务重建进程池。
+	launch_count 为所有子进程启动浏览器的总次数。
+	"""
+
+	def __init__(self, processes: int, mode: str = 'headed', profile_dir: Path | str | None = None):
+		self.processes = processes
+		self.mode = mode
+		self.profile_dir = str(profile_dir) if profile_dir else None
+		self.launch_count = 0
+		self._executor: ProcessPoolExecutor | None = None
+
+	def _get_executor(self) -> ProcessPoolExecutor:
+		if self._executor is None:
+			# 统一使用 spawn，避免 fork 带入父进程的事件循环与线程
+			self._executor = ProcessPoolExecutor(
+				self.processes,
+				mp_context=multiprocessing.get_context('spawn'),
+				initializer=_init_worker,
+				initargs=(self.mode, self.profile_dir),
+			)
+		return self._executor
+
+	async def run(self, func, *args, **kwargs):
+		"""在某个子进程中执行 func(*args, browser_pool=..., **kwargs) 并返回结果"""
+		executor = self._get_executor()
+		try:
+			result, launched = await asyncio.get_running_loop().run_in_executor(
+				executor, _run_in_worker, func, args, kwargs
+			)
+		except BrokenProcessPool as e:
+			print(f'[WARNING] Browser worker process exited unexpectedly: {e}')
+			if self._executor is executor:
+				self._executor = None
+				executor.shutdown(wait=False, cancel_futures=True)
+			return None
+		self.launch_count += launched
+		return result
+
+	async def close(self):
+		"""关闭所有子进程，子进程退出前会关闭各自的浏览器"""
+		if self._executor is not None:
+			executor, self._executor = self._executor, None
+			await asyncio.to_thread(executor.shutdown)
@@ -5,8 +5,127 @@
 
 import json
 import os
-from dataclasses import dataclass
-from typing import Dict, List, Literal
+import random
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Dict, Iterator, List, Literal, TextIO
+
+
+def _get_int_env(name: str, default: int, minimum: int = 1) -> int:
+	"""读取整数环境变量，非法值回退到默认值"""
+	value = os.getenv(name, '').strip()
+	if not value:
+		return default
+
+	try:
+		return max(minimum, int(value))
+	except ValueError:
+		print(f'[WARNING] {name} must be an integer, using default value {default}')
+		return default
+
+
+def _get_choice_env(name: str, choices: tuple[str, ...], default: str) -> str:
+	"""读取枚举类型环境变量，非法值回退到默认值"""
+	value = os.getenv(name, '').strip().lower()
+	if not value:
+		return default
+	if value not in choices:
+		print(f'[WARNING] {name} must be one of {", ".join(choices)}, using default value {default}')
+		return default
+	return value
+
+
+def _get_waf_share_group_size() -> int:
+	"""解析 WAF_COOKIE_SHARING: account(默认) / provider / 每组账号数"""
+	value = os.getenv('WAF_COOKIE_SHARING', '').strip().lower()
+	if not value or value == 'account':
+		return 1
+	if value == 'provider':
+		return 0
+
+	try:
+		return max(1, int(value))
+	except ValueError:
+		print(f'[WARNING] Invalid WAF_COOKIE_SHARING value "{value}", WAF cookies will not be shared')
+		return 1
+
+
+# 每个浏览器进程 (Python 进程 + Playwright 驱动 + Chromium) 大致占用的内存
+_BROWSER_PROCESS_MEMORY_MB = 512
+
+
+def _physical_memory_mb() -> int | None:
+	"""物理内存总量 (MB)，无法获取时返回 None"""
+	try:
+		return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // (1024 * 1024)
+	except (AttributeError, ValueError, OSError):
+		return None
+
+
+def _get_browser_processes() -> int:
+	"""解析 BROWSER_PROCESSES: 进程数或 auto，默认 1 (在主进程内启动浏览器)
+
+	auto 取 CPU 核数与内存预算可容纳的进程数中的较小值，内存预算由 BROWSER_MEMORY_MB 指定，默认为物理内存的一半。
+	"""
+	if os.getenv('BROWSER_PROCESSES', '').strip().lower() != 'auto':
+		return _get_int_env('BROWSER_PROCESSES', 1)
+
+	budget = _get_int_env('BROWSER_MEMORY_MB', 0, minimum=0)
+	if not budget:
+		budget = (_physical_memory_mb() or 0) // 2
+	processes = os.cpu_count() or 1
+	if budget:
+		processes = min(processes, budget // _BROWSER_PROCESS_MEMORY_MB)
+	return max(1, processes)
+
+
+def _get_trace_formats() -> tuple[str, ...]:
+	"""解析 TRACE_FORMATS: 逗号分隔的 jsonl / chrome / prometheus，默认 jsonl"""
+	value = os.getenv('TRACE_FORMATS', '').strip().lower()
+	formats = []
+	for item in value.split(','):
+		item = item.strip()
+		if not item:
+			continue
+		if item not in ('jsonl', 'chrome', 'prometheus'):
+			print(f'[WARNING] Unknown trace format "{item}", ignoring')
+			continue
+		if item not in formats:
+			formats.append(item)
+	return tuple(formats) or ('jsonl',)
+
+
+@dataclass
+class RetryPolicy:
+	"""请求重试与熔断策略"""
+
+	attempts: int = 3
+	backoff: float = 0.5
+	max_backoff: float = 8.0
+	jitter: float = 0.5
+	retry_statuses: tuple[int, ...] = (429, 500, 502, 503, 504)
+	connect_timeout: float = 5.0
+	read_timeout: float = 15.0
+	breaker_threshold: int = 5
+
+	@classmethod
+	def from_dict(cls, data: dict | None) -> 'RetryPolicy':
+		"""从字典创建 RetryPolicy，未知字段会被忽略"""
+		if not isinstance(data, dict):
+			return cls()
+
+		known = {f.name for f in fields(cls)}
+		values = {key: value for key, value in data.items() if key in known}
+		if 'retry_statuses' in values:
+			values['retry_statuses'] = tuple(int(code) for code in values['retry_statuses'])
+		policy = cls(**values)
+		policy.attempts = max(1, int(policy.attempts))
+		return policy
+
+	def get_delay(self, attempt: int) -> float:
+		"""第 attempt 次失败后的等待秒数: 指数退避并按 jitter 比例随机缩短"""
+		delay = min(self.max_backoff, self.backoff * (2 ** (attempt - 1)))
+		return delay * (1 - self.jitter * random.random())
 
 
 @dataclass
@@ -21,6 +140,13 @@ class ProviderConfig:
 	api_user_key: str = 'new-api-user'
 	bypass_method: Literal['waf_cookies'] | None = None
 	waf_cookie_names: List[str] | None = None
+	waf_solver: Literal['playwright', 'http'] = 'playwright'
+	waf_wait: Literal['cookies', 'networkidle'] = 'cookies'
+	waf_block_resources: bool = True
+	retry: RetryPolicy = field(default_factory=RetryPolicy)
+	rate_limit_rps: float | None = None
+	rate_limit_burst: int = 1
+	max_in_flight: int | None = None
 
 	def __post_init__(self):
 		required_waf_cookies = set()
@@ -38,6 +164,21 @@ class ProviderConfig:
 
 		self.waf_cookie_names = list(required_waf_cookies)
 
+		if self.rate_limit_rps is not None and float(self.rate_limit_rps) <= 0:
+			print(f'[WARNING] rate_limit_rps for provider "{self.name}" must be positive, rate limit disabled')
+			self.rate_limit_rps = None
+		if self.max_in_flight is not None and int(self.max_in_flight) < 1:
+			print(f'[WARNING] max_in_flight for provider "{self.name}" must be at least 1, limit disabled')
+			self.max_in_flight = None
+
+		if self.waf_solver not in ('playwright', 'http'):
+			print(f'[WARNING] Unknown waf_solver "{self.waf_solver}" for provider "{self.name}", using playwright')
+			self.waf_solver = 'playwright'
+
+		if self.waf_wait not in ('cookies', 'networkidle'):
+			print(f'[WARNING] Unknown waf_wait "{self.waf_wait}" for provider "{self.name}", using cookies')
+			self.waf_wait = 'cookies'
+
 	@classmethod
 	def from_dict(cls, name: str, data: dict) -> 'ProviderConfig':
 		"""从字典创建 ProviderConfig
@@ -55,6 +196,13 @@ class ProviderConfig:
 			api_user_key=data.get('api_user_key', 'new-api-user'),
 			bypass_method=data.get('bypass_method'),
 			waf_cookie_names = data.get('waf_cookie_names'),
+			waf_solver=data.get('waf_solver', 'playwright'),
+			waf_wait=data.get('waf_wait', 'cookies'),
+			waf_block_resources=bool(data.get('waf_block_resources', True)),
+			retry=RetryPolicy.from_dict(data.get('retry')),
+			rate_limit_rps=data.get('rate_limit_rps'),
+			rate_limit_burst=data.get('rate_limit_burst', 1),
+			max_in_flight=data.get('max_in_flight'),
 		)
 
 	def needs_waf_cookies(self) -> bool:
@@ -71,10 +219,45 @@ class AppConfig:
 	"""应用配置"""
 
 	providers: Dict[str, ProviderConfig]
+	max_workers: int = 1
+	browser_concurrency: int = 1
+	browser_mode: Literal['headed', 'headless', 'headless-shell'] = 'headed'
+	browser_profile_dir: str | None = None
+	browser_processes: int = 1
+	http_concurrency: int = 10
+	adaptive_concurrency: bool = False
+	waf_share_group_size: int = 1
+	waf_cookie_cache: Literal['off', 'provider', 'account'] = 'provider'
+	waf_cookie_ttl: int = 1800
+	trace_dir: str | None = None
+	trace_formats: tuple[str, ...] = ('jsonl',)
+	schedule: str = '0 9 * * *'
+	schedule_jitter: int = 0
 
 	@classmethod
 	def load_from_env(cls) -> 'AppConfig':
 		"""从环境变量加载配置"""
+		return cls(
+			providers=cls._load_providers_from_env(),
+			max_workers=_get_int_env('MAX_WORKERS', 1),
+			browser_concurrency=_get_int_env('BROWSER_CONCURRENCY', 1),
+			browser_mode=_get_choice_env('BROWSER_MODE', ('headed', 'headless', 'headless-shell'), 'headed'),
+			browser_profile_dir=os.getenv('BROWSER_PROFILE_DIR', '').strip() or None,
+			browser_processes=_get_browser_processes(),
+			http_concurrency=_get_int_env('HTTP_CONCURRENCY', 10),
+			adaptive_concurrency=_get_choice_env('ADAPTIVE_CONCURRENCY', ('off', 'on'), 'off') == 'on',
+			waf_share_group_size=_get_waf_share_group_size(),
+			waf_cookie_cache=_get_choice_env('WAF_COOKIE_CACHE', ('off', 'provider', 'account'), 'provider'),
+			waf_cookie_ttl=_get_int_env('WAF_COOKIE_TTL', 1800, minimum=0),
+			trace_dir=os.getenv('TRACE_DIR', '').strip() or None,
+			trace_formats=_get_trace_formats(),
+			schedule=os.getenv('CHECKIN_SCHEDULE', '').strip() or '0 9 * * *',
+			schedule_jitter=_get_int_env('CHECKIN_JITTER', 0, minimum=0),
+		)
+
+	@staticmethod
+	def _load_providers_from_env() -> Dict[str, ProviderConfig]:
+		"""加载内置 providers 并合并 PROVIDERS 环境变量中的自定义配置"""
 		providers = {
 			'anyrouter': ProviderConfig(
 				name='anyrouter',
@@ -106,7 +289,7 @@ class AppConfig:
 
 				if not isinstance(providers_data, dict):
 					print('[WARNING] PROVIDERS must be a JSON object, ignoring custom providers')
-					return cls(providers=providers)
+					return providers
 
 				# 解析自定义 providers,会覆盖默认配置
 				for name, provider_data in providers_data.items():
@@ -124,14 +307,14 @@ class AppConfig:
 			except Exception as e:
 				print(f'[WARNING] Error loading PROVIDERS: {e}, using default configuration only')
 
-		return cls(providers=providers)
+		return providers
 
 	def get_provider(self, name: str) -> ProviderConfig | None:
 		"""获取指定 provider 配置"""
 		return self.providers.get(name)
 
 
-@dataclass
+@dataclass(slots=True)
 class AccountConfig:
 	"""账号配置"""
 
@@ -152,9 +335,173 @@ class AccountConfig:
 		"""获取显示名称"""
 		return self.name if self.name else f'Account {index + 1}'
 
+	def get_account_key(self) -> str:
+		"""获取与账号顺序无关的唯一标识"""
+		return f'{self.provider}:{self.api_user}'
+
+
+def _validate_account_dict(account_dict, index: int) -> str | None:
+	"""校验单个账号记录，返回错误信息，合法时返回 None"""
+	if not isinstance(account_dict, dict):
+		return f'Account {index + 1} configuration format is incorrect'
+
+	if 'cookies' not in account_dict or 'api_user' not in account_dict:
+		return f'Account {index + 1} missing required fields (cookies, api_user)'
+
+	if 'name' in account_dict and not account_dict['name']:
+		return f'Account {index + 1} name field cannot be empty'
+
+	return None
+
+
+def _iter_json_lines(f: TextIO) -> Iterator[tuple[int, object]]:
+	"""逐行解析 JSON Lines，空行与 # 开头的行会被忽略，解析失败的行返回异常"""
+	for line_number, line in enumerate(f, 1):
+		line = line.strip()
+		if not line or line.startswith('#'):
+			continue
+		try:
+			yield line_number, json.loads(line)
+		except json.JSONDecodeError as e:
+			yield line_number, e
+
+
+def _iter_json_array(f: TextIO, chunk_size: int = 65536) -> Iterator[tuple[int, object]]:
+	"""增量解析 JSON 数组，每次只在缓冲区中保留尚未解析的部分
+
+	解析失败的记录返回带字节偏移的异常，并跳到下一条记录继续解析。
+	"""
+	decoder = json.JSONDecoder()
+	buffer = f.read(chunk_size)
+	position = buffer.index('[') + 1
+	# 已从缓冲区丢弃的内容的字节数，用于在错误信息中给出偏移
+	consumed = 0
+
+	def read_more() -> bool:
+		"""丢弃 position 之前的内容并读入下一块，文件已读完时返回 False"""
+		nonlocal buffer, position, consumed
+		chunk = f.read(chunk_size)
+		if not chunk:
+			return False
+		consumed += len(buffer[:position].encode('utf-8'))
+		buffer, position = buffer[position:] + chunk, 0
+		return True
+
+	def skip_item() -> None:
+		"""跳过无法解析的记录，停在下一个顶层的 , 或 ] 处"""
+		nonlocal position
+		depth, in_string, escaped = 0, False, False
+		while True:
+			if position >= len(buffer) and not read_more():
+				raise ValueError('Unexpected end of file, JSON array is not closed')
+			char = buffer[position]
+			if in_string:
+				if escaped:
+					escaped = False
+				elif char == '\\':
+					escaped = True
+				elif char == '"':
+					in_string = False
+			elif char == '"':
+				in_string = True
+			elif char in '[{':
+				depth += 1
+			elif char in ']}' and depth > 0:
+				depth -= 1
+			elif char == ']' or (char == ',' and depth == 0):
+				return
+			position += 1
+
+	item_number = 0
+	while True:
+		while position < len(buffer) and buffer[position] in ' \t\r\n,':
+			position += 1
+		if position >= len(buffer):
+			if not read_more():
+				raise ValueError('Unexpected end of file, JSON array is not closed')
+			continue
+		if buffer[position] == ']':
+			return
+
+		try:
+			item, end = decoder.raw_decode(buffer, position)
+		except json.JSONDecodeError as e:
+			# 错误出现在缓冲区末尾附近时可能只是记录被截断，读入更多内容后重试
+			truncated = e.msg.startswith('Unterminated string') or len(buffer) - e.pos < 16
+			if truncated and read_more():
+				continue
+			item_number += 1
+			yield item_number, ValueError(f'{e.msg} (byte offset {consumed + len(buffer[: e.pos].encode("utf-8"))})')
+			skip_item()
+			continue
+
+		# 数字等记录可能恰好在缓冲区末尾被截断，只有后面跟着 , 或 ] 时才算完整
+		separator = end
+		while separator < len(buffer) and buffer[separator] in ' \t\r\n':
+			separator += 1
+		if separator >= len(buffer):
+			if not read_more():
+				raise ValueError('Unexpected end of file, JSON array is not closed')
+			continue
+
+		item_number += 1
+		if buffer[separator] not in ',]':
+			offset = consumed + len(buffer[:separator].encode('utf-8'))
+			yield item_number, ValueError(f"Expecting ',' delimiter (byte offset {offset})")
+			skip_item()
+			continue
+
+		yield item_number, item
+		position = separator
+		if position > chunk_size:
+			consumed += len(buffer[:position].encode('utf-8'))
+			buffer, position = buffer[position:], 0
+
+
+class AccountsFile:
+	"""从文件逐条读取账号，支持 JSON Lines 与 JSON 数组两种格式
+
+	每次迭代都会重新打开文件，账号边读边交给处理流程，内存占用与账号总数无关。
+	单条记录不合法时打印错误并跳过，不影响其它账号。
+	"""
+
+	def __init__(self, path: Path | str):
+		self.path = Path(path)
+
+	def __iter__(self) -> Iterator[AccountConfig]:
+		with open(self.path, 'r', encoding='utf-8-sig') as f:
+			first = f.read(1)
+			while first and first.isspace():
+				first = f.read(1)
+			f.seek(0)
+			records = _iter_json_array(f) if first == '[' else _iter_json_lines(f)
+			unit = 'item' if first == '[' else 'line'
+
+			# 序号按记录计数，跳过的记录不会改变后续账号的默认名称
+			index = -1
+			try:
+				for index, (number, record) in enumerate(records):
+					if isinstance(record, Exception):
+						print(f'ERROR: {self.path} {unit} {number}: invalid JSON: {record}')
+						continue
+					error = _validate_account_dict(record, index)
+					if error:
+						print(f'ERROR: {self.path} {unit} {number}: {error}')
+						continue
+					yield AccountConfig.from_dict(record, index)
+			except ValueError as e:
+				print(f'ERROR: Failed to parse {self.path} after {index + 1} record(s): {e}')
+
+
+def load_accounts_config() -> list[AccountConfig] | AccountsFile | None:
+	"""加载账号配置，设置了 ANYROUTER_ACCOUNTS_FILE 时从文件逐条读取，否则从环境变量加载"""
+	accounts_file = os.getenv('ANYROUTER_ACCOUNTS_FILE', '').strip()
+	if accounts_file:
+		if not os.path.isfile(accounts_file):
+			print(f'ERROR: Account file {accounts_file} not found')
+			return None
+		return AccountsFile(accounts_file)
 
-def load_accounts_config() -> list[AccountConfig] | None:
-	"""从环境变量加载账号配置"""
 	accounts_str = os.getenv('ANYROUTER_ACCOUNTS')
 	if not accounts_str:
 		print('ERROR: ANYROUTER_ACCOUNTS environment variable not found')
@@ -169,16 +516,9 @@ def load_accounts_config() -> list[AccountConfig] | None:
 
 		accounts = []
 		for i, account_dict in enumerate(accounts_data):
-			if not isinstance(account_dict, dict):
-				print(f'ERROR: Account {i + 1} configuration format is incorrect')
-				return None
-
-			if 'cookies' not in account_dict or 'api_user' not in account_dict:
-				print(f'ERROR: Account {i + 1} missing required fields (cookies, api_user)')
-				return None
-
-			if 'name' in account_dict and not account_dict['name']:
-				print(f'ERROR: Account {i + 1} name field cannot be empty')
+			error = _validate_account_dict(account_dict, i)
+			if error:
+				print(f'ERROR: {error}')
 				return None
 
 			accounts.append(AccountConfig.from_dict(account_dict, i))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+WAF cookies 本地缓存
+"""
+
+import time
+from pathlib import Path
+
+from utils.storage import atomic_write_json, load_json, state_path
+
+
+class WafCookieCache:
+	"""按 provider 域名(可选按账号)缓存 WAF cookies，并记录过期时间
+
+	修改只在内存中进行，调用 save() 时一次性原子写回磁盘。
+	"""
+
+	def __init__(self, path: Path | None = None, scope: str = 'provider', default_ttl: int = 1800):
+		self.path = path or state_path('waf_cookies.json')
+		self.scope = scope
+		self.default_ttl = default_ttl
+		self._entries: dict[str, dict] = {}
+		self._dirty = False
+		self._loaded = False
+
+	@property
+	def enabled(self) -> bool:
+		return self.scope != 'off'
+
+	def _key(self, domain: str, account_key: str | None) -> str:
+		if self.scope == 'account' and account_key:
+			return f'{domain}|{account_key}'
+		return domain
+
+	def _load(self):
+		if self._loaded:
+			return
+		self._loaded = True
+		data = load_json(self.path, {})
+		if not isinstance(data, dict):
+			return
+		now = time.time()
+		for key, entry in data.items():
+			if isinstance(entry, dict) and isinstance(entry.get('cookies'), dict) and entry.get('expires_at', 0) > now:
+				self._entries[key] = entry
+
+	def get(self, domain: str, account_key: str | None = None) -> dict | None:
+		"""返回未过期的 cookies，不存在或已过期时返回 None"""
+		if not self.enabled:
+			return None
+		self._load()
+		entry = self._entries.get(self._key(domain, account_key))
+		if not entry or entry['expires_at'] <= time.time():
+			return None
+		return dict(entry['cookies'])
+
+	def ttl(self, domain: str, account_key: str | None = None) -> float:
+		"""剩余有效秒数，未命中时为 0"""
+		self._load()
+		entry = self._entries.get(self._key(domain, account_key))
+		return max(0.0, entry['expires_at'] - time.time()) if entry else 0.0
+
+	def set(self, domain: str, cookies: dict, expires_at: float | None = None, account_key: str | None = None):
+		"""写入 cookies，expires_at 为空时使用默认 TTL，且不会超过默认 TTL"""
+		if not self.enabled or not cookies:
+			return
+		self._load()
+		now = time.time()
+		max_expires_at = now + self.default_ttl
+		expires_at = min(expires_at, max_expires_at) if expires_at else max_expires_at
+		if expires_at <= now:
+			return
+		self._entries[self._key(domain, account_key)] = {
+			'cookies': dict(cookies),
+			'expires_at': expires_at,
+			'saved_at': now,
+		}
+		self._dirty = True
+
+	def invalidate(self, domain: str, account_key: str | None = None):
+		"""删除失效的 cookies"""
+		self._load()
+		if self._entries.pop(self._key(domain, account_key), None) is not None:
+			self._dirty = True
+
+	def save(self):
+		"""清理过期条目后原子写回磁盘"""
+		if not self._dirty:
+			return
+		now = time.time()
+		entries = {key: entry for key, entry in self._entries.items() if entry['expires_at'] > now}
+		if atomic_write_json(self.path, entries):
+			self._dirty = False
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+共享 HTTP 连接池
+"""
+
+import time
+from http.cookiejar import DefaultCookiePolicy
+
+import httpx
+
+from utils.ratelimit import ProviderRateLimiter
+from utils.waf import extract_acw_arg1
+
+# 服务商限流或拒绝访问时的状态码
+THROTTLE_STATUS = (403, 429, 503)
+
+
+def format_cookie_header(cookies: dict) -> str:
+	"""将 cookies 字典转换为 Cookie 请求头"""
+	return '; '.join(f'{key}={value}' for key, value in cookies.items())
+
+
+def is_throttled(request: httpx.Request, response: httpx.Response) -> bool:
+	"""请求被限流、拒绝，或接口请求被 WAF 挑战页拦截 (登录页返回挑战页是求解流程的一部分，不计入)"""
+	if response.status_code in THROTTLE_STATUS:
+		return True
+	if '/api/' not in request.url.path or 'json' in response.headers.get('content-type', ''):
+		return False
+	return extract_acw_arg1(response.text) is not None
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+	"""在连接层统一限速，经同一客户端发出的所有请求都会受限，并把请求结果上报给限速器"""
+
+	def __init__(self, transport: httpx.AsyncBaseTransport, limiter: ProviderRateLimiter):
+		self.transport = transport
+		self.limiter = limiter
+
+	async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+		async with self.limiter.limit():
+			started_at = time.monotonic()
+			try:
+				response = await self.transport.handle_async_request(request)
+				# 读完响应体再释放并发名额
+				await response.aread()
+			except httpx.TransportError:
+				await self.limiter.record(started_at, time.monotonic() - started_at, True, request.url.path)
+				raise
+			latency = time.monotonic() - started_at
+			await self.limiter.record(started_at, latency, is_throttled(request, response), request.url.path)
+			return response
+
+	async def aclose(self):
+		await self.transport.aclose()
+
+
+class HttpClientPool:
+	"""按 provider 域名复用 httpx.AsyncClient，同域名的账号共享一条 HTTP/2 连接
+
+	客户端本身不保存任何 cookie，账号 cookies 通过每个请求的 Cookie 头传入，
+	避免共享连接时账号之间串号。
+	"""
+
+	def __init__(
+		self, timeout: float = 30.0, max_connections: int = 10, transport: httpx.AsyncBaseTransport | None = None
+	):
+		self.timeout = timeout
+		self.transport = transport
+		self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+		self._clients: dict[str, httpx.AsyncClient] = {}
+
+	def get(self, domain: str, limiter: ProviderRateLimiter | None = None) -> httpx.AsyncClient:
+		"""获取域名对应的客户端，不存在时创建，limiter 只在创建时生效"""
+		client = self._clients.get(domain)
+		if client is None or client.is_closed:
+			transport = self.transport
+			if limiter and limiter.enabled:
+				transport = RateLimitedTransport(
+					transport or httpx.AsyncHTTPTransport(http2=True, limits=self.limits), limiter
+				)
+			client = httpx.AsyncClient(http2=True, timeout=self.timeout, limits=self.limits, transport=transport)
+			# 拒绝所有 Set-Cookie，保证客户端 cookie 罐始终为空
+			client.cookies.jar.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+			self._clients[domain] = client
+		return client
+
+	async def close(self):
+		"""关闭所有客户端"""
+		for client in self._clients.values():
+			await client.aclose()
+		self._clients.clear()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+账号签到台账
+"""
+
+import time
+from datetime import date
+from pathlib import Path
+
+from utils.storage import atomic_write_json, load_json, state_path
+
+
+class RunLedger:
+	"""记录每个账号最近一次处理的日期、结果与余额，用于跳过当天已成功的账号"""
+
+	def __init__(self, path: Path | None = None):
+		self.path = path or state_path('checkin_ledger.json')
+		data = load_json(self.path, {})
+		self._entries: dict[str, dict] = data if isinstance(data, dict) else {}
+
+	def get(self, account_key: str) -> dict | None:
+		return self._entries.get(account_key)
+
+	def is_done(self, account_key: str, day: date | None = None) -> bool:
+		"""该账号在指定日期(默认今天)是否已经签到成功"""
+		entry = self._entries.get(account_key)
+		day = day or date.today()
+		return bool(entry and entry.get('success') and entry.get('date') == day.isoformat())
+
+	def record(
+		self,
+		account_key: str,
+		success: bool,
+		quota: float | None = None,
+		used_quota: float | None = None,
+		day: date | None = None,
+	):
+		"""记录本次处理结果，quota 为空 (获取余额失败) 时保留上一次的余额"""
+		previous = self._entries.get(account_key, {})
+		if quota is None:
+			quota, used_quota = previous.get('quota'), previous.get('used_quota')
+		self._entries[account_key] = {
+			'date': (day or date.today()).isoformat(),
+			'success': success,
+			'quota': quota,
+			'used_quota': used_quota,
+			'updated_at': time.time(),
+		}
+
+	def save(self) -> bool:
+		return atomic_write_json(self.path, self._entries)
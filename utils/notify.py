@@ -1,10 +1,107 @@
+import asyncio
+import html
 import os
-import smtplib
-from email.mime.text import MIMEText
-from typing import Literal
+import time
+from dataclasses import dataclass
+from typing import Callable, Literal
 
 import httpx
 
+from utils.ratelimit import TokenBucket
+from utils.tracing import tracer
+
+# 支持富文本的渠道优先使用的内容格式，未提供对应格式时发送纯文本
+CHANNEL_FORMATS = {'Email': 'html', 'PushPlus': 'html', 'Feishu': 'markdown'}
+
+
+@dataclass(frozen=True)
+class ChannelLimits:
+	"""渠道单条消息的长度上限与发送速率"""
+
+	max_length: int | None = None
+	count_bytes: bool = True
+	rate: float | None = None
+	burst: int = 1
+
+	def measure(self, text: str) -> int:
+		return len(text.encode('utf-8')) if self.count_bytes else len(text)
+
+	def content_length(self, title: str) -> int | None:
+		"""单条消息中正文可用的长度，扣除标题与预留的长度，没有上限时返回 None"""
+		return self.max_length and self.max_length - self.measure(title) - _CHUNK_RESERVE
+
+
+# 长度上限按各渠道文档取值并留有余量，超出时拆成多条按速率依次发送
+CHANNEL_LIMITS = {
+	'Telegram': ChannelLimits(4096, count_bytes=False, rate=1),
+	'DingTalk': ChannelLimits(20000, rate=0.3, burst=2),
+	'WeChat Work': ChannelLimits(2048, rate=0.3, burst=2),
+	'Feishu': ChannelLimits(28000, rate=1.5, burst=5),
+	'Server Push': ChannelLimits(32000),
+	'Bark': ChannelLimits(3000),
+}
+NO_LIMITS = ChannelLimits()
+# 标题、分段序号与渠道自带的格式字符预留的长度
+_CHUNK_RESERVE = 32
+
+
+def _hard_split(text: str, max_length: int, measure: Callable[[str], int]) -> list[str]:
+	"""按字符切分单行超长的文本"""
+	pieces = []
+	while text:
+		low, high = 1, len(text)
+		while low < high:
+			middle = (low + high + 1) // 2
+			if measure(text[:middle]) <= max_length:
+				low = middle
+			else:
+				high = middle - 1
+		pieces.append(text[:low])
+		text = text[low:]
+	return pieces
+
+
+def split_message(content: str, max_length: int | None, measure: Callable[[str], int] = len) -> list[str]:
+	"""把内容拆成不超过 max_length 的若干段，优先在空行处断开，其次在换行处，单行超长时按字符切分"""
+	if max_length is None or measure(content) <= max_length:
+		return [content]
+
+	chunks = []
+	for separator in ('\n\n', '\n'):
+		parts = content.split(separator)
+		if len(parts) > 1:
+			break
+	else:
+		return _hard_split(content, max_length, measure)
+
+	current = ''
+	for part in parts:
+		candidate = f'{current}{separator}{part}' if current else part
+		if measure(candidate) <= max_length:
+			current = candidate
+			continue
+		if current:
+			chunks.append(current)
+		if measure(part) <= max_length:
+			current = part
+		else:
+			chunks.extend(split_message(part, max_length, measure))
+			current = ''
+	if current:
+		chunks.append(current)
+	return chunks
+
+
+@dataclass
+class ChannelResult:
+	"""单个通知渠道的推送结果"""
+
+	name: str
+	success: bool
+	latency: float
+	error: str | None = None
+	chunks: int = 1
+
 
 class NotificationKit:
 	def __init__(self):
@@ -26,17 +123,65 @@ class NotificationKit:
 		self.telegram_chat_id = os.getenv('TELEGRAM_CHAT_ID')
 		self.bark_key = os.getenv('BARK_KEY')
 		self.bark_server = os.getenv('BARK_SERVER', 'https://api.day.app')
+		self.detail_mode = os.getenv('NOTIFY_DETAIL', 'full').strip().lower() or 'full'
+		self.report_url = os.getenv('NOTIFY_REPORT_URL', '').strip() or None
+		# 各渠道共用的令牌桶，同一渠道的多条消息 (分段、重试、发件箱积压) 都受同一个速率限制
+		self._buckets: dict[str, TokenBucket] = {}
+		self._buckets_loop: asyncio.AbstractEventLoop | None = None
 
-	def send_email(self, title: str, content: str, msg_type: Literal['text', 'html'] = 'text'):
+	def get_bucket(self, name: str) -> TokenBucket | None:
+		"""渠道的令牌桶，没有速率限制的渠道返回 None；令牌桶绑定事件循环，换了事件循环时重新创建"""
+		limits = CHANNEL_LIMITS.get(name, NO_LIMITS)
+		if not limits.rate:
+			return None
+		loop = asyncio.get_running_loop()
+		if loop is not self._buckets_loop:
+			self._buckets, self._buckets_loop = {}, loop
+		bucket = self._buckets.get(name)
+		if bucket is None:
+			bucket = self._buckets[name] = TokenBucket(limits.rate, limits.burst)
+		return bucket
+
+	def use_digest(self, title: str, content: str) -> bool:
+		"""NOTIFY_DETAIL 为 digest 时总是发送摘要；为 auto 时，任一已配置渠道需要拆成多条才发送摘要"""
+		if self.detail_mode == 'digest':
+			return True
+		if self.detail_mode != 'auto':
+			return False
+		return any(
+			len(split_message(content, limits.content_length(title), limits.measure)) > 1
+			for limits in (CHANNEL_LIMITS.get(name, NO_LIMITS) for name in self.get_configured_channels())
+		)
+
+	def send_email(
+		self,
+		title: str,
+		content: str,
+		msg_type: Literal['text', 'html'] = 'text',
+		attachments: list[tuple[str, str]] | None = None,
+	):
 		if not self.email_user or not self.email_pass or not self.email_to:
 			raise ValueError('Email configuration not set')
 
+		# 只有发送邮件时才需要，不在启动时加载
+		import smtplib
+		from email.mime.application import MIMEApplication
+		from email.mime.multipart import MIMEMultipart
+		from email.mime.text import MIMEText
+
 		# 如果未设置 EMAIL_SENDER，使用 EMAIL_USER 作为默认值
 		sender = self.email_sender if self.email_sender else self.email_user
 
 		# MIMEText 需要 'plain' 或 'html'，而不是 'text'
 		mime_subtype = 'plain' if msg_type == 'text' else 'html'
 		msg = MIMEText(content, mime_subtype, 'utf-8')
+		if attachments:
+			body, msg = msg, MIMEMultipart()
+			msg.attach(body)
+			for filename, data in attachments:
+				part = MIMEApplication(data.encode('utf-8'), Name=filename)
+				part['Content-Disposition'] = f'attachment; filename="{filename}"'
+				msg.attach(part)
 		msg['From'] = f'AnyRouter Assistant <{sender}>'
 		msg['To'] = self.email_to
 		msg['Subject'] = title
@@ -50,30 +195,47 @@ class NotificationKit:
 		if not self.pushplus_token:
 			raise ValueError('PushPlus Token not configured')
 
-		data = {'token': self.pushplus_token, 'title': title, 'content': content, 'template': 'html'}
+		url, data = self._pushplus_request(title, content)
 		with httpx.Client(timeout=30.0) as client:
-			client.post('http://www.pushplus.plus/send', json=data)
+			client.post(url, json=data)
+
+	def _pushplus_request(self, title: str, content: str) -> tuple[str, dict]:
+		data = {'token': self.pushplus_token, 'title': title, 'content': content, 'template': 'html'}
+		return 'http://www.pushplus.plus/send', data
 
 	def send_serverPush(self, title: str, content: str):
 		if not self.server_push_key:
 			raise ValueError('Server Push key not configured')
 
-		data = {'title': title, 'desp': content}
+		url, data = self._server_push_request(title, content)
 		with httpx.Client(timeout=30.0) as client:
-			client.post(f'https://sctapi.ftqq.com/{self.server_push_key}.send', json=data)
+			client.post(url, json=data)
+
+	def _server_push_request(self, title: str, content: str) -> tuple[str, dict]:
+		data = {'title': title, 'desp': content}
+		return f'https://sctapi.ftqq.com/{self.server_push_key}.send', data
 
 	def send_dingtalk(self, title: str, content: str):
 		if not self.dingding_webhook:
 			raise ValueError('DingTalk Webhook not configured')
 
-		data = {'msgtype': 'text', 'text': {'content': f'{title}\n{content}'}}
+		url, data = self._dingtalk_request(title, content)
 		with httpx.Client(timeout=30.0) as client:
-			client.post(self.dingding_webhook, json=data)
+			client.post(url, json=data)
+
+	def _dingtalk_request(self, title: str, content: str) -> tuple[str, dict]:
+		data = {'msgtype': 'text', 'text': {'content': f'{title}\n{content}'}}
+		return self.dingding_webhook, data
 
 	def send_feishu(self, title: str, content: str):
 		if not self.feishu_webhook:
 			raise ValueError('Feishu Webhook not configured')
 
+		url, data = self._feishu_request(title, content)
+		with httpx.Client(timeout=30.0) as client:
+			client.post(url, json=data)
+
+	def _feishu_request(self, title: str, content: str) -> tuple[str, dict]:
 		data = {
 			'msg_type': 'interactive',
 			'card': {
@@ -81,51 +243,64 @@ class NotificationKit:
 				'header': {'template': 'blue', 'title': {'content': title, 'tag': 'plain_text'}},
 			},
 		}
-		with httpx.Client(timeout=30.0) as client:
-			client.post(self.feishu_webhook, json=data)
+		return self.feishu_webhook, data
 
 	def send_wecom(self, title: str, content: str):
 		if not self.weixin_webhook:
 			raise ValueError('WeChat Work Webhook not configured')
 
-		data = {'msgtype': 'text', 'text': {'content': f'{title}\n{content}'}}
+		url, data = self._wecom_request(title, content)
 		with httpx.Client(timeout=30.0) as client:
-			client.post(self.weixin_webhook, json=data)
+			client.post(url, json=data)
+
+	def _wecom_request(self, title: str, content: str) -> tuple[str, dict]:
+		data = {'msgtype': 'text', 'text': {'content': f'{title}\n{content}'}}
+		return self.weixin_webhook, data
 
 	def send_gotify(self, title: str, content: str):
 		if not self.gotify_url or not self.gotify_token:
 			raise ValueError('Gotify URL or Token not configured')
 
+		url, data = self._gotify_request(title, content)
+		with httpx.Client(timeout=30.0) as client:
+			client.post(url, json=data)
+
+	def _gotify_request(self, title: str, content: str) -> tuple[str, dict]:
 		# 使用环境变量配置的优先级，默认为9
 		priority = self.gotify_priority
 
 		# 确保优先级在有效范围内 (1-10)
 		priority = max(1, min(10, priority))
 
-		data = {
-			'title': title,
-			'message': content,
-			'priority': priority
-		}
+		data = {'title': title, 'message': content, 'priority': priority}
 
 		url = f'{self.gotify_url}?token={self.gotify_token}'
-		with httpx.Client(timeout=30.0) as client:
-			client.post(url, json=data)
+		return url, data
 
 	def send_telegram(self, title: str, content: str):
 		if not self.telegram_bot_token or not self.telegram_chat_id:
 			raise ValueError('Telegram Bot Token or Chat ID not configured')
 
-		message = f'<b>{title}</b>\n\n{content}'
-		data = {'chat_id': self.telegram_chat_id, 'text': message, 'parse_mode': 'HTML'}
-		url = f'https://api.telegram.org/bot{self.telegram_bot_token}/sendMessage'
+		url, data = self._telegram_request(title, content)
 		with httpx.Client(timeout=30.0) as client:
 			client.post(url, json=data)
 
+	def _telegram_request(self, title: str, content: str) -> tuple[str, dict]:
+		# parse_mode 为 HTML，内容中的 <、& 需要转义
+		message = f'<b>{html.escape(title, quote=False)}</b>\n\n{html.escape(content, quote=False)}'
+		data = {'chat_id': self.telegram_chat_id, 'text': message, 'parse_mode': 'HTML'}
+		url = f'https://api.telegram.org/bot{self.telegram_bot_token}/sendMessage'
+		return url, data
+
 	def send_bark(self, title: str, content: str):
 		if not self.bark_key:
 			raise ValueError('Bark Key not configured')
 
+		url, data = self._bark_request(title, content)
+		with httpx.Client(timeout=30.0) as client:
+			client.post(url, json=data)
+
+	def _bark_request(self, title: str, content: str) -> tuple[str, dict]:
 		# Bark API 支持 GET/POST，这里使用 POST JSON 方式支持更多参数
 		# 文档: https://bark.day.app/#/tutorial
 		url = f'{self.bark_server.rstrip("/")}/push'
@@ -134,11 +309,37 @@ class NotificationKit:
 			'title': title,
 			'body': content,
 			'icon': 'https://anyrouter.top/favicon.ico',  # 可选：尝试使用 AnyRouter 图标
-			'group': 'AnyRouter'
+			'group': 'AnyRouter',
 		}
+		return url, data
 
-		with httpx.Client(timeout=30.0) as client:
-			client.post(url, json=data)
+	def get_configured_channels(self) -> list[str]:
+		"""返回已配置的通知渠道名称"""
+		configured = {
+			'Email': bool(self.email_user and self.email_pass and self.email_to),
+			'PushPlus': bool(self.pushplus_token),
+			'Server Push': bool(self.server_push_key),
+			'DingTalk': bool(self.dingding_webhook),
+			'Feishu': bool(self.feishu_webhook),
+			'WeChat Work': bool(self.weixin_webhook),
+			'Gotify': bool(self.gotify_url and self.gotify_token),
+			'Telegram': bool(self.telegram_bot_token and self.telegram_chat_id),
+			'Bark': bool(self.bark_key),
+		}
+		return [name for name, enabled in configured.items() if enabled]
+
+	def _build_request(self, name: str, title: str, content: str) -> tuple[str, dict]:
+		builders = {
+			'PushPlus': self._pushplus_request,
+			'Server Push': self._server_push_request,
+			'DingTalk': self._dingtalk_request,
+			'Feishu': self._feishu_request,
+			'WeChat Work': self._wecom_request,
+			'Gotify': self._gotify_request,
+			'Telegram': self._telegram_request,
+			'Bark': self._bark_request,
+		}
+		return builders[name](title, content)
 
 	def push_message(self, title: str, content: str, msg_type: Literal['text', 'html'] = 'text'):
 		notifications = [
@@ -153,12 +354,101 @@ class NotificationKit:
 			('Bark', lambda: self.send_bark(title, content)),
 		]
 
+		configured = set(self.get_configured_channels())
 		for name, func in notifications:
+			if name not in configured:
+				continue
 			try:
 				func()
 				print(f'[{name}]: Message push successful!')
 			except Exception as e:
 				print(f'[{name}]: Message push failed! Reason: {str(e)}')
 
+	async def send_channel(
+		self,
+		client: httpx.AsyncClient,
+		name: str,
+		title: str,
+		content: str,
+		msg_type: Literal['text', 'html'],
+		formats: dict[str, str] | None = None,
+		attachments: list[tuple[str, str]] | None = None,
+	) -> ChannelResult:
+		"""按渠道的长度上限拆分内容，每条消息都经过渠道共用的令牌桶依次发送，某一条失败时不再发送后续内容"""
+		preferred = CHANNEL_FORMATS.get(name)
+		if formats and preferred in formats:
+			content = formats[preferred]
+			msg_type = 'html' if preferred == 'html' else msg_type
+		limits = CHANNEL_LIMITS.get(name, NO_LIMITS)
+		chunks = split_message(content, limits.content_length(title), limits.measure)
+		bucket = self.get_bucket(name)
+
+		started = time.perf_counter()
+		sent = 0
+		try:
+			with tracer.span('notify.channel', channel=name, chunks=len(chunks)):
+				for sent, chunk in enumerate(chunks):
+					chunk_title = f'{title} ({sent + 1}/{len(chunks)})' if len(chunks) > 1 else title
+					if bucket:
+						await bucket.acquire()
+					if name == 'Email':
+						# smtplib 是阻塞的，放到线程中与其它渠道并行
+						await asyncio.to_thread(self.send_email, chunk_title, chunk, msg_type, attachments)
+					else:
+						url, data = self._build_request(name, chunk_title, chunk)
+						response = await client.post(url, json=data)
+						response.raise_for_status()
+			result = ChannelResult(name, True, time.perf_counter() - started, chunks=len(chunks))
+			parts = f', {len(chunks)} parts' if len(chunks) > 1 else ''
+			print(f'[{name}]: Message push successful! ({result.latency:.2f}s{parts})')
+		except Exception as e:
+			error = f'part {sent + 1}/{len(chunks)}: {e}' if len(chunks) > 1 else str(e)
+			result = ChannelResult(name, False, time.perf_counter() - started, error, len(chunks))
+			print(f'[{name}]: Message push failed! ({result.latency:.2f}s) Reason: {result.error}')
+		return result
+
+	async def push_message_async(
+		self,
+		title: str,
+		content: str,
+		msg_type: Literal['text', 'html'] = 'text',
+		client: httpx.AsyncClient | None = None,
+		formats: dict[str, str] | None = None,
+		attachments: list[tuple[str, str]] | None = None,
+	) -> list[ChannelResult]:
+		"""并行推送到所有已配置的渠道，共用一个连接池，返回每个渠道的结果与耗时
+
+		formats 为同一内容的其它格式 ({'html': ..., 'markdown': ...})，按 CHANNEL_FORMATS 发给支持的渠道。
+		attachments 为 (文件名, 内容) 列表，只随邮件发送。
+		"""
+		channels = self.get_configured_channels()
+		if not channels:
+			print('[Notify]: No notification channel configured, skipping')
+			return []
+
+		if client is None:
+			async with httpx.AsyncClient(timeout=httpx.Timeout(15.0, connect=5.0)) as client:
+				return await self.push_message_async(title, content, msg_type, client, formats, attachments)
+
+		results = await asyncio.gather(
+			*(self.send_channel(client, name, title, content, msg_type, formats, attachments) for name in channels)
+		)
+		return list(results)
+
+
+_notify: NotificationKit | None = None
+
+
+def get_notify(reload: bool = False) -> NotificationKit:
+	"""首次使用时才读取通知配置 (此时 .env 已加载)，reload 为 True 时重新读取"""
+	global _notify
+	if _notify is None or reload:
+		_notify = NotificationKit()
+	return _notify
+
 
-notify = NotificationKit()
+def __getattr__(name: str):
+	# 兼容 from utils.notify import notify，访问时才创建
+	if name == 'notify':
+		return get_notify()
+	raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
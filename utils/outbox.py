@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+通知发件箱
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+
+import httpx
+
+from utils.storage import state_path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+	id INTEGER PRIMARY KEY AUTOINCREMENT,
+	created_at REAL NOT NULL,
+	title TEXT NOT NULL,
+	content TEXT NOT NULL,
+	msg_type TEXT NOT NULL,
+	formats TEXT,
+	attachments TEXT
+);
+CREATE TABLE IF NOT EXISTS deliveries (
+	id INTEGER PRIMARY KEY AUTOINCREMENT,
+	message_id INTEGER NOT NULL REFERENCES messages(id),
+	channel TEXT NOT NULL,
+	day TEXT NOT NULL,
+	content_hash TEXT NOT NULL,
+	status TEXT NOT NULL DEFAULT 'pending',
+	attempts INTEGER NOT NULL DEFAULT 0,
+	next_attempt_at REAL NOT NULL,
+	last_error TEXT,
+	updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_deliveries_dedup ON deliveries (channel, day, content_hash);
+CREATE INDEX IF NOT EXISTS idx_deliveries_due ON deliveries (status, next_attempt_at);
+"""
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 5.0
+BACKOFF_MAX = 3600.0
+# 已结束的投递记录保留的时间
+RETENTION = 30 * 86400
+
+
+@dataclass
+class Delivery:
+	"""一条待投递到某个渠道的消息"""
+
+	id: int
+	channel: str
+	attempts: int
+	title: str
+	content: str
+	msg_type: str
+	formats: dict | None
+	attachments: list[tuple[str, str]] | None
+
+
+def content_hash(title: str, content: str) -> str:
+	return hashlib.sha256(f'{title}\0{content}'.encode('utf-8')).hexdigest()
+
+
+def retry_delay(attempts: int) -> float:
+	"""第 attempts 次失败后的等待时间，指数增长"""
+	return min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+
+
+class NotificationOutbox:
+	"""基于 SQLite 的通知发件箱
+
+	消息先按渠道写入发件箱再投递，失败的渠道按指数退避重试，进程退出后由下一次运行继续投递。
+	同一渠道同一天内容相同 (dedup_key 相同) 的消息只投递一次。
+	"""
+
+	def __init__(self, path: Path | str | None = None):
+		self.path = Path(path) if path else state_path('notify_outbox.db')
+		self._conn: sqlite3.Connection | None = None
+
+	@property
+	def conn(self) -> sqlite3.Connection:
+		if self._conn is None:
+			self.path.parent.mkdir(parents=True, exist_ok=True)
+			self._conn = sqlite3.connect(self.path)
+			self._conn.executescript(_SCHEMA)
+		return self._conn
+
+	def enqueue(
+		self,
+		title: str,
+		content: str,
+		channels: list[str],
+		msg_type: str = 'text',
+		formats: dict[str, str] | None = None,
+		attachments: list[tuple[str, str]] | None = None,
+		dedup_key: str | None = None,
+		day: date | None = None,
+	) -> list[str]:
+		"""为各渠道加入一条待投递的消息，返回实际加入的渠道
+
+		今天已向某渠道投递过 (或正在投递) 相同 dedup_key 的消息时跳过该渠道，dedup_key 默认为标题与内容的哈希。
+		"""
+		dedup_key = dedup_key or content_hash(title, content)
+		day_text = (day or date.today()).isoformat()
+		now = time.time()
+		with self.conn:
+			channels = [
+				channel
+				for channel in channels
+				if not self.conn.execute(
+					"SELECT 1 FROM deliveries WHERE channel = ? AND day = ? AND content_hash = ? AND status != 'failed'",
+					(channel, day_text, dedup_key),
+				).fetchone()
+			]
+			if not channels:
+				return []
+			message_id = self.conn.execute(
+				'INSERT INTO messages (created_at, title, content, msg_type, formats, attachments) VALUES (?, ?, ?, ?, ?, ?)',
+				(
+					now,
+					title,
+					content,
+					msg_type,
+					json.dumps(formats, ensure_ascii=False) if formats else None,
+					json.dumps(attachments, ensure_ascii=False) if attachments else None,
+				),
+			).lastrowid
+			self.conn.executemany(
+				'INSERT INTO deliveries (message_id, channel, day, content_hash, next_attempt_at, updated_at) '
+				'VALUES (?, ?, ?, ?, ?, ?)',
+				[(message_id, channel, day_text, dedup_key, now, now) for channel in channels],
+			)
+		return channels
+
+	def due(self, now: float | None = None) -> list[Delivery]:
+		"""到了重试时间的待投递消息，按加入顺序返回"""
+		rows = self.conn.execute(
+			'SELECT d.id, d.channel, d.attempts, m.title, m.content, m.msg_type, m.formats, m.attachments '
+			'FROM deliveries d JOIN messages m ON m.id = d.message_id '
+			"WHERE d.status = 'pending' AND d.next_attempt_at <= ? ORDER BY d.id",
+			(now if now is not None else time.time(),),
+		).fetchall()
+		return [
+			Delivery(
+				*row[:6],
+				formats=json.loads(row[6]) if row[6] else None,
+				attachments=[tuple(item) for item in json.loads(row[7])] if row[7] else None,
+			)
+			for row in rows
+		]
+
+	def next_attempt_at(self) -> float | None:
+		"""最近一次待重试的时间，没有待投递消息时返回 None"""
+		row = self.conn.execute("SELECT MIN(next_attempt_at) FROM deliveries WHERE status = 'pending'").fetchone()
+		return row[0]
+
+	def mark_sent(self, delivery_id: int):
+		with self.conn:
+			self.conn.execute(
+				"UPDATE deliveries SET status = 'sent', attempts = attempts + 1, last_error = NULL, updated_at = ? "
+				'WHERE id = ?',
+				(time.time(), delivery_id),
+			)
+
+	def mark_failed(self, delivery: Delivery, error: str | None, give_up: bool = False):
+		"""记录一次失败，未超过最大次数时安排重试"""
+		now = time.time()
+		attempts = delivery.attempts + 1
+		status = 'failed' if give_up or attempts >= MAX_ATTEMPTS else 'pending'
+		with self.conn:
+			self.conn.execute(
+				'UPDATE deliveries SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, updated_at = ? '
+				'WHERE id = ?',
+				(status, attempts, now + retry_delay(attempts), error, now, delivery.id),
+			)
+
+	def prune(self, now: float | None = None):
+		"""清理早已结束的投递记录及不再被引用的消息"""
+		cutoff = (now if now is not None else time.time()) - RETENTION
+		with self.conn:
+			self.conn.execute("DELETE FROM deliveries WHERE status != 'pending' AND updated_at < ?", (cutoff,))
+			self.conn.execute('DELETE FROM messages WHERE id NOT IN (SELECT message_id FROM deliveries)')
+
+	async def flush(self, kit, wait: float = 0.0, client: httpx.AsyncClient | None = None) -> list:
+		"""投递所有到期的消息，返回每次投递的 ChannelResult
+
+		wait 大于 0 时，在该时间内等待并重试本次失败的渠道，超出的留给下一次运行。
+		"""
+		if client is None:
+			async with httpx.AsyncClient(timeout=httpx.Timeout(15.0, connect=5.0)) as client:
+				return await self.flush(kit, wait, client)
+
+		deadline = time.monotonic() + wait
+		configured = set(kit.get_configured_channels())
+		results = []
+		while True:
+			deliveries = self.due()
+			for delivery in deliveries:
+				if delivery.channel not in configured:
+					self.mark_failed(delivery, 'channel is no longer configured', give_up=True)
+			deliveries = [delivery for delivery in deliveries if delivery.channel in configured]
+			if deliveries:
+				# 不同渠道并行发送，同一渠道按加入顺序逐条发送，受该渠道的速率限制
+				by_channel: dict[str, list[Delivery]] = {}
+				for delivery in deliveries:
+					by_channel.setdefault(delivery.channel, []).append(delivery)
+				sent = await asyncio.gather(*(self._send_in_order(kit, client, group) for group in by_channel.values()))
+				for channel_results in sent:
+					results.extend(channel_results)
+
+			retry_at = self.next_attempt_at()
+			if retry_at is None:
+				break
+			delay = retry_at - time.time()
+			if time.monotonic() + delay > deadline:
+				break
+			await asyncio.sleep(max(0.0, delay))
+		self.prune()
+		return results
+
+	def last_sent_at(self) -> float | None:
+		"""最近一次成功投递的时间，没有记录时返回 None"""
+		row = self.conn.execute("SELECT MAX(updated_at) FROM deliveries WHERE status = 'sent'").fetchone()
+		return row[0]
+
+	async def _send_in_order(self, kit, client: httpx.AsyncClient, deliveries: list[Delivery]) -> list:
+		results = []
+		for delivery in deliveries:
+			result = await kit.send_channel(
+				client,
+				delivery.channel,
+				delivery.title,
+				delivery.content,
+				delivery.msg_type,
+				delivery.formats,
+				delivery.attachments,
+			)
+			if result.success:
+				self.mark_sent(delivery.id)
+			else:
+				self.mark_failed(delivery, result.error)
+			results.append(result)
+		return results
+
+	def pending_count(self) -> int:
+		return self.conn.execute("SELECT COUNT(*) FROM deliveries WHERE status = 'pending'").fetchone()[0]
+
+	def close(self):
+		if self._conn is not None:
+			self._conn.close()
+			self._conn = None
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+通知策略
+"""
+
+import os
+import time
+from dataclasses import dataclass
+
+from utils.results import ReportAggregator
+
+POLICY_RULES = ('always', 'failure', 'change', 'low_quota', 'periodic')
+
+
+def _get_float_env(name: str, default: float) -> float:
+	"""读取非负数环境变量，非法值回退到默认值"""
+	value = os.getenv(name, '').strip()
+	if not value:
+		return default
+
+	try:
+		return max(0.0, float(value))
+	except ValueError:
+		print(f'[WARNING] {name} must be a number, using default value {default}')
+		return default
+
+
+@dataclass
+class NotifyPolicy:
+	"""决定一次运行是否需要推送通知
+
+	rules 中任一规则满足即推送:
+	- always: 每次运行都推送
+	- failure: 有签到失败、脚本异常或未获取到余额的账号
+	- change: 有账号的签到所得或新增使用超过 change_threshold，或是首次记录余额
+	- low_quota: 有账号的可用余额低于 low_quota
+	- periodic: 距上一次成功推送已超过 interval_hours 小时
+	"""
+
+	rules: frozenset[str] = frozenset({'always'})
+	change_threshold: float = 0.0
+	low_quota: float = 10.0
+	interval_hours: float = 24.0
+
+	@classmethod
+	def from_env(cls) -> 'NotifyPolicy':
+		"""从 NOTIFY_POLICY (逗号分隔的规则) 及相关阈值环境变量加载"""
+		names = {name.strip().lower() for name in os.getenv('NOTIFY_POLICY', '').split(',') if name.strip()}
+		unknown = names - set(POLICY_RULES)
+		if unknown:
+			print(
+				f'[WARNING] Unknown NOTIFY_POLICY rule(s) {", ".join(sorted(unknown))}, '
+				f'expected {", ".join(POLICY_RULES)}'
+			)
+		rules = frozenset(names - unknown) or frozenset({'always'})
+		return cls(
+			rules=rules,
+			change_threshold=_get_float_env('NOTIFY_CHANGE_THRESHOLD', 0.0),
+			low_quota=_get_float_env('NOTIFY_LOW_QUOTA', 10.0),
+			interval_hours=_get_float_env('NOTIFY_INTERVAL_HOURS', 24.0),
+		)
+
+	def reasons(
+		self, report: ReportAggregator, last_notified_at: float | None = None, now: float | None = None
+	) -> list[str]:
+		"""本次需要推送的原因，为空表示无需推送
+
+		report 需已通过 apply_previous 填入上一次运行的余额；last_notified_at 为上一次成功推送的时间戳。
+		"""
+		reasons = []
+		if 'always' in self.rules:
+			reasons.append('每次运行都推送')
+		if 'failure' in self.rules:
+			attention = sum(1 for result in report.results if result.needs_attention)
+			if attention:
+				reasons.append(f'{attention} 个账号需要关注')
+		if 'change' in self.rules:
+			changed = len(report.changed_results(self.change_threshold))
+			if changed:
+				reasons.append(f'{changed} 个账号余额变化超过 ${self.change_threshold:.2f}')
+		if 'low_quota' in self.rules:
+			low = sum(1 for result in report.results if result.has_balance and result.quota < self.low_quota)
+			if low:
+				reasons.append(f'{low} 个账号余额低于 ${self.low_quota:.2f}')
+		if 'periodic' in self.rules:
+			now = now if now is not None else time.time()
+			if last_notified_at is None or now - last_notified_at >= self.interval_hours * 3600:
+				reasons.append(f'距上次推送已超过 {self.interval_hours:g} 小时')
+		return reasons
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+按 provider 的请求限速
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from utils.storage import atomic_write_json, load_json, state_path
+
+# 自适应并发的初始上限，之后按运行中的表现调整并在多次运行之间保留
+ADAPTIVE_INITIAL_LIMIT = 2.0
+# 延迟判断的绝对余量(秒)，避免基线很小时的抖动被当作延迟上升
+LATENCY_SLACK = 0.05
+# 延迟基线按多少个样本为一个窗口更新
+LATENCY_WINDOW = 10
+
+
+class TokenBucket:
+	"""令牌桶: 以 rate 个/秒的速度补充令牌，最多积攒 burst 个"""
+
+	def __init__(self, rate: float, burst: int = 1):
+		self.rate = rate
+		self.burst = max(1, burst)
+		self._tokens = float(self.burst)
+		self._updated_at = time.monotonic()
+		self._lock = asyncio.Lock()
+
+	def _refill(self):
+		now = time.monotonic()
+		self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+		self._updated_at = now
+
+	async def acquire(self):
+		"""取走一个令牌，令牌不足时按先来后到排队等待"""
+		async with self._lock:
+			self._refill()
+			if self._tokens < 1:
+				await asyncio.sleep((1 - self._tokens) / self.rate)
+				self._refill()
+			self._tokens -= 1
+
+
+@dataclass(slots=True)
+class PathLatency:
+	"""单个请求路径的延迟统计
+
+	基线取每 LATENCY_WINDOW 个样本中的最低延迟：出现更低的延迟时立即采用，较高时按 decay 的权重
+	逐窗口靠拢，接口的正常延迟整体变化后基线会随之调整，偶尔一次很快的响应也不会让基线一直偏低。
+	"""
+
+	smoothed: float
+	baseline: float = float('inf')
+	window_min: float = float('inf')
+	window_count: int = 0
+
+	def add(self, latency: float, smoothing: float, decay: float):
+		self.smoothed += smoothing * (latency - self.smoothed)
+		self.window_min = min(self.window_min, latency)
+		self.window_count += 1
+		self.baseline = min(self.baseline, self.window_min)
+		if self.window_count >= LATENCY_WINDOW:
+			# 整个窗口都比基线慢时，基线向窗口内的最低延迟靠拢
+			self.baseline += decay * (self.window_min - self.baseline)
+			self.window_min, self.window_count = float('inf'), 0
+
+
+class AimdController:
+	"""AIMD (加性增、乘性减) 并发控制器
+
+	请求健康时每完成约 limit 个请求并发上限 +1；遇到限流、WAF 拦截，或平滑后的延迟超过基线
+	的 latency_tolerance 倍时乘以 backoff。上次下调之前发出的请求往往一起失败，它们不会再次触发下调。
+
+	不同接口的正常延迟差别很大，延迟按请求路径分别统计 (见 PathLatency)。
+	"""
+
+	def __init__(
+		self,
+		initial: float = ADAPTIVE_INITIAL_LIMIT,
+		min_limit: int = 1,
+		max_limit: int = 10,
+		backoff: float = 0.5,
+		latency_tolerance: float = 3.0,
+		smoothing: float = 0.3,
+		baseline_decay: float = 0.2,
+	):
+		self.min_limit = min_limit
+		self.max_limit = max(min_limit, max_limit)
+		self.limit = min(self.max_limit, max(float(min_limit), initial))
+		self.backoff = backoff
+		self.latency_tolerance = latency_tolerance
+		self.smoothing = smoothing
+		self.baseline_decay = baseline_decay
+		self._latencies: dict[str, PathLatency] = {}
+		self._decreased_at = float('-inf')
+
+	@property
+	def max_in_flight(self) -> int:
+		return int(self.limit)
+
+	def _latency_rising(self, path: str, latency: float) -> bool:
+		stats = self._latencies.get(path)
+		if stats is None:
+			stats = self._latencies[path] = PathLatency(latency)
+		stats.add(latency, self.smoothing, self.baseline_decay)
+		return stats.smoothed > stats.baseline * self.latency_tolerance + LATENCY_SLACK
+
+	def record(self, started_at: float, latency: float, throttled: bool = False, path: str = '') -> bool:
+		"""记录一个请求的结果 (started_at 为 time.monotonic() 时间，path 为请求路径)，返回并发上限是否变化"""
+		before = self.max_in_flight
+		if throttled or self._latency_rising(path, latency):
+			if started_at >= self._decreased_at:
+				self.limit = max(float(self.min_limit), self.limit * self.backoff)
+				self._decreased_at = time.monotonic()
+				# 下调后重新观察延迟，避免旧的平滑值连续触发下调
+				for stats in self._latencies.values():
+					stats.smoothed = stats.baseline
+		else:
+			self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+		return self.max_in_flight != before
+
+
+def load_learned_limits(path: Path | None = None) -> dict[str, float]:
+	"""读取上次运行学到的各 provider 并发上限"""
+	data = load_json(path or state_path('concurrency.json'), {})
+	if not isinstance(data, dict):
+		return {}
+	return {
+		name: float(entry['limit'])
+		for name, entry in data.items()
+		if isinstance(entry, dict) and isinstance(entry.get('limit'), (int, float))
+	}
+
+
+def save_learned_limits(limits: dict[str, float], path: Path | None = None) -> bool:
+	now = time.time()
+	data = {name: {'limit': round(limit, 3), 'updated_at': now} for name, limit in limits.items()}
+	return atomic_write_json(path or state_path('concurrency.json'), data)
+
+
+class ProviderRateLimiter:
+	"""同一 provider 的所有 worker 共享的限速器，同时限制请求速率与并发请求数
+
+	设置 controller 时 max_in_flight 由 AIMD 控制器根据 record() 上报的请求结果动态调整。
+	"""
+
+	def __init__(
+		self,
+		rate: float | None = None,
+		burst: int = 1,
+		max_in_flight: int | None = None,
+		controller: AimdController | None = None,
+	):
+		self.bucket = TokenBucket(rate, burst) if rate else None
+		self.controller = controller
+		self.max_in_flight = controller.max_in_flight if controller else max_in_flight
+		self.in_flight = 0
+		self._condition = asyncio.Condition()
+
+	@property
+	def enabled(self) -> bool:
+		return self.bucket is not None or self.max_in_flight is not None
+
+	async def record(self, started_at: float, latency: float, throttled: bool = False, path: str = ''):
+		"""上报一个请求的结果，并发上限提高时唤醒等待中的请求"""
+		if self.controller is None or not self.controller.record(started_at, latency, throttled, path):
+			return
+		async with self._condition:
+			self.max_in_flight = self.controller.max_in_flight
+			self._condition.notify_all()
+
+	def _has_slot(self) -> bool:
+		return self.max_in_flight is None or self.in_flight < self.max_in_flight
+
+	@asynccontextmanager
+	async def limit(self):
+		"""占用一个并发名额并取得令牌后再发出请求"""
+		async with self._condition:
+			await self._condition.wait_for(self._has_slot)
+			self.in_flight += 1
+		try:
+			if self.bucket:
+				await self.bucket.acquire()
+			yield
+		finally:
+			async with self._condition:
+				self.in_flight -= 1
+				self._condition.notify()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+签到结果汇总与报告生成
+"""
+
+import bisect
+import hashlib
+import re
+from collections import Counter
+from dataclasses import dataclass, field, fields
+from datetime import datetime
+from html import escape
+from operator import attrgetter
+from typing import Iterable, Literal
+
+from utils.balance_store import BalanceRecord
+
+_DIGITS = re.compile(r'(\d+)')
+
+
+def natural_key(text: str) -> tuple:
+	"""自然排序的键: 连续数字按数值比较，其余部分忽略大小写按文本比较
+
+	re.split 的结果中文本与数字交替出现且位置固定，任意两个键逐项比较时类型总是一致。
+	"""
+	parts = _DIGITS.split(text.casefold())
+	return tuple(int(part) if i % 2 else part for i, part in enumerate(parts))
+
+
+@dataclass(slots=True)
+class CheckInResult:
+	"""单个账号的处理结果
+
+	status 为 success / failed / error (脚本异常) / skipped (今日已签到)；
+	quota 为空表示未获取到余额，此时 error 为原因；prev_quota / prev_used 为上一次运行记录的余额。
+	"""
+
+	index: int
+	key: str
+	name: str
+	status: Literal['success', 'failed', 'error', 'skipped'] = 'failed'
+	quota: float | None = None
+	used: float | None = None
+	elapsed: float = 0.0
+	error: str | None = None
+	prev_quota: float | None = None
+	prev_used: float | None = None
+	# 报告中的排序键，创建时按名称计算一次，名称相同时按账号序号
+	sort_key: tuple = field(init=False, repr=False, compare=False)
+
+	def __post_init__(self):
+		self.sort_key = (natural_key(self.name), self.index)
+
+	@property
+	def success(self) -> bool:
+		return self.status in ('success', 'skipped')
+
+	@property
+	def has_balance(self) -> bool:
+		return self.quota is not None
+
+	@property
+	def needs_attention(self) -> bool:
+		"""签到失败、脚本异常或签到成功但未获取到余额"""
+		return not self.success or (self.status == 'success' and not self.has_balance)
+
+	@property
+	def has_previous(self) -> bool:
+		return self.has_balance and self.prev_quota is not None
+
+	@property
+	def gained(self) -> float:
+		"""与上次运行相比总资产 (可用+已用) 的增加，即签到等获得的额度"""
+		if not self.has_previous:
+			return 0.0
+		return round(self.quota + self.used - self.prev_quota - self.prev_used, 2)
+
+	@property
+	def used_delta(self) -> float:
+		"""上次运行以来新增的使用额度"""
+		return round(self.used - self.prev_used, 2) if self.has_previous else 0.0
+
+	def to_dict(self) -> dict:
+		return {f.name: getattr(self, f.name) for f in fields(self) if f.init}
+
+	@classmethod
+	def from_dict(cls, data: dict) -> 'CheckInResult':
+		"""忽略未知的字段，兼容其它版本写出的记录；缺少必需字段时抛出 TypeError"""
+		return cls(**{f.name: data[f.name] for f in fields(cls) if f.init and f.name in data})
+
+
+class ReportAggregator:
+	"""逐个接收账号结果，随时维护统计、余额汇总与按名称排好序的结果列表"""
+
+	def __init__(self, results: Iterable[CheckInResult] = ()):
+		self.results: list[CheckInResult] = []
+		self.counts: Counter[str] = Counter()
+		self.total_quota = 0.0
+		self.total_used = 0.0
+		# 本次实际查询到的余额，跳过的账号沿用旧值，不计入
+		self.balances: dict[str, dict] = {}
+		for result in results:
+			self.add(result)
+
+	def add(self, result: CheckInResult):
+		self.counts[result.status] += 1
+		if result.status != 'error' and result.has_balance:
+			self.total_quota += result.quota
+			self.total_used += result.used
+			if result.status != 'skipped':
+				self.balances[result.key] = {'name': result.name, 'quota': result.quota, 'used': result.used}
+		bisect.insort(self.results, result, key=attrgetter('sort_key'))
+
+	def apply_previous(self, previous: dict[str, BalanceRecord]):
+		"""填入各账号上一次运行记录的余额，用于计算变化量"""
+		for result in self.results:
+			record = previous.get(result.key)
+			if record is not None:
+				result.prev_quota, result.prev_used = record.quota, record.used_quota
+
+	def changed_results(self, threshold: float = 0.0) -> list[CheckInResult]:
+		"""余额变化超过 threshold 的账号，没有上次记录的账号视为有变化"""
+		return [
+			result
+			for result in self.results
+			if result.has_balance
+			and (not result.has_previous or abs(result.gained) > threshold or abs(result.used_delta) > threshold)
+		]
+
+	@property
+	def has_previous(self) -> bool:
+		return any(result.has_previous for result in self.results)
+
+	@property
+	def total_gained(self) -> float:
+		return round(sum(result.gained for result in self.results), 2)
+
+	@property
+	def total_used_delta(self) -> float:
+		return round(sum(result.used_delta for result in self.results), 2)
+
+	@property
+	def account_count(self) -> int:
+		return len(self.results)
+
+	@property
+	def success_count(self) -> int:
+		return self.counts['success'] + self.counts['skipped']
+
+	@property
+	def failed_count(self) -> int:
+		return self.account_count - self.success_count
+
+	@property
+	def total_assets(self) -> float:
+		return self.total_quota + self.total_used
+
+
+def report_fingerprint(report: ReportAggregator) -> str:
+	"""报告内容的指纹，与生成时间及账号是否因今日已签到而跳过无关，用于通知去重"""
+	digest = hashlib.sha256()
+	for result in report.results:
+		error = None if result.has_balance else result.error
+		digest.update(repr((result.key, result.success, result.quota, result.used, error)).encode('utf-8'))
+	return digest.hexdigest()
+
+
+def _delta_text(gained: float, used_delta: float) -> str:
+	return f'签到 +${gained:.2f}, 新增使用 ${used_delta:.2f}'
+
+
+def _balance_line(result: CheckInResult) -> str:
+	line = f'💰 当前余额: ${result.quota}, 已用: ${result.used}'
+	if result.gained or result.used_delta:
+		line += f' (较上次: {_delta_text(result.gained, result.used_delta)})'
+	return line
+
+
+def _detail_lines(result: CheckInResult) -> list[str]:
+	"""单个账号在报告中的明细 (不含名称)"""
+	if result.status == 'error':
+		return [f'❌ 脚本执行异常: {(result.error or "")[:30]}']
+	if not result.has_balance:
+		return [f'❌ 信息获取失败: {result.error or "未知错误"}']
+	if result.status == 'skipped':
+		return ['⏭️ 今日已签到 (跳过)', _balance_line(result)]
+	return [_balance_line(result)]
+
+
+def _summary_lines(report: ReportAggregator) -> list[str]:
+	count = report.account_count
+	lines = [
+		f'✅ 成功: {report.success_count}/{count}',
+		f'❌ 失败: {report.failed_count}/{count}',
+		'',  # 空行分隔
+		'💰 资金汇总:',
+		f'💵 可用总余额: ${report.total_quota:.2f}',
+		f'🧾 已用总额: ${report.total_used:.2f}',
+		f'💳 总资产(可用+已用): ${report.total_assets:.2f}',
+	]
+	if report.has_previous:
+		lines.append(f'📈 较上次运行: {_delta_text(report.total_gained, report.total_used_delta)}')
+	return lines
+
+
+def _conclusion(report: ReportAggregator) -> str:
+	return '🎉 全员通过！' if report.failed_count == 0 else '⚠️ 部分失败'
+
+
+def _listed_results(report: ReportAggregator, digest: bool) -> list[CheckInResult]:
+	"""摘要只列出需要关注的账号"""
+	return [result for result in report.results if result.needs_attention] if digest else report.results
+
+
+def _digest_note(listed: list[CheckInResult], report_url: str | None) -> str:
+	note = f'📎 摘要: 仅列出 {len(listed)} 个需要关注的账号'
+	return f'{note}，完整报告: {report_url}' if report_url else f'{note}，完整报告见邮件附件或运行日志'
+
+
+def render_text(
+	report: ReportAggregator, generated_at: datetime | None = None, digest: bool = False, report_url: str | None = None
+) -> str:
+	"""纯文本报告: 时间 -> 明细 -> 汇总；digest 为 True 时只列出需要关注的账号"""
+	time_info = f'[时间] {(generated_at or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")}'
+	listed = _listed_results(report, digest)
+	details = '\n'.join('\n'.join([f'[{result.name}]', *_detail_lines(result)]) for result in listed)
+	summary = '\n'.join(['📊 签到统计:', *_summary_lines(report), f'\n{_conclusion(report)}'])
+	if digest:
+		return '\n\n'.join(part for part in [time_info, _digest_note(listed, report_url), details, summary] if part)
+	return '\n\n'.join([time_info, details, summary])
+
+
+def render_markdown(
+	report: ReportAggregator, generated_at: datetime | None = None, digest: bool = False, report_url: str | None = None
+) -> str:
+	"""Markdown 报告，用于支持 Markdown 的渠道"""
+	lines = [f'**时间**: {(generated_at or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")}', '']
+	listed = _listed_results(report, digest)
+	if digest:
+		lines += [_digest_note(listed, report_url), '']
+	for result in listed:
+		lines.append(f'**{result.name}**')
+		lines.extend(f'- {line}' for line in _detail_lines(result))
+		lines.append('')
+	lines.append('**📊 签到统计**')
+	for line in _summary_lines(report):
+		if line.endswith(':'):
+			lines += ['', f'**{line[:-1]}**']
+		elif line:
+			lines.append(f'- {line}')
+	lines += ['', _conclusion(report)]
+	return '\n'.join(lines)
+
+
+def render_html(
+	report: ReportAggregator, generated_at: datetime | None = None, digest: bool = False, report_url: str | None = None
+) -> str:
+	"""HTML 报告，用于邮件等支持 HTML 的渠道"""
+	listed = _listed_results(report, digest)
+	rows = ''.join(
+		f'<tr><td>{escape(result.name)}</td><td>{"<br>".join(escape(line) for line in _detail_lines(result))}</td></tr>'
+		for result in listed
+	)
+	summary = '<br>'.join(escape(line) for line in _summary_lines(report) if line)
+	note = f'<p>{escape(_digest_note(listed, report_url))}</p>' if digest else ''
+	return (
+		f'<p>时间: {(generated_at or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")}</p>{note}'
+		f'<table border="1" cellpadding="4" cellspacing="0"><tr><th>账号</th><th>结果</th></tr>{rows}</table>'
+		f'<p><b>📊 签到统计</b><br>{summary}</p>'
+		f'<p>{escape(_conclusion(report))}</p>'
+	)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+请求重试与熔断
+"""
+
+import asyncio
+
+import httpx
+
+from utils.config import RetryPolicy
+from utils.tracing import tracer
+
+
+class CircuitOpenError(Exception):
+	"""provider 连续失败次数达到阈值后，本次运行不再请求该 provider"""
+
+
+class CircuitBreaker:
+	"""按 provider 统计连续失败次数，threshold 为 0 时不熔断"""
+
+	def __init__(self, name: str, threshold: int = 5):
+		self.name = name
+		self.threshold = threshold
+		self.failures = 0
+
+	@property
+	def is_open(self) -> bool:
+		return self.threshold > 0 and self.failures >= self.threshold
+
+	def check(self):
+		if self.is_open:
+			raise CircuitOpenError(f'{self.name} circuit open after {self.failures} consecutive failures')
+
+	def record_success(self):
+		self.failures = 0
+
+	def record_failure(self):
+		self.failures += 1
+		if self.failures == self.threshold:
+			print(
+				f'[WARNING] Provider "{self.name}" failed {self.failures} times in a row, skipping remaining requests'
+			)
+
+
+def _get_retry_after(response: httpx.Response) -> float:
+	try:
+		return float(response.headers.get('retry-after', 0))
+	except ValueError:
+		return 0.0
+
+
+async def request_with_retry(
+	client: httpx.AsyncClient,
+	method: str,
+	url: str,
+	policy: RetryPolicy | None = None,
+	breaker: CircuitBreaker | None = None,
+	**kwargs,
+) -> httpx.Response:
+	"""按策略重试请求
+
+	网络异常和 retry_statuses 中的状态码会触发重试，其余响应直接返回。
+	重试耗尽后计入熔断器的连续失败次数，网络异常会继续向上抛出。
+	"""
+	policy = policy or RetryPolicy()
+	kwargs.setdefault('timeout', httpx.Timeout(policy.read_timeout, connect=policy.connect_timeout))
+
+	for attempt in range(1, policy.attempts + 1):
+		if breaker:
+			breaker.check()
+
+		try:
+			with tracer.span('http.request', method=method, url=url, attempt=attempt) as span:
+				response = await client.request(method, url, **kwargs)
+				span.set(status=response.status_code)
+		except httpx.TransportError:
+			if attempt == policy.attempts:
+				if breaker:
+					breaker.record_failure()
+				raise
+			await asyncio.sleep(policy.get_delay(attempt))
+			continue
+
+		if response.status_code not in policy.retry_statuses:
+			if breaker:
+				breaker.record_success()
+			return response
+
+		if attempt == policy.attempts:
+			if breaker:
+				breaker.record_failure()
+			return response
+
+		delay = max(policy.get_delay(attempt), _get_retry_after(response))
+		await asyncio.sleep(min(delay, policy.max_backoff))
+
+	raise AssertionError('unreachable')
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+运行时共享资源
+"""
+
+import asyncio
+from dataclasses import dataclass, field
+
+import httpx
+
+from utils.browser import BrowserPool, BrowserWorkerPool
+from utils.config import AppConfig, ProviderConfig
+from utils.cookie_cache import WafCookieCache
+from utils.http import HttpClientPool
+from utils.ratelimit import (
+	ADAPTIVE_INITIAL_LIMIT,
+	AimdController,
+	ProviderRateLimiter,
+	load_learned_limits,
+	save_learned_limits,
+)
+from utils.retry import CircuitBreaker
+from utils.waf import SharedWafCookies
+
+
+@dataclass
+class RunContext:
+	"""单次运行内所有账号共享的并发资源"""
+
+	max_workers: int
+	browser_semaphore: asyncio.Semaphore
+	http_semaphore: asyncio.Semaphore
+	browser_pool: BrowserPool = field(default_factory=BrowserPool)
+	browser_workers: BrowserWorkerPool | None = None
+	waf_cookies: SharedWafCookies = field(default_factory=SharedWafCookies)
+	cookie_cache: WafCookieCache = field(default_factory=lambda: WafCookieCache(scope='off'))
+	http_clients: HttpClientPool = field(default_factory=HttpClientPool)
+	breakers: dict[str, CircuitBreaker] = field(default_factory=dict)
+	rate_limiters: dict[str, ProviderRateLimiter] = field(default_factory=dict)
+	# 开启自适应并发时为上次运行学到的各 provider 并发上限，None 表示未开启
+	learned_limits: dict[str, float] | None = None
+	adaptive_max: int = 10
+
+	@classmethod
+	def from_config(cls, app_config: AppConfig) -> 'RunContext':
+		"""根据应用配置创建运行上下文"""
+		browser_workers = None
+		browser_concurrency = app_config.browser_concurrency
+		if app_config.browser_processes > 1:
+			# 多进程模式下每个进程同时只处理一个浏览器任务
+			browser_workers = BrowserWorkerPool(
+				app_config.browser_processes, app_config.browser_mode, app_config.browser_profile_dir
+			)
+			browser_concurrency = app_config.browser_processes
+		return cls(
+			max_workers=app_config.max_workers,
+			browser_semaphore=asyncio.Semaphore(browser_concurrency),
+			browser_pool=BrowserPool(app_config.browser_mode, app_config.browser_profile_dir),
+			browser_workers=browser_workers,
+			http_semaphore=asyncio.Semaphore(app_config.http_concurrency),
+			waf_cookies=SharedWafCookies(app_config.waf_share_group_size),
+			cookie_cache=WafCookieCache(scope=app_config.waf_cookie_cache, default_ttl=app_config.waf_cookie_ttl),
+			http_clients=HttpClientPool(max_connections=app_config.http_concurrency),
+			learned_limits=load_learned_limits() if app_config.adaptive_concurrency else None,
+			adaptive_max=app_config.http_concurrency,
+		)
+
+	def get_breaker(self, provider_config: ProviderConfig) -> CircuitBreaker:
+		"""获取 provider 对应的熔断器，同一次运行内共享"""
+		breaker = self.breakers.get(provider_config.name)
+		if breaker is None:
+			breaker = CircuitBreaker(provider_config.name, provider_config.retry.breaker_threshold)
+			self.breakers[provider_config.name] = breaker
+		return breaker
+
+	def get_rate_limiter(self, provider_config: ProviderConfig) -> ProviderRateLimiter:
+		"""获取 provider 对应的限速器，HTTP 请求与浏览器获取 WAF cookies 共用
+
+		开启自适应并发且 provider 未固定 max_in_flight 时，并发上限由 AIMD 控制器按请求结果调整。
+		"""
+		limiter = self.rate_limiters.get(provider_config.name)
+		if limiter is None:
+			controller = None
+			if self.learned_limits is not None and provider_config.max_in_flight is None:
+				initial = self.learned_limits.get(provider_config.name, ADAPTIVE_INITIAL_LIMIT)
+				controller = AimdController(initial, max_limit=self.adaptive_max)
+			limiter = ProviderRateLimiter(
+				provider_config.rate_limit_rps,
+				provider_config.rate_limit_burst,
+				provider_config.max_in_flight,
+				controller,
+			)
+			self.rate_limiters[provider_config.name] = limiter
+		return limiter
+
+	def get_http_client(self, provider_config: ProviderConfig) -> httpx.AsyncClient:
+		"""获取 provider 域名对应的共享客户端"""
+		return self.http_clients.get(provider_config.domain, self.get_rate_limiter(provider_config))
+
+	def save_learned_limits(self):
+		"""写回各 provider 学到的并发上限，供下次运行使用"""
+		if self.learned_limits is None:
+			return
+		for name, limiter in self.rate_limiters.items():
+			if limiter.controller is not None:
+				self.learned_limits[name] = limiter.controller.limit
+				print(f'[并发] {name} 自适应并发上限: {limiter.controller.max_in_flight}')
+		if self.learned_limits:
+			save_learned_limits(self.learned_limits)
+
+	def begin_run(self):
+		"""常驻模式下每轮运行前清空熔断状态与分组共享结果，浏览器与连接池继续复用"""
+		self.save_learned_limits()
+		self.breakers.clear()
+		self.waf_cookies = SharedWafCookies(self.waf_cookies.group_size)
+
+	async def close(self):
+		"""释放浏览器与连接池等共享资源，并写回 cookie 缓存"""
+		self.cookie_cache.save()
+		self.save_learned_limits()
+		await self.http_clients.close()
+		await self.browser_pool.close()
+		if self.browser_workers is not None:
+			await self.browser_workers.close()
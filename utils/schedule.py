@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+常驻模式的定时调度
+"""
+
+import hashlib
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 分、时、日、月、周的取值范围，周字段中 0 与 7 都表示周日
+_FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def _parse_field(text: str, low: int, high: int) -> set[int]:
+	"""解析 cron 的单个字段，支持 *、a、a-b、*/n、a-b/n、a/n 及逗号分隔的组合"""
+	values = set()
+	for part in text.split(','):
+		base, _, step_text = part.partition('/')
+		step = int(step_text) if step_text else 1
+		if step < 1:
+			raise ValueError(f'Invalid step in cron field "{text}"')
+
+		if base == '*':
+			start, end = low, high
+		elif '-' in base:
+			start, end = (int(value) for value in base.split('-', 1))
+		else:
+			start = int(base)
+			end = high if step_text else start
+
+		if start < low or end > high or start > end:
+			raise ValueError(f'Cron field "{text}" out of range {low}-{high}')
+		values.update(range(start, end + 1, step))
+	return values
+
+
+class CronSchedule:
+	"""标准 5 段 cron 表达式 (分 时 日 月 周)，按本地时间计算
+
+	日与周同时限定时满足任一即可，与 cron 的行为一致。
+	"""
+
+	def __init__(self, expression: str):
+		fields = expression.split()
+		if len(fields) != 5:
+			raise ValueError(f'Cron expression must have 5 fields: "{expression}"')
+		self.expression = expression
+		try:
+			self.minutes, self.hours, self.days, self.months, self.weekdays = (
+				_parse_field(text, low, high) for text, (low, high) in zip(fields, _FIELD_RANGES)
+			)
+		except ValueError as e:
+			raise ValueError(f'Invalid cron expression "{expression}": {e}') from e
+		if 7 in self.weekdays:
+			self.weekdays = (self.weekdays - {7}) | {0}
+		self._day_restricted = fields[2] != '*'
+		self._weekday_restricted = fields[4] != '*'
+
+	def _day_matches(self, moment: datetime) -> bool:
+		day_match = moment.day in self.days
+		# Python 中周一为 0，cron 中周日为 0
+		weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+		if self._day_restricted and self._weekday_restricted:
+			return day_match or weekday_match
+		return day_match and weekday_match
+
+	def next_after(self, moment: datetime) -> datetime:
+		"""moment 之后(不含)的下一个触发时间"""
+		current = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+		limit = moment.year + 5
+		while current.year <= limit:
+			if current.month not in self.months:
+				year, month = (current.year + 1, 1) if current.month == 12 else (current.year, current.month + 1)
+				current = current.replace(year=year, month=month, day=1, hour=0, minute=0)
+			elif not self._day_matches(current):
+				current = (current + timedelta(days=1)).replace(hour=0, minute=0)
+			elif current.hour not in self.hours:
+				current = (current + timedelta(hours=1)).replace(minute=0)
+			elif current.minute not in self.minutes:
+				current += timedelta(minutes=1)
+			else:
+				return current
+		raise ValueError(f'Cron expression "{self.expression}" never matches')
+
+
+def account_jitter(account_key: str, max_jitter: float) -> float:
+	"""按账号标识计算固定的启动延迟，同一账号每次运行的偏移相同"""
+	if max_jitter <= 0:
+		return 0.0
+	digest = hashlib.sha256(account_key.encode('utf-8')).digest()
+	return int.from_bytes(digest[:8], 'big') / 2**64 * max_jitter
+
+
+class FileWatcher:
+	"""按修改时间检测配置文件变化，文件被删除或新建也视为变化"""
+
+	def __init__(self, paths: list[Path | str]):
+		self.paths = [Path(path) for path in paths]
+		self._mtimes = self._snapshot()
+
+	def _snapshot(self) -> dict[Path, float | None]:
+		mtimes = {}
+		for path in self.paths:
+			try:
+				mtimes[path] = os.stat(path).st_mtime
+			except OSError:
+				mtimes[path] = None
+		return mtimes
+
+	def changed(self) -> bool:
+		"""自上次检查以来是否有文件变化"""
+		mtimes = self._snapshot()
+		if mtimes == self._mtimes:
+			return False
+		self._mtimes = mtimes
+		return True
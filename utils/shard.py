@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+分片执行与结果合并
+"""
+
+import hashlib
+from pathlib import Path
+
+from utils.results import CheckInResult
+from utils.storage import atomic_write_json, load_json, state_path
+
+
+def parse_shard(text: str) -> tuple[int, int]:
+	"""解析 i/N 形式的分片参数，i 从 1 开始"""
+	index_text, sep, count_text = text.partition('/')
+	try:
+		if not sep:
+			raise ValueError
+		index, count = int(index_text), int(count_text)
+	except ValueError:
+		raise ValueError(f'Invalid shard "{text}", expected i/N such as 1/4') from None
+	if count < 1 or not 1 <= index <= count:
+		raise ValueError(f'Invalid shard "{text}", i must be between 1 and N')
+	return index, count
+
+
+def shard_of(account_key: str, count: int) -> int:
+	"""按账号标识哈希分配分片 (从 0 开始)，账号增删不影响其他账号所在的分片"""
+	digest = hashlib.sha256(account_key.encode('utf-8')).digest()
+	return int.from_bytes(digest[:8], 'big') % count
+
+
+def shard_result_path(index: int, count: int) -> Path:
+	return state_path(f'shards/shard-{index}-of-{count}.json')
+
+
+def write_shard_results(path: Path, index: int, count: int, results: list[CheckInResult]) -> bool:
+	records = [result.to_dict() for result in results]
+	return atomic_write_json(path, {'shard': index, 'count': count, 'results': records})
+
+
+def _is_int(value) -> bool:
+	return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _parse_shard_file(file: Path, data) -> tuple[int, int, list[CheckInResult]]:
+	"""校验分片结果文件的内容，格式不对时抛出带文件路径的 ValueError"""
+	if not isinstance(data, dict) or not isinstance(data.get('results'), list):
+		raise ValueError(f'{file} is not a shard result file')
+	index, count = data.get('shard'), data.get('count')
+	if not _is_int(index) or not _is_int(count) or count < 1 or not 1 <= index <= count:
+		raise ValueError(f'{file} has an invalid shard number {index!r} of {count!r}')
+
+	results = []
+	for number, record in enumerate(data['results'], 1):
+		try:
+			if not isinstance(record, dict):
+				raise TypeError('not an object')
+			if not _is_int(record.get('index')) or not all(isinstance(record.get(k), str) for k in ('key', 'name')):
+				raise TypeError('index, key and name are required')
+			results.append(CheckInResult.from_dict(record))
+		except TypeError as e:
+			raise ValueError(f'{file} result {number} is invalid: {e}') from None
+	return index, count, results
+
+
+def load_shard_results(paths: list[Path | str]) -> list[CheckInResult]:
+	"""读取并合并分片结果，目录会展开为其中的 *.json 文件，结果按账号序号排列
+
+	分片总数不一致时抛出 ValueError；缺少分片时给出警告，按已有的分片合并。
+	"""
+	files = []
+	for path in map(Path, paths):
+		files.extend(sorted(path.glob('*.json')) if path.is_dir() else [path])
+
+	results = []
+	shards: dict[int, Path] = {}
+	count = None
+	for file in files:
+		index, file_count, file_results = _parse_shard_file(file, load_json(file))
+		if count is not None and file_count != count:
+			raise ValueError(f'{file} belongs to a {file_count}-shard run, expected {count} shards')
+		count = file_count
+		if index in shards:
+			raise ValueError(f'Shard {index} appears in both {shards[index]} and {file}')
+		shards[index] = file
+		results.extend(file_results)
+
+	if count is None:
+		raise ValueError('No shard result files found')
+	missing = sorted(set(range(1, count + 1)) - set(shards))
+	if missing:
+		print(f'[WARNING] Missing results for shard(s) {", ".join(map(str, missing))} of {count}')
+	return sorted(results, key=lambda result: result.index)
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+本地状态文件读写
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+
+
+def state_path(filename: str) -> Path:
+	"""返回状态目录下的文件路径，目录由 STATE_DIR 指定，默认为 .state"""
+	state_dir = Path(os.getenv('STATE_DIR', '').strip() or '.state')
+	return state_dir / filename
+
+
+def load_json(path: Path, default=None):
+	"""读取 JSON 文件，文件不存在或损坏时返回默认值"""
+	try:
+		with open(path, 'r', encoding='utf-8') as f:
+			return json.load(f)
+	except FileNotFoundError:
+		return default
+	except Exception as e:
+		print(f'[WARNING] Failed to load {path}: {e}')
+		return default
+
+
+def atomic_write_json(path: Path, data) -> bool:
+	"""先写入同目录临时文件再替换，避免中途退出留下半个文件"""
+	try:
+		path.parent.mkdir(parents=True, exist_ok=True)
+		fd, temp_path = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=path.parent)
+		try:
+			with os.fdopen(fd, 'w', encoding='utf-8') as f:
+				json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+			os.replace(temp_path, path)
+		except BaseException:
+			os.unlink(temp_path)
+			raise
+		return True
+	except Exception as e:
+		print(f'[WARNING] Failed to write {path}: {e}')
+		return False
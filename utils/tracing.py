@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+按阶段记录耗时的轻量追踪
+"""
+
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from utils.storage import atomic_write_json
+
+TRACE_FORMATS = ('jsonl', 'chrome', 'prometheus')
+
+# 当前正在处理的账号，嵌套的 span 自动继承
+_current_account: ContextVar[str | None] = ContextVar('trace_account', default=None)
+
+
+@dataclass
+class Span:
+	"""一个阶段的起止时间与附加属性"""
+
+	name: str
+	start: float
+	account: str | None = None
+	duration: float = 0.0
+	attrs: dict = field(default_factory=dict)
+
+	def set(self, **attrs):
+		self.attrs.update(attrs)
+
+	def to_dict(self) -> dict:
+		return {
+			'name': self.name,
+			'start': self.start,
+			'duration': self.duration,
+			'account': self.account,
+			**self.attrs,
+		}
+
+
+class _NoopSpan:
+	"""关闭追踪时使用的占位 span，所有操作均为空"""
+
+	def set(self, **attrs):
+		pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+@contextmanager
+def _noop_span():
+	yield _NOOP_SPAN
+
+
+class Tracer:
+	"""收集本次运行的所有 span，运行结束后导出
+
+	关闭时 span() 直接返回空的上下文，不记录时间也不分配 Span。
+	"""
+
+	def __init__(self, enabled: bool = False):
+		self.enabled = enabled
+		self.spans: list[Span] = []
+
+	def span(self, name: str, account: str | None = None, **attrs):
+		"""记录一个阶段，account 为空时继承外层 span 的账号"""
+		if not self.enabled:
+			return _noop_span()
+		return self._record(name, account, attrs)
+
+	@contextmanager
+	def _record(self, name: str, account: str | None, attrs: dict):
+		token = _current_account.set(account) if account else None
+		span = Span(name, time.time(), account or _current_account.get(), attrs=attrs)
+		started = time.perf_counter()
+		try:
+			yield span
+		except BaseException as e:
+			span.set(error=type(e).__name__)
+			raise
+		finally:
+			span.duration = time.perf_counter() - started
+			self.spans.append(span)
+			if token is not None:
+				_current_account.reset(token)
+
+	def write_jsonl(self, path: Path) -> bool:
+		"""每行一个 span"""
+		try:
+			path.parent.mkdir(parents=True, exist_ok=True)
+			with open(path, 'w', encoding='utf-8') as f:
+				for span in self.spans:
+					f.write(json.dumps(span.to_dict(), ensure_ascii=False) + '\n')
+			return True
+		except Exception as e:
+			print(f'[WARNING] Failed to write {path}: {e}')
+			return False
+
+	def write_chrome_trace(self, path: Path) -> bool:
+		"""Chrome trace 格式，可在 chrome://tracing 或 Perfetto 中打开，每个账号一行"""
+		lanes: dict[str | None, int] = {None: 0}
+		events = []
+		for span in self.spans:
+			lane = lanes.setdefault(span.account, len(lanes))
+			events.append(
+				{
+					'name': span.name,
+					'ph': 'X',
+					'ts': span.start * 1_000_000,
+					'dur': span.duration * 1_000_000,
+					'pid': 1,
+					'tid': lane,
+					'args': span.attrs,
+				}
+			)
+		for account, lane in lanes.items():
+			events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': lane, 'args': {'name': account or 'run'}})
+		return atomic_write_json(path, {'traceEvents': events})
+
+	def write_prometheus(self, path: Path) -> bool:
+		"""按阶段汇总的 Prometheus 文本格式，可配合 node_exporter 的 textfile collector 使用"""
+		stats: dict[str, list[float]] = {}
+		errors: dict[str, int] = {}
+		for span in self.spans:
+			stats.setdefault(span.name, []).append(span.duration)
+			if 'error' in span.attrs:
+				errors[span.name] = errors.get(span.name, 0) + 1
+
+		lines = [
+			'# HELP checkin_span_duration_seconds Time spent in each check-in phase',
+			'# TYPE checkin_span_duration_seconds summary',
+		]
+		for name, durations in sorted(stats.items()):
+			lines.append(f'checkin_span_duration_seconds_sum{{span="{name}"}} {sum(durations):.6f}')
+			lines.append(f'checkin_span_duration_seconds_count{{span="{name}"}} {len(durations)}')
+		lines += [
+			'# HELP checkin_span_duration_seconds_max Longest single span of each phase',
+			'# TYPE checkin_span_duration_seconds_max gauge',
+		]
+		for name, durations in sorted(stats.items()):
+			lines.append(f'checkin_span_duration_seconds_max{{span="{name}"}} {max(durations):.6f}')
+		lines += [
+			'# HELP checkin_span_errors_total Spans that ended with an exception',
+			'# TYPE checkin_span_errors_total counter',
+		]
+		for name in sorted(stats):
+			lines.append(f'checkin_span_errors_total{{span="{name}"}} {errors.get(name, 0)}')
+
+		try:
+			path.parent.mkdir(parents=True, exist_ok=True)
+			path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+			return True
+		except Exception as e:
+			print(f'[WARNING] Failed to write {path}: {e}')
+			return False
+
+	def export(self, directory: Path, formats: tuple[str, ...] = ('jsonl',)) -> list[Path]:
+		"""按指定格式写出追踪结果，返回成功写出的文件"""
+		writers = {
+			'jsonl': ('trace.jsonl', self.write_jsonl),
+			'chrome': ('trace.chrome.json', self.write_chrome_trace),
+			'prometheus': ('checkin.prom', self.write_prometheus),
+		}
+		written = []
+		for fmt in formats:
+			filename, writer = writers[fmt]
+			if writer(directory / filename):
+				written.append(directory / filename)
+		return written
+
+
+tracer = Tracer()